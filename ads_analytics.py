@@ -0,0 +1,310 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import http_pool
+
+# Incremental Ads stats: each entity remembers how far its buckets have been
+# fetched, so a run only asks for the hours it has not seen (plus a short
+# re-fetch of recent buckets that may still settle). Entity ids are chunked per
+# request and results are merged per (entity, bucket) in SQLite.
+# ADS_STATS_MODE=async submits stats jobs and ingests them on later runs.
+_DB_PATH = os.getenv("ADS_STATS_DB_PATH", "ads_stats.db")
+_LOCK = threading.Lock()
+MODE = os.getenv("ADS_STATS_MODE", "sync").strip().lower()                 # sync | async
+ENTITY_CHUNK = min(20, int(os.getenv("ADS_ENTITY_CHUNK", "20")))           # API max is 20 ids per request
+SYNC_MAX_DAYS = float(os.getenv("ADS_SYNC_MAX_DAYS", "7"))                 # sync endpoint window limit
+ASYNC_MAX_DAYS = float(os.getenv("ADS_ASYNC_MAX_DAYS", "30"))
+BACKFILL_DAYS = float(os.getenv("ADS_BACKFILL_DAYS", "7"))                 # first window when ADS_START_TIME is unset
+REFETCH_BUCKETS = int(os.getenv("ADS_REFETCH_BUCKETS", "2"))               # trailing buckets fetched again
+MAX_REQUESTS_PER_RUN = int(os.getenv("ADS_MAX_REQUESTS_PER_RUN", "20"))
+JOB_MAX_AGE_SEC = float(os.getenv("ADS_JOB_MAX_AGE_SEC", "21600"))         # unfinished jobs expire after this
+PLACEMENT = os.getenv("PLACEMENT", "ALL_ON_TWITTER")                        # same setting the line items use
+
+_STEP = {"HOUR": 3600, "DAY": 86400}
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _db() -> sqlite3.Connection:
+    # caller holds _LOCK
+    global _conn
+    if _conn is not None:
+        return _conn
+    conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+        entity TEXT NOT NULL, entity_id TEXT NOT NULL, granularity TEXT NOT NULL, ts INTEGER NOT NULL,
+        segment TEXT NOT NULL DEFAULT '', metrics TEXT NOT NULL,
+        PRIMARY KEY (entity, entity_id, granularity, ts, segment)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS progress (
+        entity TEXT NOT NULL, entity_id TEXT NOT NULL, granularity TEXT NOT NULL,
+        fetched_until INTEGER, pending_until INTEGER,
+        PRIMARY KEY (entity, entity_id, granularity)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY, entity TEXT, granularity TEXT, entity_ids TEXT,
+        start_ts INTEGER, end_ts INTEGER, status TEXT, created_ts REAL)""")
+    conn.commit()
+    _conn = conn
+    return conn
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_iso(s: str) -> int:
+    return int(datetime.fromisoformat(s.strip().replace("Z", "+00:00")).timestamp())
+
+
+def _merge(conn: sqlite3.Connection, entity: str, granularity: str, start_ts: int, data: List[Dict[str, Any]]) -> int:
+    # Ads stats: one metrics array per entity/segment, index i is bucket start_ts + i*step
+    step = _STEP.get(granularity, 3600)
+    rows = 0
+    for ent in data or []:
+        eid = str(ent.get("id"))
+        for seg in ent.get("id_data") or []:
+            segment = json.dumps(seg.get("segment"), sort_keys=True) if seg.get("segment") else ""
+            per_bucket: Dict[int, Dict[str, Any]] = {}
+            for name, values in (seg.get("metrics") or {}).items():
+                if not isinstance(values, list):
+                    continue
+                for i, v in enumerate(values):
+                    per_bucket.setdefault(start_ts + i * step, {})[name] = v
+            for ts, metrics in per_bucket.items():
+                cur = conn.execute("SELECT metrics FROM buckets WHERE entity = ? AND entity_id = ? AND granularity = ? "
+                                   "AND ts = ? AND segment = ?", (entity, eid, granularity, ts, segment)).fetchone()
+                if cur:
+                    merged = json.loads(cur[0])
+                    merged.update(metrics)
+                    metrics = merged
+                conn.execute("INSERT OR REPLACE INTO buckets (entity, entity_id, granularity, ts, segment, metrics) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (entity, eid, granularity, ts, segment, json.dumps(metrics, separators=(",", ":"))))
+                rows += 1
+    return rows
+
+
+def _set_progress(conn: sqlite3.Connection, entity: str, ids: List[str], granularity: str,
+                  fetched_until: Optional[int], pending_until: Optional[int]) -> None:
+    for eid in ids:
+        conn.execute(
+            "INSERT INTO progress (entity, entity_id, granularity, fetched_until, pending_until) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(entity, entity_id, granularity) DO UPDATE SET "
+            "fetched_until = COALESCE(MAX(progress.fetched_until, excluded.fetched_until), "
+            "                         progress.fetched_until, excluded.fetched_until), "
+            "pending_until = excluded.pending_until",
+            (entity, eid, granularity, fetched_until, pending_until))
+
+
+def _plan(entity: str, ids: List[str], granularity: str, start_time: Optional[str],
+          end_time: Optional[str], max_days: float) -> List[Tuple[List[str], int, int]]:
+    """
+    Requests still needed as (entity_ids chunk, start_ts, end_ts): entities are
+    grouped by the first bucket they lack, chunked, and windows split by max_days.
+    """
+    step = _STEP.get(granularity, 3600)
+    now = int(time.time())
+    end = _parse_iso(end_time) if end_time else now
+    end = (min(end, now) + step - 1) // step * step   # include the current (partial) bucket
+    floor = _parse_iso(start_time) if start_time else now - int(BACKFILL_DAYS * 86400)
+    floor = floor // step * step
+    with _LOCK:
+        conn = _db()
+        prog = {r[0]: (r[1], r[2]) for r in conn.execute(
+            "SELECT entity_id, fetched_until, pending_until FROM progress WHERE entity = ? AND granularity = ?",
+            (entity, granularity))}
+    groups: Dict[int, List[str]] = {}
+    for eid in ids:
+        fetched, pending = prog.get(eid, (None, None))
+        if pending:
+            continue  # an async job is still running for this entity
+        if fetched is not None and fetched >= end and end <= now - step:
+            continue  # window closed and already fetched after it settled
+        start = floor if fetched is None else max(floor, fetched - REFETCH_BUCKETS * step)
+        if start < end:
+            groups.setdefault(start, []).append(eid)
+    span = max(step, int(max_days * 86400) // step * step)
+    plan: List[Tuple[List[str], int, int]] = []
+    for start, group in sorted(groups.items()):
+        for i in range(0, len(group), ENTITY_CHUNK):
+            chunk = group[i:i + ENTITY_CHUNK]
+            s = start
+            while s < end:
+                plan.append((chunk, s, min(end, s + span)))
+                s += span
+    return plan
+
+
+def _params(entity: str, ids: List[str], granularity: str, metric_groups: str, s: int, e: int,
+            placement: str) -> Dict[str, str]:
+    return {"entity": entity, "entity_ids": ",".join(ids), "granularity": granularity,
+            "metric_groups": metric_groups, "start_time": _iso(s), "end_time": _iso(e), "placement": placement}
+
+
+def _collect_sync(base: str, account_id: str, auth, entity: str, plan, granularity: str,
+                  metric_groups: str, placement: str) -> Dict[str, Any]:
+    url = f"{base}/stats/accounts/{account_id}"
+    requests_made = 0
+    rows = 0
+    for ids, s, e in plan[:MAX_REQUESTS_PER_RUN]:
+        resp = http_pool.get(url, auth=auth, params=_params(entity, ids, granularity, metric_groups, s, e, placement))
+        resp.raise_for_status()
+        requests_made += 1
+        with _LOCK:
+            conn = _db()
+            rows += _merge(conn, entity, granularity, s, resp.json().get("data", []))
+            _set_progress(conn, entity, ids, granularity, e, None)
+            conn.commit()
+    return {"requests": requests_made, "buckets_merged": rows, "deferred": max(0, len(plan) - MAX_REQUESTS_PER_RUN)}
+
+
+def _download(url: str) -> Dict[str, Any]:
+    resp = http_pool.get(url)
+    resp.raise_for_status()
+    body = resp.content
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def _release(job_id: str, row, status: str) -> None:
+    # Job ended without data: free its entities so the next run requests them again
+    _, entity, granularity, eids, _, _ = row[:6]
+    with _LOCK:
+        conn = _db()
+        _set_progress(conn, entity, eids.split(","), granularity, None, None)
+        conn.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id))
+        conn.commit()
+
+
+def _poll_jobs(base: str, account_id: str, auth) -> Dict[str, int]:
+    with _LOCK:
+        pending = _db().execute("SELECT job_id, entity, granularity, entity_ids, start_ts, end_ts, created_ts "
+                                "FROM jobs WHERE status = 'PROCESSING'").fetchall()
+    out = {"ingested": 0, "failed": 0, "expired": 0, "waiting": 0, "buckets_merged": 0}
+    if not pending:
+        return out
+    by_id = {r[0]: r for r in pending}
+    seen = set()
+    now = time.time()
+    url = f"{base}/stats/jobs/accounts/{account_id}"
+    ids = list(by_id)
+    for i in range(0, len(ids), 200):
+        params = {"job_ids": ",".join(ids[i:i + 200])}
+        while True:
+            resp = http_pool.get(url, auth=auth, params=params)
+            resp.raise_for_status()
+            body = resp.json()
+            for job in body.get("data", []) or []:
+                row = by_id.get(str(job.get("id_str") or job.get("id")))
+                if row is None:
+                    continue
+                seen.add(row[0])
+                job_id, entity, granularity, eids, s, e, created = row
+                eids = eids.split(",")
+                status = job.get("status")
+                if status == "SUCCESS" and job.get("url"):
+                    data = _download(job["url"]).get("data", [])
+                    with _LOCK:
+                        conn = _db()
+                        out["buckets_merged"] += _merge(conn, entity, granularity, s, data)
+                        _set_progress(conn, entity, eids, granularity, e, None)
+                        conn.execute("UPDATE jobs SET status = 'SUCCESS' WHERE job_id = ?", (job_id,))
+                        conn.commit()
+                    out["ingested"] += 1
+                elif status == "FAILED":
+                    _release(job_id, row, "FAILED")
+                    out["failed"] += 1
+                elif now - float(created or 0) > JOB_MAX_AGE_SEC:
+                    _release(job_id, row, "EXPIRED")
+                    out["expired"] += 1
+                else:
+                    out["waiting"] += 1
+            cursor = body.get("next_cursor")
+            if not cursor:
+                break
+            params = dict(params, cursor=cursor)
+    # Jobs the API does not report (purged, or never accepted) would block their
+    # entities forever; they are released only once older than JOB_MAX_AGE_SEC so
+    # a short or lagging response never drops a live job
+    for job_id in set(by_id) - seen:
+        if now - float(by_id[job_id][6] or 0) > JOB_MAX_AGE_SEC:
+            _release(job_id, by_id[job_id], "MISSING")
+            out["expired"] += 1
+        else:
+            out["waiting"] += 1
+    return out
+
+
+def _submit_jobs(base: str, account_id: str, auth, entity: str, plan, granularity: str,
+                 metric_groups: str, placement: str) -> Dict[str, Any]:
+    url = f"{base}/stats/jobs/accounts/{account_id}"
+    submitted = 0
+    for ids, s, e in plan[:MAX_REQUESTS_PER_RUN]:
+        resp = http_pool.post(url, auth=auth, params=_params(entity, ids, granularity, metric_groups, s, e, placement))
+        resp.raise_for_status()
+        job = resp.json().get("data") or {}
+        job_id = str(job.get("id_str") or job.get("id"))
+        with _LOCK:
+            conn = _db()
+            conn.execute("INSERT OR REPLACE INTO jobs (job_id, entity, granularity, entity_ids, start_ts, end_ts, "
+                         "status, created_ts) VALUES (?, ?, ?, ?, ?, ?, 'PROCESSING', ?)",
+                         (job_id, entity, granularity, ",".join(ids), s, e, time.time()))
+            _set_progress(conn, entity, ids, granularity, None, e)
+            conn.commit()
+        submitted += 1
+    return {"jobs_submitted": submitted, "deferred": max(0, len(plan) - MAX_REQUESTS_PER_RUN)}
+
+
+def collect(base: str, account_id: str, auth, entity: str, ids: List[str], granularity: str = "HOUR",
+            metric_groups: str = "ENGAGEMENT", start_time: Optional[str] = None,
+            end_time: Optional[str] = None, mode: Optional[str] = None,
+            placement: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One incremental collection run. In async mode, finished jobs from earlier
+    runs are ingested first, then jobs are submitted for the remaining gaps.
+    """
+    granularity = granularity.upper()
+    mode = (mode or MODE).lower()
+    placement = placement or PLACEMENT
+    ids = list(dict.fromkeys(ids))
+    out: Dict[str, Any] = {"status": "ok", "mode": mode, "entities": len(ids)}
+    if mode == "async":
+        out.update(_poll_jobs(base, account_id, auth))
+        plan = _plan(entity, ids, granularity, start_time, end_time, ASYNC_MAX_DAYS)
+        out.update(_submit_jobs(base, account_id, auth, entity, plan, granularity, metric_groups, placement))
+    else:
+        plan = _plan(entity, ids, granularity, start_time, end_time, SYNC_MAX_DAYS)
+        out.update(_collect_sync(base, account_id, auth, entity, plan, granularity, metric_groups, placement))
+    out["count"] = out.get("buckets_merged", 0)
+    return out
+
+
+def query(entity: Optional[str] = None, entity_id: Optional[str] = None, granularity: str = "HOUR",
+          since: Optional[int] = None, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Stored buckets, newest first.
+    """
+    sql = "SELECT entity, entity_id, granularity, ts, segment, metrics FROM buckets WHERE granularity = ?"
+    args: List[Any] = [granularity.upper()]
+    if entity:
+        sql += " AND entity = ?"
+        args.append(entity)
+    if entity_id:
+        sql += " AND entity_id = ?"
+        args.append(str(entity_id))
+    if since:
+        sql += " AND ts >= ?"
+        args.append(int(since))
+    sql += " ORDER BY ts DESC LIMIT ?"
+    args.append(int(limit))
+    with _LOCK:
+        rows = _db().execute(sql, args).fetchall()
+    return [{"entity": r[0], "entity_id": r[1], "granularity": r[2], "ts": r[3], "time": _iso(r[3]),
+             "segment": json.loads(r[4]) if r[4] else None, "metrics": json.loads(r[5])} for r in rows]
@@ -0,0 +1,115 @@
+"""
+Quote-card render benchmark: the previous renderer (fonts opened from disk on
+every render, prefix-remeasuring word wrap) against card_layout (memoized
+fonts, cached segment widths, single-pass wrap with Thai segmentation).
+
+Reports renders/sec for layout only and for full renders (drawing + PNG
+encode into memory), using captions from tweets.txt or built-in samples.
+
+    python bench_cards.py --renders 200
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+import card_layout
+
+SAMPLES = [
+    "เที่ยวอยุธยาเมืองมรดกโลก ชมวัดไชยวัฒนาราม ยามเย็นสวยงามที่สุด แวะกินกุ้งแม่น้ำเผาริมน้ำเจ้าพระยา",
+    "Ayutthaya Historical Park is a UNESCO World Heritage Site with temples, palaces and riverside food "
+    "markets that are best explored by bicycle in the early morning before the heat of the day",
+    "ตลาดน้ำอโยธยา เปิดทุกวัน 9 โมงถึง 6 โมงเย็น #Ayutthaya #เที่ยวไทย ไปกันนะคะ",
+]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Quote-card render benchmark")
+    p.add_argument("--renders", type=int, default=200, help="renders per variant")
+    p.add_argument("--tweets", default=os.getenv("TWEETS_FILE", "tweets.txt"))
+    p.add_argument("--size", type=int, default=1080)
+    return p.parse_args()
+
+
+def _texts(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [ln.strip() for ln in f if ln.strip()]
+        if lines:
+            return lines
+    except OSError:
+        pass
+    return SAMPLES
+
+
+def _legacy_font(size: int):
+    for p in card_layout.FONT_CANDIDATES:
+        if os.path.exists(p):
+            try:
+                return ImageFont.truetype(p, size=size)
+            except Exception:
+                continue
+    return ImageFont.load_default()
+
+
+def _legacy_layout(draw, text: str, W: int):
+    font = _legacy_font(54)
+    font_small = _legacy_font(36)
+    max_w = W - 140
+    lines = []
+    current = ""
+    for w in text.split():
+        test = (current + " " + w).strip()
+        if draw.textlength(test, font=font) <= max_w:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+            current = w
+    if current:
+        lines.append(current)
+    return font, font_small, lines[:10]
+
+
+def _new_layout(draw, text: str, W: int):
+    return card_layout.font(54), card_layout.font(36), card_layout.wrap(text, 54, W - 140, max_lines=10)
+
+
+def _render(layout, text: str, size: int, encode: bool) -> None:
+    img = Image.new("RGB", (size, size), color=(255, 245, 245))
+    draw = ImageDraw.Draw(img)
+    font, font_small, lines = layout(draw, text, size)
+    if not encode:
+        return
+    y = 160
+    for line in lines:
+        draw.text((70, y), line, font=font, fill=(40, 40, 40))
+        y += font.size + 18
+    draw.text((70, size - 120), "— bench", font=font_small, fill=(100, 100, 100))
+    img.save(io.BytesIO(), format="PNG")
+
+
+def _rate(layout, texts, n: int, size: int, encode: bool) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        _render(layout, texts[i % len(texts)], size, encode)
+    return round(n / (time.perf_counter() - t0), 1)
+
+
+def main():
+    args = parse_args()
+    texts = _texts(args.tweets)
+    out = {"renders": args.renders, "texts": len(texts), "font": card_layout.font_path(), "icu": card_layout._ICU}
+    for name, layout in (("legacy", _legacy_layout), ("card_layout", _new_layout)):
+        out[f"{name}_layout_per_sec"] = _rate(layout, texts, args.renders, args.size, encode=False)
+        out[f"{name}_render_per_sec"] = _rate(layout, texts, args.renders, args.size, encode=True)
+    out["layout_speedup"] = round(out["card_layout_layout_per_sec"] / out["legacy_layout_per_sec"], 1)
+    out["render_speedup"] = round(out["card_layout_render_per_sec"] / out["legacy_render_per_sec"], 2)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
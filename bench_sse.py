@@ -0,0 +1,151 @@
+"""
+Connection-count benchmark for the dashboard's /events stream.
+
+Starts the dashboard in-process (--server asgi: web_asgi under uvicorn;
+--server wsgi: the Flask app on werkzeug's threaded server, as `app.run`
+does), opens N concurrent SSE clients, publishes a burst of events on the bus
+and reports delivery, fan-out latency, CPU time, RSS growth and thread count.
+Client parsing runs in the same process, so CPU and memory are upper bounds.
+
+    python bench_sse.py --server asgi --connections 2000 --events 50
+    (raise the fd limit first, e.g. `ulimit -n 65536`)
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="SSE fan-out benchmark (ASGI mode)")
+    p.add_argument("--connections", type=int, default=1000)
+    p.add_argument("--events", type=int, default=50)
+    p.add_argument("--interval", type=float, default=0.02, help="seconds between published events")
+    p.add_argument("--port", type=int, default=int(os.getenv("BENCH_PORT", "8765")))
+    p.add_argument("--server", choices=("asgi", "wsgi"), default="asgi")
+    return p.parse_args()
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _start_wsgi(port: int) -> None:
+    import logging
+    from werkzeug.serving import make_server
+    import web_dashboard
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", port, web_dashboard.app, threaded=True)
+    server.socket.listen(4096)
+    threading.Thread(target=server.serve_forever, daemon=True, name="bench-werkzeug").start()
+
+
+def _start_server(port: int) -> None:
+    import uvicorn
+    import web_asgi
+    config = uvicorn.Config(web_asgi.create_app(), host="127.0.0.1", port=port, log_level="error",
+                            backlog=4096)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True, name="bench-uvicorn").start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+
+
+async def _client(port: int, expect: int, latencies: list, counts: list, connected: list) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    got = 0
+    first = True
+    try:
+        while got < expect:
+            line = await reader.readline()
+            if not line:
+                break
+            if first:
+                connected.append(1)
+                first = False
+            if not line.startswith(b"data: "):
+                continue
+            try:
+                ev = json.loads(line[6:])
+            except ValueError:
+                continue
+            if ev.get("type") == "bench":
+                latencies.append(time.time() - ev["sent"])
+                got += 1
+    finally:
+        counts.append(got)
+        writer.close()
+
+
+async def _run(args) -> None:
+    import realtime_bus as bus
+    latencies: list = []
+    counts: list = []
+    connected: list = []
+    rss0 = _rss_mb()
+    threads0 = threading.active_count()
+    t0 = time.time()
+    tasks = [asyncio.create_task(_client(args.port, args.events, latencies, counts, connected))
+             for _ in range(args.connections)]
+    while len(connected) < args.connections and time.time() - t0 < 60:
+        await asyncio.sleep(0.1)
+    t_conn = time.time() - t0
+    await asyncio.sleep(1.5)  # let every client see a keepalive
+    rss_held = _rss_mb()
+    threads_held = threading.active_count()
+
+    cpu0 = time.process_time()
+    t1 = time.time()
+    for i in range(args.events):
+        bus.publish({"type": "bench", "seq": i, "sent": time.time()})
+        await asyncio.sleep(args.interval)
+    await asyncio.wait(tasks, timeout=30)
+    wall = time.time() - t1
+    cpu = time.process_time() - cpu0
+
+    lat = sorted(latencies) or [0.0]
+    print(json.dumps({
+        "server": args.server,
+        "connections": args.connections,
+        "connected": len(connected),
+        "connect_sec": round(t_conn, 2),
+        "events": args.events,
+        "delivered": sum(counts),
+        "expected": args.connections * args.events,
+        "latency_ms_p50": round(statistics.median(lat) * 1000, 2),
+        "latency_ms_p99": round(lat[int(len(lat) * 0.99) - 1 if len(lat) > 1 else 0] * 1000, 2),
+        "wall_sec": round(wall, 2),
+        "cpu_sec": round(cpu, 2),
+        "rss_mb_idle": round(rss0, 1),
+        "rss_mb_connected": round(rss_held, 1),
+        "rss_kb_per_connection": round((rss_held - rss0) * 1024 / max(1, len(connected)), 1),
+        "threads_connected": threads_held,
+        "threads_added": threads_held - threads0,
+    }, indent=2))
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("SSE_SUBSCRIBER_QUEUE", str(max(256, args.events * 2)))
+    if args.server == "wsgi":
+        _start_wsgi(args.port)
+    else:
+        _start_server(args.port)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
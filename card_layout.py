@@ -0,0 +1,224 @@
+import functools
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import ImageFont
+
+# Text layout for the quote card. Fonts are loaded once per size, the widths of
+# measured segments are cached per size, and wrapping is a single greedy pass
+# over break opportunities. Thai has no spaces between words, so Thai runs are
+# split into word segments by a dictionary breaker: PyICU's line breaker, else
+# pythainlp's word tokenizer. Without either, a conservative rule-based fallback
+# breaks before leading vowels and after syllable-closing vowels. Any forced
+# break inside a too-long segment falls between clusters (a consonant with its
+# leading vowel, following vowels and marks), so a line never starts with a
+# dependent vowel or mark and never ends with a leading vowel.
+FONT_CANDIDATES = [p for p in [
+    os.getenv("CARD_FONT_PATH"),
+    "/usr/share/fonts/truetype/tlwg/TlwgLoma.ttf",  # Thai TLWG
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # fallback
+] if p]
+WIDTH_CACHE_MAX = int(os.getenv("CARD_WIDTH_CACHE_MAX", "50000"))  # segment widths per font size
+
+try:
+    from icu import BreakIterator, Locale  # optional: PyICU
+    _ICU = True
+except Exception:
+    _ICU = False
+
+try:
+    from pythainlp.tokenize import word_tokenize  # optional: pythainlp
+    _THAINLP = True
+except Exception:
+    _THAINLP = False
+
+_LOCK = threading.Lock()
+_widths: Dict[int, Dict[str, float]] = {}
+
+_THAI_MARKS = {chr(c) for c in [0x0E31] + list(range(0x0E34, 0x0E3B)) + list(range(0x0E47, 0x0E4F))}
+_LEADING = set("\u0e40\u0e41\u0e42\u0e43\u0e44")          # vowels written before their consonant
+_NO_BREAK_BEFORE = set("\u0e30\u0e32\u0e33\u0e45\u0e46\u0e2f")  # vowels/marks that follow a consonant
+_BREAK_AFTER = set("\u0e30\u0e33\u0e46\u0e2f")             # vowels that close a syllable, repeat/abbrev marks
+
+
+def _is_thai(ch: str) -> bool:
+    return "\u0e00" <= ch <= "\u0e7f"
+
+
+@functools.lru_cache(maxsize=None)
+def font_path() -> Optional[str]:
+    for p in FONT_CANDIDATES:
+        if os.path.exists(p):
+            return p
+    return None
+
+
+@functools.lru_cache(maxsize=32)
+def font(size: int = 48) -> ImageFont.ImageFont:
+    """
+    Card font at this size, loaded from disk once.
+    """
+    p = font_path()
+    if p:
+        try:
+            return ImageFont.truetype(p, size=size)
+        except Exception:
+            pass
+    return ImageFont.load_default()
+
+
+def width(size: int, s: str) -> float:
+    """
+    Advance width of s in the card font at this size (cached).
+    """
+    cache = _widths.get(size)
+    if cache is None:
+        with _LOCK:
+            cache = _widths.setdefault(size, {})
+    w = cache.get(s)
+    if w is None:
+        w = font(size).getlength(s)
+        if len(cache) >= WIDTH_CACHE_MAX:
+            cache.clear()
+        cache[s] = w
+    return w
+
+
+def clusters(s: str) -> List[str]:
+    # Unbreakable units: a consonant with its leading vowel, combining marks and
+    # following spacing vowels (e.g. "เก", "ที่", "ครา", "ทำ")
+    out: List[str] = []
+    for ch in s:
+        if out and (ch in _THAI_MARKS or ch in _NO_BREAK_BEFORE or out[-1][-1] in _LEADING):
+            out[-1] += ch
+        else:
+            out.append(ch)
+    return out
+
+
+def _thai_rule_segments(run: str) -> List[str]:
+    parts = clusters(run)
+    segs: List[str] = []
+    cur = ""
+    for i, c in enumerate(parts):
+        if cur:
+            prev = parts[i - 1]
+            can_break = c[0] in _LEADING or prev[-1] in _BREAK_AFTER
+            if can_break:
+                segs.append(cur)
+                cur = ""
+        cur += c
+    if cur:
+        segs.append(cur)
+    return segs
+
+
+def _safe(segs) -> List[str]:
+    # Re-join any segment boundary that would strand a dependent vowel or mark
+    out: List[str] = []
+    for seg in segs:
+        if out and (seg[0] in _THAI_MARKS or seg[0] in _NO_BREAK_BEFORE or out[-1][-1] in _LEADING):
+            out[-1] += seg
+        else:
+            out.append(seg)
+    return out
+
+
+def _icu_segments(word: str) -> List[str]:
+    bi = BreakIterator.createLineInstance(Locale("th"))
+    bi.setText(word)
+    segs: List[str] = []
+    start = bi.first()
+    for end in bi:
+        if end > start:
+            segs.append(word[start:end])
+        start = end
+    return _safe(segs) or [word]
+
+
+@functools.lru_cache(maxsize=8192)
+def segments(word: str) -> Tuple[str, ...]:
+    """
+    Pieces of one space-free word between which a line may break (cached per word).
+    """
+    if not any(_is_thai(ch) for ch in word):
+        return (word,)
+    if _ICU:
+        try:
+            return tuple(_icu_segments(word))
+        except Exception:
+            pass
+    if _THAINLP:
+        try:
+            return tuple(_safe(t for t in word_tokenize(word, keep_whitespace=False) if t))
+        except Exception:
+            pass
+    # Split into Thai / non-Thai runs; runs may always break at their boundary
+    segs: List[str] = []
+    run = ""
+    for ch in word:
+        if run and _is_thai(ch) != _is_thai(run[-1]) and ch not in _THAI_MARKS:
+            segs.extend(_thai_rule_segments(run) if _is_thai(run[-1]) else [run])
+            run = ""
+        run += ch
+    if run:
+        segs.extend(_thai_rule_segments(run) if _is_thai(run[-1]) else [run])
+    return tuple(segs)
+
+
+def _hard_break(seg: str, size: int, max_width: float) -> List[Tuple[str, float]]:
+    # A single segment wider than a line: split between clusters
+    pieces: List[Tuple[str, float]] = []
+    cur, cur_w = "", 0.0
+    for c in clusters(seg):
+        w = width(size, c)
+        if cur and cur_w + w > max_width:
+            pieces.append((cur, cur_w))
+            cur, cur_w = "", 0.0
+        cur += c
+        cur_w += w
+    if cur:
+        pieces.append((cur, cur_w))
+    return pieces
+
+
+def wrap(text: str, size: int, max_width: float, max_lines: Optional[int] = None) -> List[str]:
+    """
+    Greedy single-pass wrap of text into lines no wider than max_width.
+    Each segment is measured once; stops after max_lines.
+    """
+    space = width(size, " ")
+    lines: List[str] = []
+    cur: List[str] = []
+    cur_w = 0.0
+    for word in text.split():
+        for i, seg in enumerate(segments(word)):
+            gap = space if (i == 0 and cur) else 0.0
+            w = width(size, seg)
+            if cur and cur_w + gap + w > max_width:
+                lines.append("".join(cur))
+                if max_lines and len(lines) >= max_lines:
+                    return lines
+                cur, cur_w, gap = [], 0.0, 0.0
+            if w > max_width:
+                for piece, pw in _hard_break(seg, size, max_width):
+                    if cur and cur_w + gap + pw > max_width:
+                        lines.append("".join(cur))
+                        if max_lines and len(lines) >= max_lines:
+                            return lines
+                        cur, cur_w, gap = [], 0.0, 0.0
+                    cur.append(" " + piece if gap else piece)
+                    cur_w += gap + pw
+                    gap = 0.0
+                continue
+            cur.append(" " + seg if gap else seg)
+            cur_w += gap + w
+    if cur and not (max_lines and len(lines) >= max_lines):
+        lines.append("".join(cur))
+    return lines
+
+
+def stats() -> Dict[str, object]:
+    return {"font": font_path(), "icu": _ICU, "pythainlp": _THAINLP, "sizes": sorted(_widths),
+            "cached_widths": sum(len(c) for c in _widths.values()), "fonts": font.cache_info()._asdict()}
@@ -1,11 +1,18 @@
+import atexit
+import heapq
+import itertools
 import json
 import os
+import random
 import threading
 import time
-from typing import Any, Callable, Dict, Optional
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import telemetry
 
 _STATE_PATH = os.getenv("CB_STATE_PATH", "cb_state.json")
-_LOCK = threading.Lock()
+_LOCK = threading.Lock()  # guards the state map, provider lock table and dirty flag
 
 # Defaults (tuned for stronger resilience by default; can be overridden by env)
 FAILURE_THRESHOLD = int(os.getenv("CB_FAILURE_THRESHOLD", "3"))          # failures to open the circuit
@@ -14,6 +21,21 @@ MAX_RETRIES = int(os.getenv("CB_MAX_RETRIES", "3"))                      # retri
 BACKOFF_BASE = float(os.getenv("CB_BACKOFF_BASE", "1.0"))                # starting delay (seconds)
 BACKOFF_FACTOR = float(os.getenv("CB_BACKOFF_FACTOR", "2.0"))            # multiplier
 MAX_BACKOFF = float(os.getenv("CB_MAX_BACKOFF", "8.0"))                  # cap delay per attempt
+RETRY_JITTER = float(os.getenv("CB_RETRY_JITTER", "0.5"))                # fraction of each delay randomised away
+RETRY_WORKERS = int(os.getenv("CB_RETRY_WORKERS", "10"))                 # shared attempt pool when no executor given
+FLUSH_INTERVAL_SEC = float(os.getenv("CB_FLUSH_INTERVAL_SEC", "5.0"))    # write-behind period for cb_state.json
+
+# In-memory state; cb_state.json is only read once and written behind
+_states: Dict[str, Dict[str, Any]] = {}
+_loaded = False
+_dirty = False
+_provider_locks: Dict[str, threading.Lock] = {}
+_flusher: Optional[threading.Thread] = None
+
+_M_ATTEMPTS = telemetry.counter("circuit_attempts", "call_with_circuit attempts by provider and outcome")
+_M_BACKOFF = telemetry.histogram("circuit_backoff_seconds", "Backoff waited before a retry attempt",
+                                 buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0))
+_M_SKIPPED = telemetry.counter("circuit_skipped", "Calls short-circuited because the circuit was open")
 
 
 def _load() -> Dict[str, Dict[str, Any]]:
@@ -36,16 +58,69 @@ def _save(data: Dict[str, Dict[str, Any]]) -> None:
     os.replace(tmp, _STATE_PATH)
 
 
+def _ensure_loaded() -> None:
+    global _loaded
+    if _loaded:
+        return
+    with _LOCK:
+        if not _loaded:
+            _states.update(_load())
+            _loaded = True
+
+
+def _provider_lock(name: str) -> threading.Lock:
+    with _LOCK:
+        lk = _provider_locks.get(name)
+        if lk is None:
+            lk = threading.Lock()
+            _provider_locks[name] = lk
+        return lk
+
+
+def _mark_dirty() -> None:
+    global _dirty, _flusher
+    with _LOCK:
+        _dirty = True
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, daemon=True, name="cb-flush")
+            _flusher.start()
+
+
+def flush() -> None:
+    """
+    Write in-memory circuit state to cb_state.json if anything changed.
+    """
+    global _dirty
+    with _LOCK:
+        if not _dirty:
+            return
+        snapshot = {k: dict(v) for k, v in _states.items()}
+        _dirty = False
+    try:
+        _save(snapshot)
+    except Exception:
+        with _LOCK:
+            _dirty = True
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL_SEC)
+        flush()
+
+
 def _now() -> float:
     return time.time()
 
 
-def _get_entry(data: Dict[str, Dict[str, Any]], key: str) -> Dict[str, Any]:
-    entry = data.get(key)
-    if not entry:
-        entry = {"state": "closed", "fail_count": 0, "opened_at": None, "last_error": None}
-        data[key] = entry
-    return entry
+def _get_entry(key: str) -> Dict[str, Any]:
+    # Caller holds the provider lock; the map itself is guarded by _LOCK
+    with _LOCK:
+        entry = _states.get(key)
+        if not entry:
+            entry = {"state": "closed", "fail_count": 0, "opened_at": None, "last_error": None}
+            _states[key] = entry
+        return entry
 
 
 def _publish_event(evt: Dict[str, Any]) -> None:
@@ -56,27 +131,12 @@ def _publish_event(evt: Dict[str, Any]) -> None:
         pass
 
 
-def call_with_circuit(name: str, func: Callable[[], Any],
-                      max_retries: Optional[int] = None,
-                      failure_threshold: Optional[int] = None,
-                      open_timeout_sec: Optional[int] = None,
-                      backoff_base: Optional[float] = None,
-                      backoff_factor: Optional[float] = None,
-                      max_backoff: Optional[float] = None) -> Any:
+def _admit(name: str, open_timeout_sec: float):
     """
-    Execute func() under circuit breaker + retry with exponential backoff.
-    Returns func()'s return value. When circuit open, returns a skipped-like dict.
+    Check the circuit before a call. Returns (skipped_dict or None, half_open).
     """
-    max_retries = MAX_RETRIES if max_retries is None else max_retries
-    failure_threshold = FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
-    open_timeout_sec = OPEN_TIMEOUT_SEC if open_timeout_sec is None else open_timeout_sec
-    backoff_base = BACKOFF_BASE if backoff_base is None else backoff_base
-    backoff_factor = BACKOFF_FACTOR if backoff_factor is None else backoff_factor
-    max_backoff = MAX_BACKOFF if max_backoff is None else max_backoff
-
-    with _LOCK:
-        data = _load()
-        entry = _get_entry(data, name)
+    with _provider_lock(name):
+        entry = _get_entry(name)
         state = entry.get("state", "closed")
         opened_at = entry.get("opened_at")
 
@@ -85,66 +145,254 @@ def call_with_circuit(name: str, func: Callable[[], Any],
             if opened_at and (_now() - float(opened_at)) >= open_timeout_sec:
                 # half-open: allow one trial
                 entry["state"] = "half_open"
-                _save(data)
+                _mark_dirty()
                 _publish_event({"type": "circuit", "action": "half_open", "provider": name, "ts": _now()})
             else:
                 # still open -> skip
                 retry_after = None
                 if opened_at:
                     retry_after = max(0.0, open_timeout_sec - (_now() - float(opened_at)))
-                return {"provider": name, "status": "skipped", "detail": {"reason": "circuit_open", "retry_after_sec": retry_after}}
+                return {"provider": name, "status": "skipped", "detail": {"reason": "circuit_open", "retry_after_sec": retry_after}}, False
+        return None, entry.get("state") == "half_open"
 
-    # Decide attempts
-    attempts = 1 if entry.get("state") == "half_open" else max(1, int(max_retries))
-    delay = backoff_base
 
-    last_error = None
-    for i in range(attempts):
-        try:
-            result = func()
-            # On success, close circuit and reset counters
-            with _LOCK:
-                data = _load()
-                entry = _get_entry(data, name)
-                if entry.get("state") in {"open", "half_open"}:
-                    _publish_event({"type": "circuit", "action": "close", "provider": name, "ts": _now()})
-                entry["state"] = "closed"
-                entry["fail_count"] = 0
-                entry["opened_at"] = None
-                entry["last_error"] = None
-                _save(data)
-            return result
-        except Exception as e:
-            last_error = str(e)
-            # brief backoff, but don't block too long
-            time.sleep(min(delay, max_backoff))
-            delay *= backoff_factor
+def _on_success(name: str) -> None:
+    # On success, close circuit and reset counters
+    with _provider_lock(name):
+        entry = _get_entry(name)
+        if entry.get("state") in {"open", "half_open"}:
+            _publish_event({"type": "circuit", "action": "close", "provider": name, "ts": _now()})
+        if entry.get("state") != "closed" or entry.get("fail_count") or entry.get("last_error"):
+            entry["state"] = "closed"
+            entry["fail_count"] = 0
+            entry["opened_at"] = None
+            entry["last_error"] = None
+            _mark_dirty()
+
 
+def _on_failure(name: str, last_error: Optional[str], failure_threshold: int) -> Dict[str, Any]:
     # All attempts failed -> update state
-    with _LOCK:
-        data = _load()
-        entry = _get_entry(data, name)
+    with _provider_lock(name):
+        entry = _get_entry(name)
         entry["fail_count"] = int(entry.get("fail_count", 0)) + 1
         entry["last_error"] = last_error
         if entry["state"] == "half_open":
             # immediate re-open
             entry["state"] = "open"
             entry["opened_at"] = _now()
-            _save(data)
             _publish_event({"type": "circuit", "action": "open", "provider": name, "ts": _now(), "reason": "half_open_failed"})
-        else:
-            if entry["fail_count"] >= failure_threshold:
-                entry["state"] = "open"
-                entry["opened_at"] = _now()
-                _save(data)
-                _publish_event({"type": "circuit", "action": "open", "provider": name, "ts": _now(), "reason": "threshold_reached"})
-            else:
-                _save(data)
+        elif entry["fail_count"] >= failure_threshold:
+            entry["state"] = "open"
+            entry["opened_at"] = _now()
+            _publish_event({"type": "circuit", "action": "open", "provider": name, "ts": _now(), "reason": "threshold_reached"})
+        _mark_dirty()
+        circuit_state = entry.get("state", "unknown")
 
     # Return a unified error dict (so callers don't crash)
-    return {"provider": name, "status": "error", "detail": {"error": last_error, "circuit_state": _load().get(name, {}).get("state", "unknown")}}
+    return {"provider": name, "status": "error", "detail": {"error": last_error, "circuit_state": circuit_state}}
+
+
+# ===== Retry scheduler =====
+# Failed attempts are parked in a heap until their backoff expires and then
+# re-submitted to a worker pool, so no thread sleeps while waiting to retry.
+
+class RetryBudget:
+    """
+    Retry allowance shared by all calls in one dispatch cycle.
+    deadline is a time.monotonic() value; retries due after it are refused.
+    """
+
+    def __init__(self, max_retries: int, deadline: Optional[float] = None):
+        self.remaining = max(0, int(max_retries))
+        self.deadline = deadline
+        self._lock = threading.Lock()
+
+    def take(self, due: float) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            if self.deadline is not None and due >= self.deadline:
+                return False
+            self.remaining -= 1
+            return True
+
+
+_retry_heap: List[Tuple[float, int, Callable[[], Any], Callable[[], Any]]] = []  # (due, seq, run, drop)
+_retry_cv = threading.Condition()
+_retry_seq = itertools.count()
+_retry_thread: Optional[threading.Thread] = None
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _default_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _LOCK:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, RETRY_WORKERS), thread_name_prefix="cb")
+        return _pool
+
+
+def _schedule(due: float, fn: Callable[[], Any], drop: Callable[[], Any]) -> None:
+    # drop() runs instead of fn() if the retry is discarded at shutdown
+    global _retry_thread
+    with _retry_cv:
+        heapq.heappush(_retry_heap, (due, next(_retry_seq), fn, drop))
+        if _retry_thread is None:
+            _retry_thread = threading.Thread(target=_retry_loop, daemon=True, name="cb-retry")
+            _retry_thread.start()
+        _retry_cv.notify()
+
+
+def _retry_loop() -> None:
+    while True:
+        with _retry_cv:
+            while True:
+                now = time.monotonic()
+                if _retry_heap and _retry_heap[0][0] <= now:
+                    _, _, fn, _ = heapq.heappop(_retry_heap)
+                    break
+                _retry_cv.wait((_retry_heap[0][0] - now) if _retry_heap else None)
+        try:
+            fn()
+        except Exception:
+            pass
+
+
+def _jittered(delay: float, max_backoff: float) -> float:
+    d = min(delay, max_backoff)
+    return max(0.0, d * (1.0 - RETRY_JITTER * random.random()))
+
+
+def _resolve(fut: Future, value: Any) -> None:
+    try:
+        fut.set_result(value)
+    except Exception:
+        # caller cancelled (e.g. dispatch timeout)
+        pass
+
+
+def call_with_circuit_async(name: str, func: Callable[[], Any],
+                            executor: Optional[Executor] = None,
+                            budget: Optional[RetryBudget] = None,
+                            max_retries: Optional[int] = None,
+                            failure_threshold: Optional[int] = None,
+                            open_timeout_sec: Optional[int] = None,
+                            backoff_base: Optional[float] = None,
+                            backoff_factor: Optional[float] = None,
+                            max_backoff: Optional[float] = None) -> Future:
+    """
+    Non-blocking call_with_circuit: attempts run on executor (or a shared pool),
+    failed attempts are re-queued after a jittered backoff, and retries draw from
+    budget when given. Returns a Future with the same result call_with_circuit would.
+    """
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    failure_threshold = FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+    open_timeout_sec = OPEN_TIMEOUT_SEC if open_timeout_sec is None else open_timeout_sec
+    backoff_base = BACKOFF_BASE if backoff_base is None else backoff_base
+    backoff_factor = BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+    max_backoff = MAX_BACKOFF if max_backoff is None else max_backoff
+
+    _ensure_loaded()
+    fut: Future = Future()
+    skipped, half_open = _admit(name, open_timeout_sec)
+    if skipped is not None:
+        _M_SKIPPED.inc(provider=name)
+        fut.set_result(skipped)
+        return fut
+
+    # Decide attempts
+    attempts = 1 if half_open else max(1, int(max_retries))
+    pool = executor or _default_pool()
+
+    def give_up(last_error: Optional[str]) -> None:
+        _resolve(fut, _on_failure(name, last_error, failure_threshold))
+
+    def attempt(n: int, delay: float, prev_error: Optional[str] = None) -> None:
+        if fut.cancelled():
+            # The caller stopped waiting, but an earlier attempt already failed:
+            # count it, as a call that ran out of retries would
+            if prev_error is not None:
+                give_up(prev_error)
+            return
+        try:
+            result = func()
+        except Exception as e:
+            _M_ATTEMPTS.inc(provider=name, outcome="error")
+            last_error = str(e)
+            if n + 1 < attempts and not fut.cancelled():
+                wait = _jittered(delay, max_backoff)
+                due = time.monotonic() + wait
+                if budget is None or budget.take(due):
+                    _M_BACKOFF.observe(wait, provider=name)
+                    _schedule(due, lambda: pool.submit(attempt, n + 1, delay * backoff_factor, last_error),
+                              lambda: give_up(last_error))
+                    return
+            give_up(last_error)
+            return
+        _M_ATTEMPTS.inc(provider=name, outcome="ok")
+        _on_success(name)
+        _resolve(fut, result)
+
+    try:
+        pool.submit(attempt, 0, backoff_base)
+    except Exception as e:
+        give_up(str(e))
+    return fut
+
+
+def shutdown() -> None:
+    """
+    Drop pending retries, recording each call's failure, then flush state.
+    Runs at exit so a breaker that should trip is not left closed on restart.
+    """
+    with _retry_cv:
+        pending = [entry[3] for entry in _retry_heap]
+        _retry_heap.clear()
+    for drop in pending:
+        try:
+            drop()
+        except Exception:
+            pass
+    flush()
+
+
+atexit.register(shutdown)
+
+
+def _collect():
+    # Scrape-time gauge: 0 closed, 1 half_open, 2 open
+    codes = {"closed": 0, "half_open": 1, "open": 2}
+    with _LOCK:
+        items = [(k, v.get("state", "closed"), v.get("fail_count", 0)) for k, v in _states.items()]
+    for name, state, fails in items:
+        yield ("circuit_state", "gauge", "Circuit state (0 closed, 1 half_open, 2 open)", {"provider": name},
+               codes.get(state, 0))
+        yield ("circuit_fail_count", "gauge", "Consecutive failed calls", {"provider": name}, int(fails or 0))
+
+
+telemetry.register_collector(_collect)
+
+
+def call_with_circuit(name: str, func: Callable[[], Any],
+                      max_retries: Optional[int] = None,
+                      failure_threshold: Optional[int] = None,
+                      open_timeout_sec: Optional[int] = None,
+                      backoff_base: Optional[float] = None,
+                      backoff_factor: Optional[float] = None,
+                      max_backoff: Optional[float] = None) -> Any:
+    """
+    Execute func() under circuit breaker + retry with exponential backoff.
+    Returns func()'s return value. When circuit open, returns a skipped-like dict.
+    """
+    return call_with_circuit_async(name, func, max_retries=max_retries, failure_threshold=failure_threshold,
+                                   open_timeout_sec=open_timeout_sec, backoff_base=backoff_base,
+                                   backoff_factor=backoff_factor, max_backoff=max_backoff).result()
 
 
 def states() -> Dict[str, Dict[str, Any]]:
+    """
+    Snapshot of all circuit states from memory (no file I/O after first load).
+    """
+    _ensure_loaded()
     with _LOCK:
-        return _load()
\ No newline at end of file
+        return {k: dict(v) for k, v in _states.items()}
@@ -40,6 +40,7 @@ def parse_args():
     parser.add_argument("--collect-cron", help="Cron for collecting metrics (5 or 6 fields). Overrides COLLECT_CRON env.", default=None)
     parser.add_argument("--collect-interval-min", type=int, help="Interval minutes for collecting metrics. Overrides COLLECT_INTERVAL_MINUTES env.", default=None)
     parser.add_argument("--tz", help="Timezone ID, e.g. 'Asia/Bangkok'. Overrides TIMEZONE env.", default=None)
+    parser.add_argument("--web-server", choices=["flask", "asgi"], help="Dashboard server: threaded Flask or asyncio ASGI. Overrides WEB_SERVER env.", default=None)
     return parser.parse_args()
 
 
@@ -50,12 +51,32 @@ def _bool_env(name: str, default: bool = False) -> bool:
     return str(v).strip().lower() in {"1", "true", "yes", "on"}
 
 
-def _publish_event(event: dict) -> None:
+def _publish_event(event: dict):
     try:
         if bus:
-            bus.publish(event)
+            return bus.publish(event)
     except Exception:
         pass
+    return None
+
+
+def _start_media(text, post_event):
+    # Media is generated in the background and published as a post_media event
+    # referencing the post event; posting never waits for it.
+    try:
+        import media_pipeline
+        if text and media_pipeline.enabled():
+            sender = None
+            try:
+                import config_store
+                sender = config_store.get("sender_name")
+            except Exception:
+                pass
+            return media_pipeline.submit(text, sender=sender or os.getenv("SENDER_NAME", ""),
+                                         ref_id=(post_event or {}).get("id"))
+    except Exception as e:
+        log.error(f"Media pipeline not started: {e}", exc_info=True)
+    return None
 
 
 def main():
@@ -71,6 +92,8 @@ def main():
     except Exception as e:
         log.debug(f"No credentials store applied: {e}")
     args = parse_args()
+    if args.web_server:
+        os.environ["WEB_SERVER"] = args.web_server
 
     mode = args.mode or os.getenv("RUN_MODE", "once").strip()
     tz = args.tz or os.getenv("TIMEZONE", "Asia/Bangkok")
@@ -90,18 +113,24 @@ def main():
         if distribute_all:
             res = distribute_once()
             log.info(f"Distributed to providers: {res}")
-            _publish_event({"type": "post", "ts": time.time(), "text": (res.get("text") if isinstance(res, dict) else None), "providers": (res.get("providers") if isinstance(res, dict) else None)})
+            post_ev = _publish_event({"type": "post", "ts": time.time(), "text": (res.get("text") if isinstance(res, dict) else None), "providers": (res.get("providers") if isinstance(res, dict) else None)})
         else:
             cfg = Config()
             res = post_one_from_file(cfg)
             log.info(f"Posted and promoted on Twitter: {res}")
-            _publish_event({"type": "post", "ts": time.time(), "text": res.get("text") if isinstance(res, dict) else None, "providers": [{"provider": "twitter", "status": "ok"}]})
+            post_ev = _publish_event({"type": "post", "ts": time.time(), "text": res.get("text") if isinstance(res, dict) else None, "providers": [{"provider": "twitter", "status": "ok"}]})
+        media_fut = _start_media(post_ev.get("text") if post_ev else None, post_ev)
         cfg = Config()
         met = collect_metrics(cfg)
         log.info(f"Collected organic metrics: {met}")
         ads = collect_ads_analytics(cfg)
         log.info(f"Collected ads analytics: {ads}")
         _publish_event({"type": "collect", "ts": time.time(), "organic_count": (met.get("count") if isinstance(met, dict) else None), "ads_status": (ads.get("status") if isinstance(ads, dict) else None)})
+        if media_fut is not None:
+            try:
+                log.info(f"Generated media: {media_fut.result()}")
+            except Exception as e:
+                log.error(f"Media generation failed: {e}")
         return
 
     scheduler = BlockingScheduler(timezone=pytz.timezone(tz))
@@ -128,7 +157,8 @@ def main():
             try:
                 text = res.get("text") if isinstance(res, dict) else None
                 providers = res.get("providers") if isinstance(res, dict) else None
-                _publish_event({"type": "post", "ts": time.time(), "text": text, "providers": providers})
+                ev = _publish_event({"type": "post", "ts": time.time(), "text": text, "providers": providers})
+                _start_media(text, ev)
             except Exception:
                 pass
             if wstore and wid:
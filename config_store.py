@@ -1,3 +1,4 @@
+import copy
 import json
 import os
 import threading
@@ -5,6 +6,8 @@ from typing import Any, Dict, Optional
 
 _PATH = os.getenv("RUNTIME_CONFIG_PATH", "runtime_config.json")
 _LOCK = threading.Lock()
+_VERSION = 0                                  # bumped on every update_config()
+_CACHE: Dict[str, Any] = {"sig": None, "data": {}}
 
 _DEFAULTS: Dict[str, Any] = {
     "post_interval_seconds": None,    # None -> use env/cli/default
@@ -12,6 +15,8 @@ _DEFAULTS: Dict[str, Any] = {
     "providers": None,                # list[str] or None to use env
     "sender_name": None,              # override SENDER_NAME
     "tts_lang": "th",
+    "tts_backend": None,              # "gtts" | "espeak" | "piper" | "auto" | None -> TTS_BACKEND
+    "generate_media": None,           # True/False overrides GENERATE_MEDIA (audio/card/video per post)
     "content_mode": None,             # "generate" | "file" | "import" | None -> fallback
     "tweets_file": None,              # override tweets file path
     "import_source_url": None,
@@ -25,14 +30,30 @@ _DEFAULTS: Dict[str, Any] = {
 }
 
 
+def _file_sig() -> Optional[tuple]:
+    try:
+        st = os.stat(_PATH)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
 def _load() -> Dict[str, Any]:
-    if not os.path.exists(_PATH):
+    # Re-parse only when the file changed on disk (mtime/size). Callers get a deep
+    # copy so mutating a nested list/dict never reaches the cache.
+    sig = _file_sig()
+    if sig is None:
         return {}
+    if sig == _CACHE["sig"]:
+        return copy.deepcopy(_CACHE["data"])
     try:
         with open(_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+            data = json.load(f)
     except Exception:
         return {}
+    _CACHE["sig"] = sig
+    _CACHE["data"] = data
+    return copy.deepcopy(data)
 
 
 def _save(data: Dict[str, Any]) -> None:
@@ -42,6 +63,14 @@ def _save(data: Dict[str, Any]) -> None:
     os.replace(tmp, _PATH)
 
 
+def version() -> tuple:
+    """
+    Change token for caches: differs whenever update_config() runs or the file is edited.
+    """
+    with _LOCK:
+        return (_VERSION, _file_sig())
+
+
 def get_config() -> Dict[str, Any]:
     with _LOCK:
         cfg = _DEFAULTS.copy()
@@ -54,6 +83,7 @@ def get(key: str, default: Any = None) -> Any:
 
 
 def update_config(patch: Dict[str, Any]) -> Dict[str, Any]:
+    global _VERSION
     with _LOCK:
         cur = _load()
         # Only update keys we know
@@ -62,4 +92,5 @@ def update_config(patch: Dict[str, Any]) -> Dict[str, Any]:
                 patch.pop(k, None)
         cur.update(patch)
         _save(cur)
-        return get_config()
\ No newline at end of file
+        _VERSION += 1
+    return get_config()
\ No newline at end of file
@@ -5,6 +5,7 @@ from typing import Dict, Optional
 
 _PATH = os.getenv("CREDENTIALS_PATH", "credentials.json")
 _LOCK = threading.Lock()
+_VERSION = 0  # bumped on every update(); lets callers cache objects built from credentials
 
 # Allowlist of credential keys we manage via the dashboard
 ALLOWED_KEYS = [
@@ -67,6 +68,19 @@ def mask_value(v: Optional[str]) -> str:
     return v[:2] + "*" * (len(v) - 4) + v[-2:]
 
 
+def version() -> tuple:
+    """
+    Change token: differs whenever update() runs or credentials.json is edited.
+    """
+    with _LOCK:
+        try:
+            st = os.stat(_PATH)
+            sig = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            sig = None
+        return (_VERSION, sig)
+
+
 def get() -> Dict[str, str]:
     with _LOCK:
         return _load()
@@ -86,6 +100,7 @@ def update(patch: Dict[str, Optional[str]]) -> Dict[str, str]:
     - Non-empty string sets the value and exports to os.environ.
     Returns the full masked dictionary after update.
     """
+    global _VERSION
     if not isinstance(patch, dict):
         patch = {}
     with _LOCK:
@@ -107,4 +122,5 @@ def update(patch: Dict[str, Optional[str]]) -> Dict[str, str]:
         _save(cur)
         if changed:
             _apply_env(changed)
+        _VERSION += 1
         return {k: mask_value(v) for k, v in cur.items()}
\ No newline at end of file
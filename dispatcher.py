@@ -2,6 +2,8 @@ import os
 import logging
 import requests
 
+import http_pool
+
 log = logging.getLogger("dispatcher")
 
 
@@ -21,7 +23,7 @@ def post_mastodon(text: str) -> dict:
     if not base or not token:
         return {"error": "MASTODON_BASE_URL or MASTODON_ACCESS_TOKEN missing"}
     url = f"{base.rstrip('/')}/api/v1/statuses"
-    resp = requests.post(url, data={"status": text}, headers={"Authorization": f"Bearer {token}"}, timeout=15)
+    resp = http_pool.post(url, provider="mastodon", data={"status": text}, headers={"Authorization": f"Bearer {token}"}, timeout=15)
     resp.raise_for_status()
     return resp.json()
 
@@ -41,12 +43,12 @@ def post_reddit(text: str) -> dict:
     auth = requests.auth.HTTPBasicAuth(client_id, client_secret)
     data = {"grant_type": "password", "username": username, "password": password}
     headers = {"User-Agent": "ayutthaya-poster/0.1"}
-    tok = requests.post("https://www.reddit.com/api/v1/access_token", auth=auth, data=data, headers=headers, timeout=15)
+    tok = http_pool.post("https://www.reddit.com/api/v1/access_token", provider="reddit", auth=auth, data=data, headers=headers, timeout=15)
     tok.raise_for_status()
     access_token = tok.json()["access_token"]
     headers["Authorization"] = f"Bearer {access_token}"
     # Submit text post
-    submit = requests.post("https://oauth.reddit.com/api/submit", headers=headers, timeout=15, data={
+    submit = http_pool.post("https://oauth.reddit.com/api/submit", provider="reddit", headers=headers, timeout=15, data={
         "sr": subreddit,
         "kind": "self",
         "title": (text[:250] or "Post"),
@@ -65,7 +67,7 @@ def post_facebook_page(text: str) -> dict:
     if not page_id or not token:
         return {"error": "FACEBOOK_PAGE_ID or FACEBOOK_PAGE_ACCESS_TOKEN missing"}
     url = f"https://graph.facebook.com/v21.0/{page_id}/feed"
-    resp = requests.post(url, data={"message": text}, params={"access_token": token}, timeout=15)
+    resp = http_pool.post(url, provider="facebook", data={"message": text}, params={"access_token": token}, timeout=15)
     resp.raise_for_status()
     return resp.json()
 
@@ -96,7 +98,7 @@ def post_linkedin(text: str) -> dict:
         },
         "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}
     }
-    resp = requests.post(url, headers=headers, json=payload, timeout=15)
+    resp = http_pool.post(url, provider="linkedin", headers=headers, json=payload, timeout=15)
     resp.raise_for_status()
     return resp.json()
 
@@ -110,7 +112,7 @@ def post_telegram(text: str) -> dict:
     if not bot_token or not chat_id:
         return {"error": "TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID missing"}
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    resp = requests.post(url, json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"}, timeout=15)
+    resp = http_pool.post(url, provider="telegram", json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"}, timeout=15)
     resp.raise_for_status()
     return resp.json()
 
@@ -122,7 +124,7 @@ def post_discord(text: str) -> dict:
     webhook = os.getenv("DISCORD_WEBHOOK_URL")
     if not webhook:
         return {"error": "DISCORD_WEBHOOK_URL missing"}
-    resp = requests.post(webhook, json={"content": text}, timeout=15)
+    resp = http_pool.post(webhook, provider="discord", json={"content": text}, timeout=15)
     resp.raise_for_status()
     return {"status": "ok"}
 
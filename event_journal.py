@@ -0,0 +1,197 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger("event_journal")
+
+# Batched JSONL journal: publishers enqueue, one writer thread owns the file handle
+FLUSH_BYTES = int(os.getenv("EVENTS_JOURNAL_FLUSH_BYTES", str(64 * 1024)))      # flush when buffer reaches this size
+FLUSH_SEC = float(os.getenv("EVENTS_JOURNAL_FLUSH_SEC", "1.0"))                 # ...or when this much time passed
+FSYNC = os.getenv("EVENTS_JOURNAL_FSYNC", "interval").strip().lower()           # never | interval | always
+FSYNC_INTERVAL_SEC = float(os.getenv("EVENTS_JOURNAL_FSYNC_INTERVAL_SEC", "10"))
+ROTATE_BYTES = int(os.getenv("EVENTS_JOURNAL_ROTATE_BYTES", str(50 * 1024 * 1024)))  # 0 disables size rotation
+ROTATE_DAILY = os.getenv("EVENTS_JOURNAL_ROTATE_DAILY", "true").lower() in {"1", "true", "yes", "on"}
+COMPRESS = os.getenv("EVENTS_JOURNAL_COMPRESS", "true").lower() in {"1", "true", "yes", "on"}
+QUEUE_MAX = int(os.getenv("EVENTS_JOURNAL_QUEUE_MAX", "10000"))                # drop (and count) beyond this
+
+_queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=QUEUE_MAX)
+_lock = threading.Lock()
+_writer: Optional[threading.Thread] = None
+_path: Optional[str] = None
+_flushed = threading.Event()
+_closing = threading.Event()
+_stats = {"written": 0, "dropped": 0, "flushes": 0, "rotations": 0}
+
+
+def start(path: str) -> None:
+    """
+    Start the writer thread for path (idempotent).
+    """
+    global _writer, _path
+    with _lock:
+        if _writer is not None:
+            return
+        _path = path
+        _closing.clear()
+        _writer = threading.Thread(target=_run, daemon=True, name="event-journal")
+        _writer.start()
+
+
+def append(event: Dict[str, Any]) -> None:
+    """
+    Queue one event for the journal; never blocks the publisher.
+    """
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        with _lock:
+            _stats["dropped"] += 1
+
+
+def flush(timeout: float = 5.0) -> None:
+    """
+    Ask the writer to write out everything queued so far and wait for it.
+    """
+    if _writer is None or not _writer.is_alive():
+        return
+    _flushed.clear()
+    try:
+        _queue.put(None, timeout=timeout)  # marker: everything before it gets written
+    except queue.Full:
+        return
+    _flushed.wait(timeout)
+
+
+def close(timeout: float = 5.0) -> None:
+    """
+    Write out everything queued, fsync (unless EVENTS_JOURNAL_FSYNC=never) and
+    stop the writer. Registered at exit.
+    """
+    global _writer
+    writer = _writer
+    if writer is None or not writer.is_alive():
+        return
+    _closing.set()
+    flush(timeout)
+    writer.join(timeout)
+    with _lock:
+        if _writer is writer:
+            _writer = None
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_stats)
+    out["queued"] = _queue.qsize()
+    out["path"] = _path
+    return out
+
+
+def _day(ts: float) -> str:
+    return time.strftime("%Y%m%d", time.localtime(ts))
+
+
+def _compress(src: str) -> None:
+    try:
+        with open(src, "rb") as fin, gzip.open(src + ".gz", "wb") as fout:
+            shutil.copyfileobj(fin, fout)
+        os.remove(src)
+    except Exception as e:
+        log.warning(f"Compressing {src} failed: {e}")
+
+
+def _rotate(f, path: str, day: str):
+    f.close()
+    base, ext = os.path.splitext(path)
+    stamp = f"{base}-{day}-{time.strftime('%H%M%S')}"
+    seg = f"{stamp}{ext}"
+    n = 1
+    while os.path.exists(seg) or os.path.exists(seg + ".gz"):
+        seg = f"{stamp}-{n}{ext}"
+        n += 1
+    try:
+        os.replace(path, seg)
+        with _lock:
+            _stats["rotations"] += 1
+        if COMPRESS:
+            threading.Thread(target=_compress, args=(seg,), daemon=True, name="event-journal-gz").start()
+    except Exception as e:
+        log.warning(f"Rotating {path} failed: {e}")
+    return open(path, "a", encoding="utf-8")
+
+
+def _run() -> None:
+    # Bound once: the writer keeps its own queue and events even if start() runs again
+    q, flushed, closing = _queue, _flushed, _closing
+    path = _path or "events.jsonl"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "a", encoding="utf-8")
+    size = f.tell()
+    day = _day(os.path.getmtime(path)) if size else _day(time.time())
+    buf: List[str] = []
+    buf_bytes = 0
+    last_flush = time.monotonic()
+    last_sync = last_flush
+
+    while True:
+        marker = False
+        try:
+            ev = q.get(timeout=FLUSH_SEC)
+            marker = ev is None
+        except queue.Empty:
+            ev = None
+        if ev is not None:
+            try:
+                line = json.dumps(ev, ensure_ascii=False) + "\n"
+                buf.append(line)
+                buf_bytes += len(line.encode("utf-8"))
+            except Exception:
+                # do not block pipeline due to a single unserializable event
+                pass
+
+        now = time.monotonic()
+        due = buf_bytes >= FLUSH_BYTES or (now - last_flush) >= FLUSH_SEC or marker
+        if not due:
+            continue
+        try:
+            today = _day(time.time())
+            if size and ((ROTATE_DAILY and today != day) or (ROTATE_BYTES and size + buf_bytes > ROTATE_BYTES)):
+                f = _rotate(f, path, day)
+                size = 0
+            day = today
+            if buf:
+                f.write("".join(buf))
+                f.flush()
+                size += buf_bytes
+                with _lock:
+                    _stats["written"] += len(buf)
+                    _stats["flushes"] += 1
+                if FSYNC == "always" or (FSYNC == "interval" and now - last_sync >= FSYNC_INTERVAL_SEC):
+                    os.fsync(f.fileno())
+                    last_sync = now
+        except Exception as e:
+            log.warning(f"Event journal write failed: {e}")
+        buf = []
+        buf_bytes = 0
+        last_flush = now
+        if marker and closing.is_set():
+            try:
+                if FSYNC != "never":
+                    os.fsync(f.fileno())
+                f.close()
+            except Exception as e:
+                log.warning(f"Event journal close failed: {e}")
+            flushed.set()
+            return
+        if marker:
+            flushed.set()
+
+
+atexit.register(close)
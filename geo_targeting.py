@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import http_pool
+
+log = logging.getLogger("geo_targeting")
+
+# Location lookups are cached on disk with a TTL (keyed by country + query) and
+# line-item targeting is reconciled as a diff: only missing criteria are created
+# (batch endpoint, or a bounded worker pool) and the applied set is remembered
+# so unchanged line items cost no API calls at all.
+_PATH = os.getenv("GEO_CACHE_PATH", "geo_cache.json")
+_LOCK = threading.Lock()
+LOCATION_TTL_SEC = float(os.getenv("GEO_CACHE_TTL_SEC", str(7 * 86400)))      # location lookups
+APPLIED_TTL_SEC = float(os.getenv("GEO_APPLIED_TTL_SEC", "3600"))             # trust remembered line-item criteria
+USE_BATCH = os.getenv("GEO_USE_BATCH", "true").lower() in {"1", "true", "yes", "on"}
+BATCH_SIZE = min(500, int(os.getenv("GEO_BATCH_SIZE", "500")))                # batch endpoint max
+WORKERS = int(os.getenv("GEO_WORKERS", "8"))                                  # fallback parallel POSTs
+PRUNE = os.getenv("GEO_PRUNE", "false").lower() in {"1", "true", "yes", "on"}  # delete criteria not desired
+
+_cache: Optional[Dict[str, Any]] = None
+
+
+def _load() -> Dict[str, Any]:
+    global _cache
+    if _cache is None:
+        data: Dict[str, Any] = {}
+        if os.path.exists(_PATH):
+            try:
+                with open(_PATH, "r", encoding="utf-8") as f:
+                    data = json.load(f) or {}
+            except Exception:
+                data = {}
+        data.setdefault("locations", {})
+        data.setdefault("applied", {})
+        _cache = data
+    return _cache
+
+
+def _save() -> None:
+    tmp = f"{_PATH}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_cache, f, ensure_ascii=False)
+    os.replace(tmp, _PATH)
+
+
+def locations(country_code: str, query: str, fetch: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Cached location search. fetch() performs the API lookup on a miss or after
+    GEO_CACHE_TTL_SEC; empty results are not cached.
+    """
+    key = f"{country_code.upper()}|{query.strip().lower()}"
+    now = time.time()
+    with _LOCK:
+        hit = _load()["locations"].get(key)
+        if hit and now - float(hit.get("ts", 0)) < LOCATION_TTL_SEC:
+            return hit["data"]
+    data = fetch()
+    if data:
+        with _LOCK:
+            _load()["locations"][key] = {"ts": now, "data": data}
+            try:
+                _save()
+            except Exception:
+                pass
+    return data
+
+
+def diff(existing: Set[str], desired: Set[str]) -> Tuple[Set[str], Set[str]]:
+    """
+    (to_add, to_remove) for a line item's LOCATION criteria.
+    """
+    return desired - existing, (existing - desired) if PRUNE else set()
+
+
+def _batch(base: str, account_id: str, auth, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # One batch request (at most BATCH_SIZE operations)
+    resp = http_pool.post(f"{base}/batch/accounts/{account_id}/targeting_criteria", auth=auth, json=ops)
+    resp.raise_for_status()
+    return resp.json().get("data", []) or []
+
+
+def _parallel(fn: Callable[[str], Any], items: List[str]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    if not items:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(WORKERS, len(items))), thread_name_prefix="geo") as pool:
+        for item, fut in [(x, pool.submit(fn, x)) for x in items]:
+            try:
+                results[item] = fut.result()
+            except Exception as e:
+                log.error(f"Targeting change failed for {item}: {e}", exc_info=True)
+    return results
+
+
+def apply(base: str, account_id: str, auth, line_item_id: str, location_ids: List[str],
+          list_existing: Callable[[], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Reconcile a line item's LOCATION criteria with location_ids.
+    Returns {"created": [criteria ids], "removed": [...], "unchanged": n, "cached": bool}.
+    """
+    desired = {str(x) for x in location_ids if x}
+    now = time.time()
+    with _LOCK:
+        applied = _load()["applied"].get(str(line_item_id))
+    if applied and now - float(applied.get("ts", 0)) < APPLIED_TTL_SEC and set(applied["values"]) >= desired \
+            and (not PRUNE or set(applied["values"]) == desired):
+        return {"created": [], "removed": [], "unchanged": len(desired), "cached": True}
+
+    criteria = [c for c in list_existing() if c.get("targeting_type") == "LOCATION"]
+    by_value = {str(c.get("targeting_value")): c for c in criteria}
+    to_add, to_remove = diff(set(by_value), desired)
+    created: List[str] = []
+    removed: List[str] = []
+    url = f"{base}/accounts/{account_id}/targeting_criteria"
+
+    if USE_BATCH and (to_add or to_remove):
+        targets = [("add", v) for v in sorted(to_add)] + [("remove", v) for v in sorted(to_remove)]
+        ops = [{"operation_type": "Create",
+                "params": {"line_item_id": line_item_id, "targeting_type": "LOCATION", "targeting_value": v}}
+               if kind == "add" else
+               {"operation_type": "Delete", "params": {"targeting_criterion_id": by_value[v].get("id")}}
+               for kind, v in targets]
+        done = 0
+        try:
+            for i in range(0, len(ops), BATCH_SIZE):
+                for item in _batch(base, account_id, auth, ops[i:i + BATCH_SIZE]):
+                    if item.get("deleted"):
+                        removed.append(item.get("id"))
+                    else:
+                        created.append(item.get("id"))
+                done = min(len(ops), i + BATCH_SIZE)
+        except Exception as e:
+            log.warning(f"Batch targeting failed after {done}/{len(ops)} operations ({e}); "
+                        f"falling back to parallel requests for the rest")
+        # Batch requests are atomic per chunk, so only chunks that did not complete are retried
+        to_add = {v for kind, v in targets[done:] if kind == "add"}
+        to_remove = {v for kind, v in targets[done:] if kind == "remove"}
+
+    def _create(v: str) -> str:
+        payload = {"line_item_id": line_item_id, "targeting_type": "LOCATION", "targeting_value": v}
+        resp = http_pool.post(url, auth=auth, json=payload)
+        resp.raise_for_status()
+        return resp.json()["data"]["id"]
+
+    def _delete(v: str) -> str:
+        cid = by_value[v].get("id")
+        resp = http_pool.request("DELETE", f"{url}/{cid}", auth=auth)
+        resp.raise_for_status()
+        return cid
+
+    made = _parallel(_create, sorted(to_add))
+    gone = _parallel(_delete, sorted(to_remove))
+    created.extend(made.values())
+    removed.extend(gone.values())
+
+    if len(made) == len(to_add) and len(gone) == len(to_remove):
+        values = desired if PRUNE else set(by_value) | desired
+        with _LOCK:
+            _load()["applied"][str(line_item_id)] = {"ts": now, "values": sorted(values)}
+            try:
+                _save()
+            except Exception:
+                pass
+    return {"created": created, "removed": removed, "unchanged": len(desired & set(by_value)), "cached": False}
+
+
+def forget(line_item_id: Optional[str] = None) -> None:
+    with _LOCK:
+        applied = _load()["applied"]
+        if line_item_id is None:
+            applied.clear()
+        else:
+            applied.pop(str(line_item_id), None)
+        try:
+            _save()
+        except Exception:
+            pass
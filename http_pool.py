@@ -0,0 +1,151 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared transport: one keep-alive requests.Session per (provider, scheme://host).
+# Providers get their own session even on a shared host (facebook and instagram
+# both call graph.facebook.com), so cookie jars are never shared between them.
+# Status codes (429/5xx) are not retried here: circuit_breaker owns retries for
+# provider calls, and a second retry layer would multiply attempts per call.
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))              # connections kept per host
+POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "false").lower() in {"1", "true", "yes", "on"}
+RETRY_TOTAL = int(os.getenv("HTTP_RETRY_TOTAL", "2"))                 # connect/read retries (idempotent methods)
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.3"))
+CONNECT_TIMEOUT_SEC = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", "5"))
+READ_TIMEOUT_SEC = float(os.getenv("HTTP_READ_TIMEOUT_SEC", "20"))
+
+_LOCK = threading.Lock()
+_SESSIONS: Dict[str, requests.Session] = {}
+_COUNTS: Dict[str, Dict[str, int]] = {}
+_LABELS: Dict[str, Tuple[str, str]] = {}  # key -> (provider, host)
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _key(url: str, provider: Optional[str] = None) -> str:
+    host = _host_key(url)
+    return f"{provider}@{host}" if provider else host
+
+
+def _new_session() -> requests.Session:
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status=0,                         # no status-code retries; see module comment
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry, pool_block=POOL_BLOCK)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def session_for(url: str, provider: Optional[str] = None) -> requests.Session:
+    """
+    Return the pooled session for provider and the url's host, creating it on first use.
+    """
+    key = _key(url, provider)
+    with _LOCK:
+        s = _SESSIONS.get(key)
+        if s is None:
+            s = _new_session()
+            _SESSIONS[key] = s
+            _COUNTS[key] = {"requests": 0, "errors": 0}
+            _LABELS[key] = (provider or "", _host_key(url))
+        _COUNTS[key]["requests"] += 1
+        return s
+
+
+def request(method: str, url: str, provider: Optional[str] = None, **kwargs: Any) -> requests.Response:
+    """
+    Drop-in for requests.request() that goes through the per-provider, per-host pool.
+    Applies (connect, read) timeouts unless the caller passes timeout=.
+    """
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT_SEC, READ_TIMEOUT_SEC))
+    s = session_for(url, provider)
+    try:
+        return s.request(method, url, **kwargs)
+    except Exception:
+        with _LOCK:
+            _COUNTS[_key(url, provider)]["errors"] += 1
+        raise
+
+
+def get(url: str, provider: Optional[str] = None, **kwargs: Any) -> requests.Response:
+    return request("GET", url, provider, **kwargs)
+
+
+def post(url: str, provider: Optional[str] = None, **kwargs: Any) -> requests.Response:
+    return request("POST", url, provider, **kwargs)
+
+
+def _pool_counters(s: requests.Session) -> Dict[str, int]:
+    # urllib3 tracks how many sockets each pool opened vs. how many requests it served
+    opened = 0
+    served = 0
+    for adapter in set(s.adapters.values()):
+        manager = getattr(adapter, "poolmanager", None)
+        pools = getattr(manager, "pools", None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += int(getattr(pool, "num_connections", 0))
+            served += int(getattr(pool, "num_requests", 0))
+    return {"connections_opened": opened, "pool_requests": served}
+
+
+def stats() -> Dict[str, Any]:
+    """
+    Per-session counters keyed "[provider@]scheme://host"; 'connections_reused' is
+    requests served on an already-open socket.
+    """
+    with _LOCK:
+        items = list(_SESSIONS.items())
+        counts = {k: dict(v) for k, v in _COUNTS.items()}
+        labels = dict(_LABELS)
+    hosts: Dict[str, Dict[str, int]] = {}
+    for key, s in items:
+        c = counts.get(key, {})
+        pc = _pool_counters(s)
+        provider, host = labels.get(key, ("", key))
+        hosts[key] = {
+            "provider": provider,
+            "host": host,
+            "requests": c.get("requests", 0),
+            "errors": c.get("errors", 0),
+            "connections_opened": pc["connections_opened"],
+            "connections_reused": max(0, pc["pool_requests"] - pc["connections_opened"]),
+        }
+    return {
+        "pool_maxsize": POOL_MAXSIZE,
+        "retry_total": RETRY_TOTAL,
+        "timeout_sec": [CONNECT_TIMEOUT_SEC, READ_TIMEOUT_SEC],
+        "hosts": hosts,
+    }
+
+
+def close_all(host_url: Optional[str] = None, provider: Optional[str] = None) -> None:
+    with _LOCK:
+        keys = [_key(host_url, provider)] if host_url else list(_SESSIONS.keys())
+        for k in keys:
+            s = _SESSIONS.pop(k, None)
+            _COUNTS.pop(k, None)
+            _LABELS.pop(k, None)
+            if s is not None:
+                try:
+                    s.close()
+                except Exception:
+                    pass
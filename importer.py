@@ -1,5 +1,120 @@
+import codecs
+import hashlib
 import json
-import requests
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import http_pool
+
+log = logging.getLogger("importer")
+
+# Remote sources are streamed into a deduplicated local snapshot by a background
+# refresher; the poster only ever reads the snapshot.
+SNAPSHOT_DIR = os.getenv("IMPORT_SNAPSHOT_DIR", os.path.join("outputs", "import"))
+REFRESH_SEC = float(os.getenv("IMPORT_REFRESH_SEC", "300"))           # background refresh period
+CONNECT_TIMEOUT_SEC = float(os.getenv("IMPORT_CONNECT_TIMEOUT_SEC", "5"))
+READ_TIMEOUT_SEC = float(os.getenv("IMPORT_READ_TIMEOUT_SEC", "30"))  # per socket read, not whole body
+MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(64 * 1024 * 1024)))  # abort bodies larger than this
+_CHUNK = 64 * 1024
+
+_LOCK = threading.Lock()
+_snapshots: Dict[Tuple[str, str], Dict[str, Any]] = {}
+# slot -> ((url, fmt), thread, stop event); one refresher per configured source
+_refreshers: Dict[str, Tuple[Tuple[str, str], threading.Thread, threading.Event]] = {}
+
+
+def _iter_chunks(resp, limit_bytes: int = 0) -> Iterator[bytes]:
+    # Body bytes as streamed (after Content-Encoding), aborting past limit_bytes
+    declared = resp.headers.get("Content-Length")
+    if limit_bytes and declared and declared.isdigit() and int(declared) > limit_bytes:
+        raise ValueError(f"Import source exceeds IMPORT_MAX_BYTES ({limit_bytes})")
+    total = 0
+    for chunk in resp.iter_content(chunk_size=_CHUNK):
+        total += len(chunk)
+        if limit_bytes and total > limit_bytes:
+            raise ValueError(f"Import source exceeds IMPORT_MAX_BYTES ({limit_bytes})")
+        yield chunk
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for raw in lines:
+            yield raw.decode("utf-8")
+    if pending:
+        yield pending.decode("utf-8")
+
+
+def _iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    # Incremental parse of a top-level JSON array: items are yielded as soon as
+    # they are complete, so the whole body is never held in memory.
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    started = False
+    done = False
+    chunks = iter(chunks)
+    while not done:
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buf = buf[pos:] + (utf8.decode(b"", final=True) if eof else utf8.decode(chunk))
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("JSON import must be a list of strings")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                done = True
+                break
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                break  # incomplete item; wait for more data
+            if end == len(buf) and not eof:
+                break  # a number could continue in the next chunk
+            yield item
+            pos = end
+        if eof and not done:
+            raise ValueError("Truncated JSON array")
+
+
+def _iter_texts(resp, fmt: str) -> Iterator[str]:
+    chunks = _iter_chunks(resp, MAX_BYTES)
+    if fmt == "json":
+        for x in _iter_json_array(chunks):
+            t = str(x).strip()
+            if t:
+                yield t
+        return
+    for line in _iter_lines(chunks):
+        t = line.strip()
+        if t:
+            yield t
+
+
+def _dedupe(texts: Iterable[str]) -> List[str]:
+    seen = set()
+    out: List[str] = []
+    for t in texts:
+        if t not in seen:
+            seen.add(t)
+            out.append(t)
+    return out
 
 
 def fetch_texts_from_url(url: str, fmt: str = "lines") -> list:
@@ -8,14 +123,151 @@ def fetch_texts_from_url(url: str, fmt: str = "lines") -> list:
     fmt:
       - "lines": treat response body as UTF-8 text, one post per line
       - "json": response is a JSON array of strings
+    The body is streamed and duplicates are dropped (first occurrence kept).
     """
-    resp = requests.get(url, timeout=15)
-    resp.raise_for_status()
-    if fmt == "json":
-        data = resp.json()
-        if not isinstance(data, list):
-            raise ValueError("JSON import must be a list of strings")
-        return [str(x).strip() for x in data if str(x).strip()]
-    # default: lines
-    text = resp.text
-    return [line.strip() for line in text.splitlines() if line.strip()]
\ No newline at end of file
+    resp = http_pool.get(url, stream=True, timeout=(CONNECT_TIMEOUT_SEC, READ_TIMEOUT_SEC))
+    try:
+        resp.raise_for_status()
+        return _dedupe(_iter_texts(resp, fmt))
+    finally:
+        resp.close()
+
+
+# ===== Local snapshot =====
+
+def _snapshot_path(url: str, fmt: str) -> str:
+    h = hashlib.sha1(f"{fmt}|{url}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f"{h}.jsonl")
+
+
+def _read_snapshot(url: str, fmt: str) -> Optional[Dict[str, Any]]:
+    # First line is metadata, then one JSON string per text
+    path = _snapshot_path(url, fmt)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.loads(f.readline() or "{}")
+            texts = [json.loads(line) for line in f if line.strip()]
+        return {"meta": meta, "texts": texts}
+    except Exception:
+        return None
+
+
+def _write_snapshot(url: str, fmt: str, meta: Dict[str, Any], texts: List[str]) -> None:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(url, fmt)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        for t in texts:
+            f.write(json.dumps(t, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def _current(url: str, fmt: str) -> Optional[Dict[str, Any]]:
+    key = (url, fmt)
+    with _LOCK:
+        snap = _snapshots.get(key)
+    if snap is None:
+        snap = _read_snapshot(url, fmt)
+        if snap is not None:
+            with _LOCK:
+                snap = _snapshots.setdefault(key, snap)
+    return snap
+
+
+def refresh(url: str, fmt: str = "lines") -> Dict[str, Any]:
+    """
+    Conditionally re-fetch url into its snapshot (If-None-Match / If-Modified-Since).
+    Returns {"status": "updated"|"not_modified", "count": n}.
+    """
+    snap = _current(url, fmt)
+    meta = dict((snap or {}).get("meta") or {})
+    headers = {}
+    if snap is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    resp = http_pool.get(url, headers=headers, stream=True, timeout=(CONNECT_TIMEOUT_SEC, READ_TIMEOUT_SEC))
+    try:
+        if resp.status_code == 304 and snap is not None:
+            meta["checked_at"] = time.time()
+            snap["meta"] = meta
+            return {"status": "not_modified", "count": len(snap["texts"])}
+        resp.raise_for_status()
+        texts = _dedupe(_iter_texts(resp, fmt))
+        new_meta = {
+            "url": url,
+            "format": fmt,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "checked_at": time.time(),
+            "count": len(texts),
+        }
+    finally:
+        resp.close()
+    _write_snapshot(url, fmt, new_meta, texts)
+    with _LOCK:
+        _snapshots[(url, fmt)] = {"meta": new_meta, "texts": texts}
+    return {"status": "updated", "count": len(texts)}
+
+
+def _refresh_loop(url: str, fmt: str, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            refresh(url, fmt)
+        except Exception as e:
+            log.warning(f"Import refresh failed for {url}: {e}")
+        stop.wait(max(1.0, REFRESH_SEC))
+
+
+def ensure_refresher(url: str, fmt: str = "lines", slot: str = "import_source_url") -> None:
+    """
+    Run the background refresher for (url, fmt) in this config slot. A slot
+    holds one refresher: a different url/format stops the previous one.
+    """
+    key = (url, fmt)
+    with _LOCK:
+        cur = _refreshers.get(slot)
+        if cur and cur[0] == key and cur[1].is_alive():
+            return
+        if cur:
+            cur[2].set()
+        stop = threading.Event()
+        t = threading.Thread(target=_refresh_loop, args=(url, fmt, stop), daemon=True, name="import-refresh")
+        _refreshers[slot] = (key, t, stop)
+    t.start()
+
+
+def stop_refresher(slot: str = "import_source_url") -> None:
+    with _LOCK:
+        cur = _refreshers.pop(slot, None)
+    if cur:
+        cur[2].set()
+
+
+def snapshot_texts(url: str, fmt: str = "lines") -> List[str]:
+    """
+    Texts from the local snapshot of url; starts the background refresher.
+    Never touches the network. Raises LookupError before the first snapshot exists.
+    The returned list is shared; callers must not modify it.
+    """
+    ensure_refresher(url, fmt)
+    snap = _current(url, fmt)
+    if snap is None:
+        raise LookupError(f"No import snapshot yet for {url}")
+    return snap["texts"]
+
+
+def status() -> Dict[str, Any]:
+    with _LOCK:
+        items = list(_snapshots.items())
+        running = {slot: f"{key[1]}:{key[0]}" for slot, (key, t, _) in _refreshers.items() if t.is_alive()}
+    return {
+        "refresh_sec": REFRESH_SEC,
+        "refreshers": running,
+        "snapshots": [dict(snap.get("meta") or {}) for _, snap in items],
+    }
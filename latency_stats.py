@@ -0,0 +1,115 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Streaming latency histograms with log-spaced buckets (HDR-style, ~GROWTH-1
+# relative error) kept in one-minute slices so percentiles can be read over
+# sliding windows without storing individual samples.
+MIN_SEC = 1e-4
+GROWTH = float(os.getenv("LATENCY_BUCKET_GROWTH", "1.04"))
+WINDOWS_SEC = [int(x) for x in os.getenv("LATENCY_WINDOWS_SEC", "60,300,3600").split(",") if x.strip()]
+PERCENTILES = (50.0, 90.0, 99.0)
+
+_LOG_GROWTH = math.log(GROWTH)
+_MAX_SLICES = max(1, max(WINDOWS_SEC or [60]) // 60)
+_LOCK = threading.Lock()
+_series: Dict[Tuple[str, str], Deque["_Slice"]] = {}
+
+
+def _bucket(value: float) -> int:
+    return int(math.log(max(value, MIN_SEC) / MIN_SEC) / _LOG_GROWTH)
+
+
+def _bucket_value(idx: int) -> float:
+    # midpoint of the bucket's range
+    return MIN_SEC * (GROWTH ** idx) * (1.0 + GROWTH) / 2.0
+
+
+class _Slice:
+    __slots__ = ("minute", "counts", "n", "total", "max")
+
+    def __init__(self, minute: int):
+        self.minute = minute
+        self.counts: Dict[int, int] = {}
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+def record(kind: str, name: str, seconds: float, now: Optional[float] = None) -> None:
+    """
+    Add one latency sample for (kind, name), e.g. ("workflow", "post") or ("provider", "line").
+    """
+    if seconds is None:
+        return
+    seconds = max(0.0, float(seconds))
+    minute = int((now or time.time()) // 60)
+    idx = _bucket(seconds)
+    with _LOCK:
+        slices = _series.get((kind, name))
+        if slices is None:
+            slices = deque(maxlen=_MAX_SLICES)
+            _series[(kind, name)] = slices
+        if not slices or slices[-1].minute < minute:
+            slices.append(_Slice(minute))
+        s = next((x for x in reversed(slices) if x.minute <= minute), slices[0])
+        s.counts[idx] = s.counts.get(idx, 0) + 1
+        s.n += 1
+        s.total += seconds
+        if seconds > s.max:
+            s.max = seconds
+
+
+def _summarize(slices: List[_Slice]) -> Dict[str, Any]:
+    counts: Dict[int, int] = {}
+    n = 0
+    total = 0.0
+    mx = 0.0
+    for s in slices:
+        for k, c in s.counts.items():
+            counts[k] = counts.get(k, 0) + c
+        n += s.n
+        total += s.total
+        mx = max(mx, s.max)
+    out: Dict[str, Any] = {"count": n}
+    if not n:
+        return out
+    out["mean"] = total / n
+    out["max"] = mx
+    ordered = sorted(counts.items())
+    for p in PERCENTILES:
+        rank = max(1, int(math.ceil(p / 100.0 * n)))
+        seen = 0
+        for idx, c in ordered:
+            seen += c
+            if seen >= rank:
+                out[f"p{int(p)}"] = min(_bucket_value(idx), mx)
+                break
+    return out
+
+
+def snapshot(kind: Optional[str] = None, name: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    {"<kind>:<name>": {"<window>s": {count, mean, max, p50, p90, p99}}} for every series.
+    """
+    now_min = int(time.time() // 60)
+    with _LOCK:
+        items = [(k, list(v)) for k, v in _series.items()
+                 if (kind is None or k[0] == kind) and (name is None or k[1] == name)]
+    out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for (k, n), slices in items:
+        windows: Dict[str, Dict[str, Any]] = {}
+        for w in WINDOWS_SEC:
+            oldest = now_min - max(1, w // 60) + 1
+            windows[f"{w}s"] = _summarize([s for s in slices if s.minute >= oldest])
+        out[f"{k}:{n}"] = windows
+    return out
+
+
+def reset(kind: Optional[str] = None) -> None:
+    with _LOCK:
+        for key in [k for k in _series if kind is None or k[0] == kind]:
+            del _series[key]
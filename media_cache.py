@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import telemetry
+
+# Generated media is content-addressed: each file is named after a hash of its
+# inputs and render parameters, so a repeated caption reuses the earlier audio,
+# card and video instead of rendering a new timestamped copy. The media
+# directories are kept under MEDIA_CACHE_MAX_MB / MEDIA_CACHE_MAX_FILES by
+# evicting the least recently used files (legacy timestamped outputs included).
+ROOT = "outputs"
+DIRS = {"audio": os.path.join(ROOT, "audio"), "image": os.path.join(ROOT, "images"),
+        "video": os.path.join(ROOT, "video")}
+ENABLED = os.getenv("MEDIA_CACHE", "true").lower() in {"1", "true", "yes", "on"}
+MAX_BYTES = int(float(os.getenv("MEDIA_CACHE_MAX_MB", "2048")) * 1024 * 1024)  # across audio/images/video
+MAX_FILES = int(os.getenv("MEDIA_CACHE_MAX_FILES", "0"))                      # 0 = no file-count cap
+
+_LOCK = threading.Lock()
+_index: Optional["OrderedDict[str, Tuple[int, str]]"] = None  # path -> (size, kind), oldest first
+_bytes = 0
+_stats: Dict[str, Dict[str, int]] = {}
+
+_M_LOOKUPS = telemetry.counter("media_cache_lookups", "Media cache lookups by kind and result")
+_M_EVICTED = telemetry.counter("media_cache_evictions", "Media files evicted from outputs/")
+
+
+def key(kind: str, params: Dict[str, Any], files: Iterable[Optional[str]] = ()) -> str:
+    """
+    Cache key for a render: kind, its parameters and the bytes of any input files.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(kind.encode())
+    h.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    for p in files:
+        h.update(b"\0")
+        if not p:
+            continue
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def _load_index() -> "OrderedDict[str, Tuple[int, str]]":
+    # caller holds _LOCK; first use scans the media dirs, ordered by mtime
+    global _index, _bytes
+    if _index is None:
+        entries = []
+        for kind, d in DIRS.items():
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if e.is_file() and not e.name.startswith("."):  # skip in-progress temp files
+                            st = e.stat()
+                            entries.append((st.st_mtime, e.path, st.st_size, kind))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        _index = OrderedDict((p, (size, kind)) for _, p, size, kind in entries)
+        _bytes = sum(size for size, _ in _index.values())
+    return _index
+
+
+def _count(kind: str, result: str) -> None:
+    _M_LOOKUPS.inc(kind=kind, result=result)
+    with _LOCK:
+        s = _stats.setdefault(kind, {"hits": 0, "misses": 0})
+        s["hits" if result == "hit" else "misses"] += 1
+
+
+def path_for(kind: str, k: str, ext: str) -> str:
+    return os.path.join(DIRS[kind], f"{k}{ext}")
+
+
+def lookup(kind: str, k: str, ext: str) -> Optional[str]:
+    """
+    Path of a cached file (marked as recently used), or None.
+    """
+    path = path_for(kind, k, ext)
+    if ENABLED and os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with _LOCK:
+            idx = _load_index()
+            known = path in idx
+            if known:
+                idx.move_to_end(path)
+        if not known:
+            # written by another process (e.g. a video encode worker)
+            store(kind, path)
+        _count(kind, "hit")
+        return path
+    _count(kind, "miss")
+    return None
+
+
+def _evict() -> None:
+    # caller holds _LOCK
+    global _bytes
+    idx = _load_index()
+    while len(idx) > 1 and ((MAX_BYTES > 0 and _bytes > MAX_BYTES) or (MAX_FILES > 0 and len(idx) > MAX_FILES)):
+        path, (size, kind) = idx.popitem(last=False)
+        _bytes -= size
+        try:
+            os.remove(path)
+            _M_EVICTED.inc(kind=kind)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+
+
+def store(kind: str, path: str) -> None:
+    """
+    Account for a file just written at path and evict down to the caps.
+    """
+    global _bytes
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    with _LOCK:
+        idx = _load_index()
+        old = idx.pop(path, None)
+        if old:
+            _bytes -= old[0]
+        idx[path] = (size, kind)
+        _bytes += size
+        _evict()
+
+
+def get_or_create(kind: str, k: str, ext: str, render: Callable[[str], None]) -> Optional[str]:
+    """
+    Cached file for key k, or render(tmp_path) into a temp file that is then
+    moved into place. Returns None when the render fails.
+    """
+    hit = lookup(kind, k, ext)
+    if hit:
+        return hit
+    os.makedirs(DIRS[kind], exist_ok=True)
+    path = path_for(kind, k, ext)
+    # Keep the real extension last; encoders pick the container from it
+    tmp = os.path.join(DIRS[kind], f".{k}.{os.getpid()}.{threading.get_ident()}.tmp{ext}")
+    try:
+        render(tmp)
+        if not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
+            return None
+        os.replace(tmp, path)
+    except Exception:
+        return None
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    store(kind, path)
+    return path
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        idx = _load_index()
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for size, kind in idx.values():
+            k = by_kind.setdefault(kind, {"files": 0, "bytes": 0})
+            k["files"] += 1
+            k["bytes"] += size
+        for kind, s in _stats.items():
+            by_kind.setdefault(kind, {"files": 0, "bytes": 0}).update(s)
+        return {"enabled": ENABLED, "bytes": _bytes, "files": len(idx), "max_bytes": MAX_BYTES,
+                "max_files": MAX_FILES, "kinds": by_kind, "ts": time.time()}
+
+
+def _collect():
+    st = stats()
+    yield ("media_cache_bytes", "gauge", "Bytes held in outputs/ media dirs", {}, st["bytes"])
+    yield ("media_cache_files", "gauge", "Files held in outputs/ media dirs", {}, st["files"])
+
+
+telemetry.register_collector(_collect)
@@ -1,16 +1,94 @@
+import functools
+import json
+import logging
 import os
-import uuid
+import re
+import shutil
+import subprocess
+import threading
 import time
-from typing import Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 from gtts import gTTS
 from PIL import Image, ImageDraw, ImageFont
 from moviepy.editor import ImageClip, AudioFileClip
 
-OUTPUT_DIR = "outputs"
-AUDIO_DIR = os.path.join(OUTPUT_DIR, "audio")
-IMG_DIR = os.path.join(OUTPUT_DIR, "images")
-VID_DIR = os.path.join(OUTPUT_DIR, "video")
+import card_layout
+import media_cache
+import telemetry
+
+log = logging.getLogger("media_generator")
+
+OUTPUT_DIR = media_cache.ROOT
+AUDIO_DIR = media_cache.DIRS["audio"]
+IMG_DIR = media_cache.DIRS["image"]
+VID_DIR = media_cache.DIRS["video"]
+
+# Bump when a renderer's output changes so stale cache entries are not reused
+# (per artifact kind; videos are keyed by their input files, so a new card or
+# audio file already yields a new video)
+AUDIO_RENDER_VERSION = 1
+CARD_RENDER_VERSION = 3   # 2: card_layout wrapping, 3: Thai word breaks
+VIDEO_RENDER_VERSION = 1
+VIDEO_FPS = 24
+
+# Still-image videos: "ffmpeg" loops the card straight into libx264 (stillimage
+# tune, low frame rate, audio stream-copied when the container allows);
+# "moviepy" is the previous frame-by-frame path.
+VIDEO_MODE = os.getenv("MEDIA_VIDEO_MODE", "ffmpeg").lower()
+VIDEO_STILL_FPS = float(os.getenv("MEDIA_VIDEO_FPS", "1"))                # frames/sec of the looped card
+VIDEO_PRESET = os.getenv("MEDIA_VIDEO_PRESET", "veryfast")                # libx264 preset
+VIDEO_CRF = int(os.getenv("MEDIA_VIDEO_CRF", "23"))
+VIDEO_MAX_CONCURRENT = int(os.getenv("MEDIA_VIDEO_MAX_CONCURRENT", "2"))  # encodes at once (per process)
+VIDEO_TIMEOUT_SEC = float(os.getenv("MEDIA_VIDEO_TIMEOUT_SEC", "120"))
+_COPY_AUDIO_EXT = {".mp3", ".aac", ".m4a"}  # codecs the mp4 muxer takes as-is
+
+_ENCODE_SLOTS = threading.BoundedSemaphore(max(1, VIDEO_MAX_CONCURRENT))
+
+# Speech: a pluggable backend chosen by config key tts_backend (or TTS_BACKEND).
+# gtts needs the network; espeak (espeak-ng) and piper run offline. Backends that
+# batch (piper: one model load per call) get concurrent captions coalesced into
+# a single call (a lone caption is sent at once); every result is cached by
+# (backend, voice, text, lang).
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts").lower()                    # gtts | espeak | piper | auto
+TTS_FALLBACK = os.getenv("TTS_FALLBACK", "true").lower() in {"1", "true", "yes", "on"}  # try other engines on failure
+TTS_BATCH_SIZE = int(os.getenv("TTS_BATCH_SIZE", "8"))                    # captions per synthesis call
+TTS_BATCH_WAIT_SEC = float(os.getenv("TTS_BATCH_WAIT_SEC", "0.05"))       # wait for other in-flight captions to join a call
+TTS_TIMEOUT_SEC = float(os.getenv("TTS_TIMEOUT_SEC", "60"))
+ESPEAK_BIN = os.getenv("ESPEAK_BIN", "espeak-ng")
+PIPER_BIN = os.getenv("PIPER_BIN", "piper")
+# lang=model pairs, e.g. "th=/models/th_TH-voice.onnx,en=/models/en_US-lessac-medium.onnx"
+PIPER_MODELS = dict(x.split("=", 1) for x in os.getenv("PIPER_MODELS", "").split(",") if "=" in x)
+
+_M_STAGE = telemetry.histogram("media_stage_seconds", "Media generation stage wall time",
+                               buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+_M_STAGES = telemetry.counter("media_stage_runs", "Media generation stage runs by outcome")
+_M_TTS = telemetry.counter("tts_syntheses", "Captions synthesized by TTS backend and outcome")
+_M_TTS_BATCH = telemetry.histogram("tts_batch_size", "Captions per TTS backend call", buckets=(1, 2, 4, 8, 16, 32))
+
+
+def record_stage(name: str, seconds: float, ok: bool) -> None:
+    # For stages timed by the caller (media_pipeline's video stage, which may encode in another process)
+    _M_STAGE.observe(seconds, stage=name)
+    _M_STAGES.inc(stage=name, outcome="ok" if ok else "error")
+
+
+def _stage(name: str):
+    # Times a stage; a None return counts as a failure (stages swallow their errors)
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            t0 = time.perf_counter()
+            out = None
+            try:
+                out = fn(*args, **kwargs)
+                return out
+            finally:
+                _M_STAGE.observe(time.perf_counter() - t0, stage=name)
+                _M_STAGES.inc(stage=name, outcome="ok" if out is not None else "error")
+        return wrapped
+    return deco
 
 
 def _ensure_dirs() -> None:
@@ -20,95 +98,351 @@ def _ensure_dirs() -> None:
 
 
 def _pick_font(size: int = 48) -> ImageFont.ImageFont:
-    # Try Thai-capable fonts commonly available in Debian
-    candidates = [
-        "/usr/share/fonts/truetype/tlwg/TlwgLoma.ttf",  # Thai TLWG
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # fallback
-    ]
-    for p in candidates:
-        if os.path.exists(p):
+    # Thai-capable font, loaded once per size (see card_layout.FONT_CANDIDATES)
+    return card_layout.font(size)
+
+
+class TTSBackend:
+    name = "base"
+    ext = ".wav"
+    batches = False  # True when one call for many captions is cheaper than one call each
+
+    def available(self, lang: str) -> bool:
+        return False
+
+    def params(self, lang: str) -> Dict[str, Any]:
+        # Extra cache-key parameters (voice/model), so changing them re-synthesizes
+        return {}
+
+    def synthesize(self, items: List[Tuple[str, str, bool, str]]) -> None:
+        """
+        Write audio for each (text, lang, slow, path). Items whose file is
+        missing afterwards count as failed.
+        """
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+    ext = ".mp3"
+
+    def available(self, lang: str) -> bool:
+        return True
+
+    def synthesize(self, items):
+        for text, lang, slow, path in items:
+            gTTS(text=text, lang=lang, slow=slow).save(path)
+
+
+class EspeakBackend(TTSBackend):
+    # espeak-ng writes a single -w file per run, so each caption is its own
+    # process; it starts in milliseconds with no model to load, so there is no
+    # shared cost a batch would save (batches = False)
+    name = "espeak"
+
+    def available(self, lang: str) -> bool:
+        return shutil.which(ESPEAK_BIN) is not None
+
+    def params(self, lang: str) -> Dict[str, Any]:
+        return {"voice": lang}
+
+    def synthesize(self, items):
+        for text, lang, slow, path in items:
+            cmd = [ESPEAK_BIN, "-v", lang, "-w", path, "--stdin"] + (["-s", "120"] if slow else [])
             try:
-                return ImageFont.truetype(p, size=size)
-            except Exception:
-                continue
-    return ImageFont.load_default()
+                subprocess.run(cmd, input=text, text=True, capture_output=True, check=True, timeout=TTS_TIMEOUT_SEC)
+            except Exception as e:
+                log.warning(f"espeak-ng failed: {e}")
+
+
+class PiperBackend(TTSBackend):
+    name = "piper"
+    batches = True
+
+    def available(self, lang: str) -> bool:
+        return lang in PIPER_MODELS and shutil.which(PIPER_BIN) is not None
+
+    def params(self, lang: str) -> Dict[str, Any]:
+        return {"model": os.path.basename(PIPER_MODELS.get(lang, ""))}
+
+    def synthesize(self, items):
+        groups: Dict[Tuple[str, bool], List[Tuple[str, str]]] = {}
+        for text, lang, slow, path in items:
+            groups.setdefault((lang, slow), []).append((text, path))
+        for (lang, slow), group in groups.items():
+            # One process (one model load) for the whole group; --json-input names each output file
+            cmd = [PIPER_BIN, "--model", PIPER_MODELS[lang], "--json-input", "--output_dir", AUDIO_DIR]
+            if slow:
+                cmd += ["--length_scale", "1.4"]
+            lines = "".join(json.dumps({"text": t, "output_file": p}, ensure_ascii=False) + "\n" for t, p in group)
+            subprocess.run(cmd, input=lines, text=True, capture_output=True, check=True,
+                           timeout=TTS_TIMEOUT_SEC * len(group))
+
+
+_TTS_BACKENDS: Dict[str, TTSBackend] = {}
+_TTS_LOCK = threading.Lock()
+_tts_queue: Dict[str, List[Tuple[Tuple[str, str, bool, str], Future]]] = {}
+_tts_leaders: set = set()
+_tts_callers = 0  # text_to_speech calls in progress; any not yet queued may still join a batch
+
+
+def register_tts_backend(backend: TTSBackend) -> None:
+    _TTS_BACKENDS[backend.name] = backend
+
+
+for _b in (GTTSBackend(), EspeakBackend(), PiperBackend()):
+    register_tts_backend(_b)
+
+
+def tts_backend_name() -> str:
+    try:
+        import config_store
+        v = config_store.get("tts_backend")
+        if v:
+            return str(v).lower()
+    except Exception:
+        pass
+    return TTS_BACKEND
+
+
+def _tts_chain(lang: str) -> List[TTSBackend]:
+    # Selected backend first; then (with TTS_FALLBACK, or "auto") offline engines before the network one
+    selected = tts_backend_name()
+    order = [] if selected == "auto" else [selected]
+    if selected == "auto" or TTS_FALLBACK:
+        order += ["piper", "espeak", "gtts"] + sorted(_TTS_BACKENDS)
+    chain: List[TTSBackend] = []
+    for name in dict.fromkeys(order):
+        b = _TTS_BACKENDS.get(name)
+        if b is not None and b.available(lang):
+            chain.append(b)
+    return chain
+
+
+def _run_tts_batch(backend: TTSBackend, batch) -> None:
+    _M_TTS_BATCH.observe(len(batch), backend=backend.name)
+    try:
+        backend.synthesize([item for item, _ in batch])
+    except Exception as e:
+        log.warning(f"TTS backend {backend.name} failed for {len(batch)} caption(s): {e}")
+    for (_, _, _, path), fut in batch:
+        ok = os.path.exists(path) and os.path.getsize(path) > 0
+        _M_TTS.inc(backend=backend.name, outcome="ok" if ok else "error")
+        fut.set_result(ok)
 
 
+def _synthesize(backend: TTSBackend, item: Tuple[str, str, bool, str]) -> bool:
+    fut: Future = Future()
+    if not backend.batches:
+        _run_tts_batch(backend, [(item, fut)])
+        return fut.result()
+    # The first caller becomes the batch leader: it waits briefly for other
+    # captions, then drains the queue in TTS_BATCH_SIZE calls
+    with _TTS_LOCK:
+        queue = _tts_queue.setdefault(backend.name, [])
+        queue.append((item, fut))
+        lead = backend.name not in _tts_leaders
+        if lead:
+            _tts_leaders.add(backend.name)
+        # A lone caption does not wait: no other caller is on its way to the queue
+        wait = _tts_callers > len(queue)
+    if lead:
+        if wait and TTS_BATCH_WAIT_SEC > 0:
+            time.sleep(TTS_BATCH_WAIT_SEC)
+        while True:
+            with _TTS_LOCK:
+                queued = _tts_queue.get(backend.name) or []
+                batch, _tts_queue[backend.name] = queued[:max(1, TTS_BATCH_SIZE)], queued[max(1, TTS_BATCH_SIZE):]
+                if not batch:
+                    _tts_leaders.discard(backend.name)
+                    break
+            _run_tts_batch(backend, batch)
+    return fut.result(timeout=TTS_TIMEOUT_SEC * 10)
+
+
+@_stage("tts")
 def text_to_speech(text: str, lang: str = "th", slow: bool = False) -> Optional[str]:
+    global _tts_callers
     _ensure_dirs()
-    filename = f"{int(time.time())}_{uuid.uuid4().hex[:8]}.mp3"
-    path = os.path.join(AUDIO_DIR, filename)
+    with _TTS_LOCK:
+        _tts_callers += 1
     try:
-        tts = gTTS(text=text, lang=lang, slow=slow)
-        tts.save(path)
-        return path
-    except Exception:
+        for backend in _tts_chain(lang):
+            k = media_cache.key("audio", {"v": AUDIO_RENDER_VERSION, "engine": backend.name, "text": text,
+                                          "lang": lang, "slow": slow, **backend.params(lang)})
+
+            def render(path: str, backend=backend) -> None:
+                if not _synthesize(backend, (text, lang, slow, path)):
+                    raise RuntimeError(f"{backend.name} produced no audio")
+            path = media_cache.get_or_create("audio", k, backend.ext, render)
+            if path:
+                return path
         return None
+    finally:
+        with _TTS_LOCK:
+            _tts_callers -= 1
+
+
+def text_to_speech_batch(texts: List[str], lang: str = "th") -> List[Optional[str]]:
+    """
+    Audio for several captions; uncached ones share backend calls where the backend batches.
+    """
+    global _tts_callers
+    if not texts:
+        return []
+    # Count the whole batch as in flight up front, so the first caption waits
+    # for the rest instead of going out alone before the other workers start
+    with _TTS_LOCK:
+        _tts_callers += len(texts)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(TTS_BATCH_SIZE, len(texts))), thread_name_prefix="tts") as pool:
+            return list(pool.map(lambda t: text_to_speech(t, lang=lang), texts))
+    finally:
+        with _TTS_LOCK:
+            _tts_callers -= len(texts)
 
 
+@_stage("image")
 def render_quote_card(text: str, sender: str = "", size=(1080, 1080)) -> Optional[str]:
     _ensure_dirs()
-    filename = f"{int(time.time())}_{uuid.uuid4().hex[:8]}.png"
-    path = os.path.join(IMG_DIR, filename)
+    k = media_cache.key("image", {"v": CARD_RENDER_VERSION, "text": text, "sender": sender, "size": list(size),
+                                  "font": card_layout.font_path()})
+    return media_cache.get_or_create("image", k, ".png", lambda path: _draw_card(path, text, sender, size))
+
+
+def _draw_card(path: str, text: str, sender: str, size) -> None:
+    W, H = size
+    img = Image.new("RGB", size, color=(255, 245, 245))
+    draw = ImageDraw.Draw(img)
+    font = _pick_font(54)
+    font_small = _pick_font(36)
+
+    # Segments are measured once (cached across renders); Thai breaks between syllables
+    lines = card_layout.wrap(text, 54, W - 140, max_lines=10)
+
+    y = 160
+    for line in lines:
+        draw.text((70, y), line, font=font, fill=(40, 40, 40))
+        y += font.size + 18
+
+    if sender:
+        draw.text((70, H - 120), f"— {sender}", font=font_small, fill=(100, 100, 100))
+
+    img.save(path, format="PNG")
+
+
+@_stage("video")
+def compose_video(image_path: str, audio_path: Optional[str]) -> Optional[str]:
+    return encode_video(image_path, audio_path)
+
+
+def encode_video(image_path: str, audio_path: Optional[str]) -> Optional[str]:
+    """
+    compose_video without the stage metrics, for callers that time the whole
+    video stage themselves (media_pipeline, which may encode in another process).
+    """
+    _ensure_dirs()
+    if audio_path and not os.path.exists(audio_path):
+        audio_path = None
     try:
-        W, H = size
-        img = Image.new("RGB", size, color=(255, 245, 245))
-        draw = ImageDraw.Draw(img)
-        font = _pick_font(54)
-        font_small = _pick_font(36)
-
-        # Word wrap
-        max_w = W - 140
-        words = text.split()
-        lines = []
-        current = ""
-        for w in words:
-            test = (current + " " + w).strip()
-            if draw.textlength(test, font=font) <= max_w:
-                current = test
+        k = video_key(image_path, audio_path)
+    except Exception:
+        return None
+
+    def render(path: str) -> None:
+        with _ENCODE_SLOTS:
+            if video_mode() == "ffmpeg":
+                _encode_still(path, image_path, audio_path)
             else:
-                if current:
-                    lines.append(current)
-                current = w
-        if current:
-            lines.append(current)
-
-        y = 160
-        for line in lines[:10]:
-            draw.text((70, y), line, font=font, fill=(40, 40, 40))
-            y += font.size + 18
-
-        if sender:
-            draw.text((70, H - 120), f"— {sender}", font=font_small, fill=(100, 100, 100))
-
-        img.save(path, format="PNG")
-        return path
+                _encode_video(path, image_path, audio_path)
+    return media_cache.get_or_create("video", k, ".mp4", render)
+
+
+def video_mode() -> str:
+    # "ffmpeg" when selected and a binary is available; encodes then run in ffmpeg's own process
+    return "ffmpeg" if VIDEO_MODE == "ffmpeg" and ffmpeg_exe() else "moviepy"
+
+
+def _video_params() -> Dict[str, object]:
+    if video_mode() == "ffmpeg":
+        return {"mode": "ffmpeg", "fps": VIDEO_STILL_FPS, "preset": VIDEO_PRESET, "crf": VIDEO_CRF}
+    return {"mode": "moviepy", "fps": VIDEO_FPS, "codec": "libx264"}
+
+
+def video_key(image_path: str, audio_path: Optional[str]) -> str:
+    # Inputs are hashed by content, so a re-rendered but identical card still hits
+    return media_cache.key("video", {"v": VIDEO_RENDER_VERSION, **_video_params()}, files=[image_path, audio_path])
+
+
+def cached_video(image_path: str, audio_path: Optional[str]) -> Optional[str]:
+    """
+    Cached video for these inputs, without encoding. Lets callers that encode in
+    another process skip the round trip (and keep hit counts in this process).
+    """
+    try:
+        if audio_path and not os.path.exists(audio_path):
+            audio_path = None
+        return media_cache.lookup("video", video_key(image_path, audio_path), ".mp4")
     except Exception:
         return None
 
 
-def compose_video(image_path: str, audio_path: Optional[str]) -> Optional[str]:
-    _ensure_dirs()
-    filename = f"{int(time.time())}_{uuid.uuid4().hex[:8]}.mp4"
-    path = os.path.join(VID_DIR, filename)
+def _encode_video(path: str, image_path: str, audio_path: Optional[str]) -> None:
+    img_clip = ImageClip(image_path).resize(height=1080)
+    duration = 10.0
+    if audio_path:
+        audio_clip = AudioFileClip(audio_path)
+        duration = max(5.0, float(audio_clip.duration))
+        img_clip = img_clip.set_audio(audio_clip)
+    img_clip = img_clip.set_duration(duration)
+    img_clip.write_videofile(path, fps=VIDEO_FPS, codec="libx264", audio_codec="aac", verbose=False, logger=None)
+
+
+@functools.lru_cache(maxsize=1)
+def ffmpeg_exe() -> Optional[str]:
+    # The binary bundled with imageio-ffmpeg (a moviepy dependency), else PATH
     try:
-        img_clip = ImageClip(image_path).resize(height=1080).fx(lambda clip: clip)  # simple
-        duration = 10.0
-        if audio_path and os.path.exists(audio_path):
-            audio_clip = AudioFileClip(audio_path)
-            duration = max(5.0, float(audio_clip.duration))
-            img_clip = img_clip.set_audio(audio_clip)
-        img_clip = img_clip.set_duration(duration)
-        # Subtle zoom to add motion
-        def zoom_in(get_frame, t):
-            frame = get_frame(t)
-            # MoviePy will handle resize via lambda; keep simple
-            return frame
-        final = img_clip  # keep simple for robustness
-        final.write_videofile(path, fps=24, codec="libx264", audio_codec="aac", verbose=False, logger=None)
-        return path
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
     except Exception:
+        return shutil.which("ffmpeg")
+
+
+def _audio_duration(audio_path: str) -> Optional[float]:
+    # ffmpeg prints "Duration: HH:MM:SS.xx" for the input and exits without output
+    proc = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", audio_path], capture_output=True,
+                          text=True, timeout=30)
+    m = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", proc.stderr)
+    if not m:
         return None
+    h, mnt, sec = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(sec)
+
+
+def _encode_still(path: str, image_path: str, audio_path: Optional[str]) -> None:
+    duration = 10.0
+    if audio_path:
+        duration = max(5.0, _audio_duration(audio_path) or 0.0)
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+           "-loop", "1", "-framerate", str(VIDEO_STILL_FPS), "-i", image_path]
+    if audio_path:
+        cmd += ["-i", audio_path]
+    cmd += ["-t", f"{duration:.3f}", "-map", "0:v:0",
+            "-vf", "scale=-2:1080,format=yuv420p", "-r", str(VIDEO_STILL_FPS),
+            "-c:v", "libx264", "-preset", VIDEO_PRESET, "-tune", "stillimage", "-crf", str(VIDEO_CRF)]
+    out = ["-movflags", "+faststart", path]
+    if not audio_path:
+        subprocess.run(cmd + out, check=True, capture_output=True, timeout=VIDEO_TIMEOUT_SEC)
+        return
+    cmd += ["-map", "1:a:0"]
+    if os.path.splitext(audio_path)[1].lower() in _COPY_AUDIO_EXT:
+        try:
+            subprocess.run(cmd + ["-c:a", "copy"] + out, check=True, capture_output=True, timeout=VIDEO_TIMEOUT_SEC)
+            return
+        except subprocess.CalledProcessError:
+            pass  # codec the muxer rejects despite the extension; re-encode below
+    subprocess.run(cmd + ["-c:a", "aac", "-b:a", "128k"] + out, check=True, capture_output=True,
+                   timeout=VIDEO_TIMEOUT_SEC)
 
 
 def generate_all(text: str, sender: str = "", tts_lang: str = "th") -> Dict[str, Optional[str]]:
@@ -116,7 +450,11 @@ def generate_all(text: str, sender: str = "", tts_lang: str = "th") -> Dict[str,
     Generates mp3, png, and mp4 for the given text.
     Returns dict with absolute paths (or None when failed).
     """
-    audio = text_to_speech(text, lang=tts_lang)
-    image = render_quote_card(text, sender=sender)
+    # TTS (network/CPU) and the card (CPU) are independent; run them side by side
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-gen") as pool:
+        audio_f = pool.submit(text_to_speech, text, lang=tts_lang)
+        image_f = pool.submit(render_quote_card, text, sender=sender)
+        audio = audio_f.result()
+        image = image_f.result()
     video = compose_video(image, audio) if image else None
     return {"audio": audio, "image": image, "video": video}
\ No newline at end of file
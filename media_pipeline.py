@@ -0,0 +1,154 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import media_cache
+
+log = logging.getLogger("media_pipeline")
+
+# Media for a post is produced off the post thread: TTS and the quote card run
+# concurrently on a thread pool, the video encode runs in a process pool, and
+# each stage's timing plus the final paths are published on realtime_bus
+# ({"type": "media"} per stage, {"type": "post_media", "ref_id": <post event id>}).
+ENABLED = os.getenv("GENERATE_MEDIA", "false").lower() in {"1", "true", "yes", "on"}
+THREADS = int(os.getenv("MEDIA_THREADS", "4"))                  # TTS + image workers
+VIDEO_PROCESSES = int(os.getenv("MEDIA_VIDEO_PROCESSES", "1"))  # moviepy encodes; 0 encodes on a thread instead
+MAX_PENDING = int(os.getenv("MEDIA_MAX_PENDING", "4"))          # posts whose media is still in flight
+
+_LOCK = threading.Lock()
+_threads: Optional[ThreadPoolExecutor] = None
+_procs: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+def enabled() -> bool:
+    try:
+        import config_store
+        v = config_store.get("generate_media")
+        if v is not None:
+            return bool(v)
+    except Exception:
+        pass
+    return ENABLED
+
+
+def _pools():
+    global _threads, _procs
+    import media_generator as mg
+    with _LOCK:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=max(2, THREADS), thread_name_prefix="media")
+        # ffmpeg-mode encodes already run in their own process; only moviepy needs the pool
+        if _procs is None and VIDEO_PROCESSES > 0 and mg.video_mode() != "ffmpeg":
+            # spawn: forking a process that runs scheduler/web threads is unsafe
+            _procs = ProcessPoolExecutor(max_workers=VIDEO_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _threads, _procs
+
+
+def _publish(event: Dict[str, Any]) -> None:
+    try:
+        import realtime_bus as bus
+        bus.publish(event)
+    except Exception:
+        pass
+
+
+def _stage(ref_id, stage: str, t0: float, path: Optional[str]) -> None:
+    _publish({"type": "media", "stage": stage, "ref_id": ref_id, "ok": path is not None,
+              "duration_sec": round(time.perf_counter() - t0, 4), "path": path})
+
+
+def _run(text: str, sender: str, lang: str, ref_id) -> Dict[str, Any]:
+    import media_generator as mg
+    threads, procs = _pools()
+    started = time.perf_counter()
+
+    def timed(stage, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        path = None
+        try:
+            path = fn(*args, **kwargs)
+            return path
+        finally:
+            _stage(ref_id, stage, t0, path)
+
+    audio_f = threads.submit(timed, "tts", mg.text_to_speech, text, lang=lang)
+    image_f = threads.submit(timed, "image", mg.render_quote_card, text, sender=sender)
+    audio = audio_f.result()
+    image = image_f.result()
+
+    video = None
+    if image:
+        t0 = time.perf_counter()
+        try:
+            video = mg.cached_video(image, audio)
+            if video is None and procs is not None:
+                video = procs.submit(mg.encode_video, image, audio).result()
+                if video:
+                    # the worker's cache index is its own; account for the file here so eviction sees it
+                    media_cache.store("video", video)
+            elif video is None:
+                video = mg.encode_video(image, audio)
+        except Exception as e:
+            log.error(f"Video encode failed: {e}", exc_info=True)
+        # One stage sample per post whichever path produced the video
+        mg.record_stage("video", time.perf_counter() - t0, video is not None)
+        _stage(ref_id, "video", t0, video)
+
+    media = {"audio": audio, "image": image, "video": video}
+    _publish({"type": "post_media", "ref_id": ref_id, "text": text, "media": media,
+              "duration_sec": round(time.perf_counter() - started, 4)})
+    return media
+
+
+def submit(text: str, sender: str = "", lang: Optional[str] = None, ref_id=None) -> Optional[Future]:
+    """
+    Start media generation for a post and return immediately. Returns a Future
+    resolving to {"audio", "image", "video"}, or None when too many posts are
+    already in flight (the post is simply published without media).
+    """
+    global _pending
+    if not text:
+        return None
+    if lang is None:
+        try:
+            import config_store
+            lang = config_store.get("tts_lang") or "th"
+        except Exception:
+            lang = "th"
+    with _LOCK:
+        if _pending >= MAX_PENDING:
+            log.warning("Media pipeline busy; skipping media for this post")
+            return None
+        _pending += 1
+    # The coordinator runs on its own thread so pool workers only do stage work
+    fut: Future = Future()
+
+    def coordinator():
+        global _pending
+        try:
+            fut.set_result(_run(text, sender, lang, ref_id))
+        except Exception as e:
+            log.error(f"Media pipeline failed: {e}", exc_info=True)
+            fut.set_exception(e)
+        finally:
+            with _LOCK:
+                _pending -= 1
+
+    threading.Thread(target=coordinator, daemon=True, name="media-post").start()
+    return fut
+
+
+def shutdown() -> None:
+    global _threads, _procs
+    with _LOCK:
+        threads, procs = _threads, _procs
+        _threads = _procs = None
+    if threads:
+        threads.shutdown(wait=False)
+    if procs:
+        procs.shutdown(wait=False)
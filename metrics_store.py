@@ -1,11 +1,36 @@
+import atexit
+import itertools
 import json
 import os
 import threading
 import time
-from typing import Dict
+from typing import Dict, List, Optional
 
 _PATH = os.getenv("METRICS_STORE_PATH", "metrics.json")
-_LOCK = threading.Lock()
+_LOCK = threading.Lock()  # guards the persisted base and snapshot writes
+
+# Page views are counted in memory; metrics.json is only written by snapshots
+SHARDS = max(1, int(os.getenv("METRICS_SHARDS", "8")))                   # counter shards (assigned round-robin per thread)
+HISTORY_MINUTES = int(os.getenv("METRICS_HISTORY_MINUTES", "60"))        # per-route per-minute buckets; 0 disables
+SNAPSHOT_SEC = float(os.getenv("METRICS_SNAPSHOT_SEC", "30"))            # persistence period
+
+_OWN_KEYS = ("pageviews", "total_pageviews", "last_visit_ts", "pageviews_per_minute")
+
+
+class _Shard:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.routes: Dict[str, int] = {}
+        self.minutes: Dict[int, Dict[str, int]] = {}
+        self.last_ts: Optional[float] = None
+
+
+_shards: List[_Shard] = [_Shard() for _ in range(SHARDS)]
+_base: Optional[Dict] = None  # counters loaded from metrics.json at first use
+_dirty = False
+_local = threading.local()  # .shard: index this thread counts into
+_next_shard = itertools.count()
+_snapshotter: Optional[threading.Thread] = None
 
 
 def _load() -> Dict:
@@ -28,21 +53,119 @@ def _save(data: Dict) -> None:
     os.replace(tmp, _PATH)
 
 
-def pageview(route: str) -> None:
+def _ensure_base() -> Dict:
+    global _base
+    if _base is None:
+        with _LOCK:
+            if _base is None:
+                data = _load()
+                _base = {
+                    "pageviews": {str(k): int(v) for k, v in (data.get("pageviews") or {}).items()},
+                    "last_visit_ts": data.get("last_visit_ts"),
+                    "pageviews_per_minute": data.get("pageviews_per_minute") or {},
+                }
+    return _base
+
+
+def _ensure_snapshotter() -> None:
+    global _snapshotter
+    if _snapshotter is not None:
+        return
     with _LOCK:
-        data = _load()
-        pv = data.setdefault("pageviews", {})
-        pv[route] = int(pv.get(route, 0)) + 1
-        data["total_pageviews"] = int(data.get("total_pageviews", 0)) + 1
-        data["last_visit_ts"] = time.time()
-        _save(data)
+        if _snapshotter is None:
+            _snapshotter = threading.Thread(target=_snapshot_loop, daemon=True, name="metrics-snapshot")
+            _snapshotter.start()
+
+
+def _shard() -> _Shard:
+    # Thread idents are aligned addresses (low bits all zero), so they are not
+    # usable as a shard key; each thread takes the next shard on first use.
+    idx = getattr(_local, "shard", None)
+    if idx is None:
+        idx = _local.shard = next(_next_shard) % SHARDS
+    return _shards[idx]
+
+
+def pageview(route: str) -> None:
+    global _dirty
+    now = time.time()
+    shard = _shard()
+    with shard.lock:
+        shard.routes[route] = shard.routes.get(route, 0) + 1
+        shard.last_ts = now
+        if HISTORY_MINUTES > 0:
+            bucket = shard.minutes.setdefault(int(now // 60), {})
+            bucket[route] = bucket.get(route, 0) + 1
+        _dirty = True
+    _ensure_snapshotter()
     try:
         import realtime_bus as bus
-        bus.publish({"type": "visit", "route": route, "ts": time.time()})
+        bus.publish({"type": "visit", "route": route, "ts": now})
     except Exception:
         pass
 
 
+def _history(base_hist: Dict, min_minute: int) -> Dict[str, Dict[str, int]]:
+    # {"<minute epoch>": {route: count}}, oldest buckets pruned
+    out: Dict[str, Dict[str, int]] = {}
+    for m, routes in base_hist.items():
+        if int(m) >= min_minute:
+            out[str(m)] = dict(routes)
+    for shard in _shards:
+        with shard.lock:
+            for m in [m for m in shard.minutes if m < min_minute]:
+                del shard.minutes[m]
+            for m, routes in shard.minutes.items():
+                bucket = out.setdefault(str(m), {})
+                for r, c in routes.items():
+                    bucket[r] = bucket.get(r, 0) + c
+    return dict(sorted(out.items()))
+
+
 def get_metrics() -> Dict:
+    """
+    Current page-view counters, summed from the in-memory shards (no file I/O).
+    """
+    base = _ensure_base()
+    pv: Dict[str, int] = dict(base["pageviews"])
+    last_ts = base.get("last_visit_ts")
+    for shard in _shards:
+        with shard.lock:
+            for r, c in shard.routes.items():
+                pv[r] = pv.get(r, 0) + c
+            if shard.last_ts and (not last_ts or shard.last_ts > last_ts):
+                last_ts = shard.last_ts
+    data = {"pageviews": pv, "total_pageviews": sum(pv.values()), "last_visit_ts": last_ts}
+    if HISTORY_MINUTES > 0:
+        min_minute = int(time.time() // 60) - HISTORY_MINUTES + 1
+        data["pageviews_per_minute"] = _history(base.get("pageviews_per_minute") or {}, min_minute)
+    return data
+
+
+def snapshot() -> None:
+    """
+    Persist counters to metrics.json, keeping keys other writers own (e.g. 'runs').
+    """
+    global _dirty
+    if not _dirty:
+        return
+    _dirty = False
+    data = get_metrics()
     with _LOCK:
-        return _load()
\ No newline at end of file
+        try:
+            cur = _load()
+            for k in _OWN_KEYS:
+                cur.pop(k, None)
+            cur.update(data)
+            _save(cur)
+        except Exception:
+            _dirty = True
+
+
+def _snapshot_loop() -> None:
+    while True:
+        time.sleep(SNAPSHOT_SEC)
+        snapshot()
+
+
+atexit.register(snapshot)
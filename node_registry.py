@@ -5,6 +5,8 @@ import uuid
 import threading
 from typing import Dict, List, Optional
 
+import telemetry
+
 _PATH = os.getenv("NODE_REGISTRY_PATH", "nodes_registry.json")
 _LOCK = threading.Lock()
 _OFFLINE_SECONDS = int(os.getenv("NODE_OFFLINE_SECONDS", "30"))
@@ -37,7 +39,7 @@ def _now() -> float:
 def _status_from_last_seen(last_seen: Optional[float]) -> str:
     if not last_seen:
         return "unknown"
-    return "online" if (_now() - float(last_seen) <i _OFFLINE_SECONDS else "offline"
+    return "online" if (_now() - float(last_seen)) < _OFFLINE_SECONDS else "offline"
 
 
 def register(name: str, url: str, meta: Optional[Dict] = None) -> Dict:
@@ -59,23 +61,56 @@ def register(name: str, url: str, meta: Optional[Dict] = None) -> Dict:
         return node
 
 
-def heartbeat(node_id: str, metrics: Optional= now
-    _save(data)
+def heartbeat(node_id: str, metrics: Optional[Dict] = None) -> Dict:
+    """
+    Record a heartbeat for node_id. Raises KeyError for an unknown node.
+    """
+    with _LOCK:
+        data = _load()
+        node = data[node_id]
+        node["last_seen"] = _now()
+        node["beats"] = int(node.get("beats", 0)) + 1
+        if metrics:
+            node["metrics"] = metrics
+        _save(data)
+        return node
 
 
-def list_nodes(stale_after: float = 120.0) -> List[Dict]:
-    data = _load()
+def list_nodes() -> List[Dict]:
     res = []
-    now = time.time()
-    for n in data.get("nodes", {}).values():
-        status = "online" if (now - float(n.get("last_seen", 0))) <= stale_after else "stale"
-        res.append({
-            "id": n.get("id"),
-            "role": n.get("role"),
-            "started_at": n.get("started_at"),
-            "last_seen": n.get("last_seen"),
-            "status": status,
-            "extra": n.get("extra", {}),
-        })
+    for n in _load().values():
+        if not isinstance(n, dict):
+            continue
+        item = dict(n)
+        item["status"] = _status_from_last_seen(n.get("last_seen"))
+        res.append(item)
     res.sort(key=lambda x: x.get("last_seen") or 0, reverse=True)
-    return res
\ No newline at end of file
+    return res
+
+
+def summary() -> Dict:
+    nodes = list_nodes()
+    by_status: Dict[str, int] = {}
+    for n in nodes:
+        by_status[n["status"]] = by_status.get(n["status"], 0) + 1
+    return {"total": len(nodes), "online": by_status.get("online", 0), "offline": by_status.get("offline", 0),
+            "unknown": by_status.get("unknown", 0), "offline_after_sec": _OFFLINE_SECONDS, "ts": _now()}
+
+
+def _collect():
+    nodes = list_nodes()
+    counts = {"online": 0, "offline": 0, "unknown": 0}
+    for n in nodes:
+        counts[n["status"]] = counts.get(n["status"], 0) + 1
+    for status, c in counts.items():
+        yield ("nodes", "gauge", "Registered nodes by heartbeat status", {"status": status}, c)
+    now = _now()
+    for n in nodes:
+        labels = {"node": str(n.get("id", "")), "name": str(n.get("name", ""))}
+        yield ("node_heartbeats", "counter", "Heartbeats received per node", labels, int(n.get("beats", 0)))
+        if n.get("last_seen"):
+            yield ("node_last_seen_age_seconds", "gauge", "Seconds since the node's last heartbeat", labels,
+                   max(0.0, now - float(n["last_seen"])))
+
+
+telemetry.register_collector(_collect)
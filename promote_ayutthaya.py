@@ -6,11 +6,16 @@ import json
 import logging
 from typing import Tuple, Dict, Any, List
 
-import requests
 from requests_oauthlib import OAuth1
 from dotenv import load_dotenv
 
-BASE_ADS = "https://ads-api.twitter.com/11"
+import http_pool
+import geo_targeting
+import promotion_manager
+import rotation_state
+import tweet_source
+
+BASE_ADS = os.getenv("ADS_API_BASE", "https://ads-api.twitter.com/11")  # point at a local stub for dry runs
 BASE_TW = "https://api.twitter.com/1.1"
 
 log = logging.getLogger("promote_ayutthaya")
@@ -81,7 +86,7 @@ def oauth(config: Config) -> OAuth1:
 
 def post_tweet(auth: OAuth1, text: str) -> str:
     url = f"{BASE_TW}/statuses/update.json"
-    resp = requests.post(url, auth=auth, data={"status": text})
+    resp = http_pool.post(url, provider="twitter", auth=auth, data={"status": text})
     resp.raise_for_status()
     data = resp.json()
     return data["id_str"]
@@ -96,7 +101,7 @@ def create_campaign(auth: OAuth1, account_id: str, funding_instrument_id: str, n
         "total_budget_amount_local_micro": str(total_budget_micro),
         "paused": False,
     }
-    resp = requests.post(url, auth=auth, data=payload)
+    resp = http_pool.post(url, auth=auth, data=payload)
     resp.raise_for_status()
     return resp.json()["data"]["id"]
 
@@ -112,26 +117,13 @@ def create_line_item(auth: OAuth1, account_id: str, campaign_id: str, name: str,
         "bid_amount_local_micro": bid_micro,
         "paused": False,
     }
-    resp = requests.post(url, auth=auth, json=payload)
+    resp = http_pool.post(url, auth=auth, json=payload)
     resp.raise_for_status()
     return resp.json()["data"]["id"]
 
 
 def find_ayutthaya_location_id(auth: OAuth1, account_id: str) -> Tuple[str, Dict[str, Any]]:
-    url = f"{BASE_ADS}/accounts/{account_id}/targeting_criteria/locations"
-    params = {"location_type": "REGION", "country_code": "TH", "q": "Ayutthaya"}
-    resp = requests.get(url, auth=auth, params=params)
-    resp.raise_for_status()
-    data = resp.json().get("data", [])
-    if not data:
-        params["q"] = "Phra Nakhon Si Ayutthaya"
-        resp = requests.get(url, auth=auth, params=params)
-        resp.raise_for_status()
-        data = resp.json().get("data", [])
-    if not data:
-        raise RuntimeError("Ayutthaya region not found in Ads API locations.")
-    loc = data[0]
-    return loc["targeting_value"], loc
+    return find_location_by_query(auth, account_id, "TH", "Ayutthaya")
 
 
 def add_geo_targeting(auth: OAuth1, account_id: str, line_item_id: str, location_id: str) -> str:
@@ -141,7 +133,7 @@ def add_geo_targeting(auth: OAuth1, account_id: str, line_item_id: str, location
         "targeting_type": "LOCATION",
         "targeting_value": location_id,
     }
-    resp = requests.post(url, auth=auth, json=payload)
+    resp = http_pool.post(url, auth=auth, json=payload)
     resp.raise_for_status()
     return resp.json()["data"]["id"]
 
@@ -149,30 +141,32 @@ def add_geo_targeting(auth: OAuth1, account_id: str, line_item_id: str, location
 def list_targeting_criteria(auth: OAuth1, account_id: str, line_item_id: str) -> List[Dict[str, Any]]:
     url = f"{BASE_ADS}/accounts/{account_id}/targeting_criteria"
     params = {"line_item_id": line_item_id}
-    resp = requests.get(url, auth=auth, params=params)
+    resp = http_pool.get(url, auth=auth, params=params)
     resp.raise_for_status()
     return resp.json().get("data", [])
 
 
-def list_regions_in_country(auth: OAuth1, account_id: str, country_code: str) -> List[Dict[str, Any]]:
+def _search_locations(auth: OAuth1, account_id: str, country_code: str, query: str = "") -> List[Dict[str, Any]]:
     url = f"{BASE_ADS}/accounts/{account_id}/targeting_criteria/locations"
     params = {"location_type": "REGION", "country_code": country_code}
-    resp = requests.get(url, auth=auth, params=params)
+    if query:
+        params["q"] = query
+    resp = http_pool.get(url, auth=auth, params=params)
     resp.raise_for_status()
     return resp.json().get("data", [])
 
 
+def list_regions_in_country(auth: OAuth1, account_id: str, country_code: str) -> List[Dict[str, Any]]:
+    # Cached for GEO_CACHE_TTL_SEC (see geo_targeting)
+    return geo_targeting.locations(country_code, "", lambda: _search_locations(auth, account_id, country_code))
+
+
 def find_location_by_query(auth: OAuth1, account_id: str, country_code: str, query: str) -> Tuple[str, Dict[str, Any]]:
-    url = f"{BASE_ADS}/accounts/{account_id}/targeting_criteria/locations"
-    params = {"location_type": "REGION", "country_code": country_code, "q": query}
-    resp = requests.get(url, auth=auth, params=params)
-    resp.raise_for_status()
-    data = resp.json().get("data", [])
+    data = geo_targeting.locations(country_code, query,
+                                   lambda: _search_locations(auth, account_id, country_code, query))
     if not data and country_code.upper() == "TH" and query.lower() == "ayutthaya":
-        params["q"] = "Phra Nakhon Si Ayutthaya"
-        resp = requests.get(url, auth=auth, params=params)
-        resp.raise_for_status()
-        data = resp.json().get("data", [])
+        alt = "Phra Nakhon Si Ayutthaya"
+        data = geo_targeting.locations(country_code, alt, lambda: _search_locations(auth, account_id, country_code, alt))
     if not data:
         raise RuntimeError(f"Region not found for query '{query}' in country '{country_code}'.")
     loc = data[0]
@@ -180,24 +174,16 @@ def find_location_by_query(auth: OAuth1, account_id: str, country_code: str, que
 
 
 def add_geo_targets_bulk(auth: OAuth1, account_id: str, line_item_id: str, location_ids: List[str]) -> List[str]:
-    existing = list_targeting_criteria(auth, account_id, line_item_id)
-    existing_vals = {c.get("targeting_value") for c in existing if c.get("targeting_type") == "LOCATION"}
-    created_ids: List[str] = []
-    for loc in location_ids:
-        if loc in existing_vals:
-            continue
-        try:
-            tc_id = add_geo_targeting(auth, account_id, line_item_id, loc)
-            created_ids.append(tc_id)
-        except Exception as e:
-            log.error(f"Failed adding location {loc}: {e}", exc_info=True)
-    return created_ids
+    # Diff against the line item's criteria; creates only what is missing (batch or parallel)
+    result = geo_targeting.apply(BASE_ADS, account_id, auth, line_item_id, location_ids,
+                                 lambda: list_targeting_criteria(auth, account_id, line_item_id))
+    return result["created"]
 
 
 def promote_tweet(auth: OAuth1, account_id: str, line_item_id: str, tweet_id: str) -> str:
     url = f"{BASE_ADS}/accounts/{account_id}/promoted_tweets"
     payload = {"line_item_id": line_item_id, "tweet_id": tweet_id}
-    resp = requests.post(url, auth=auth, json=payload)
+    resp = http_pool.post(url, auth=auth, json=payload)
     resp.raise_for_status()
     return resp.json()["data"]["id"]
 
@@ -223,7 +209,7 @@ def run_once(cfg: Config) -> Dict[str, Any]:
 
 # ===== File rotation and metrics =====
 
-STATE_FILE = "posted_state.json"
+STATE_FILE = "posted_state.json"  # legacy; migrated into rotation_state's posted log
 METRICS_FILE = "metrics.json"
 ADS_METRICS_FILE = "ads_metrics.json"
 
@@ -271,6 +257,14 @@ def load_tweets(path: str, cfg: Config = None) -> List[str]:
     else:
         mode = "file"
 
+    if mode != "import":
+        # Switched away from the remote source: stop polling it
+        try:
+            import importer
+            importer.stop_refresher()
+        except Exception:
+            pass
+
     if mode == "generate":
         try:
             from content_generator import generate_caption
@@ -282,50 +276,29 @@ def load_tweets(path: str, cfg: Config = None) -> List[str]:
 
     if mode == "import":
         try:
-            from importer import fetch_texts_from_url
             url = (import_url or (cfg.IMPORT_SOURCE_URL if cfg else "")).strip()
             fmt = import_fmt or (cfg.IMPORT_FORMAT if cfg else "lines")
             if url:
-                texts = fetch_texts_from_url(url, fmt)
-                return texts
+                return tweet_source.load_url(url, fmt)
+        except LookupError as e:
+            log.info(f"{e}; using file '{path}' until the first refresh completes")
         except Exception as e:
             log.error(f"External import failed: {e}. Falling back to file '{path}'", exc_info=True)
 
-    # default: file
-    file_path = path_override or path
-    tweets: List[str] = []
-    if not os.path.exists(file_path):
-        return tweets
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            t = line.strip()
-            if t:
-                tweets.append(t)
-    return tweets
+    # default: file (cached; only appended lines are parsed after the first read)
+    return tweet_source.load_file(path_override or path)
 
 
 def get_next_tweet(tweets: List[str]) -> str:
-    state = _load_json(STATE_FILE)
-    used = set(state.get("used_texts", []))
-    for t in tweets:
-        if t not in used:
-            return t
-    # Reset when all used
-    if tweets:
-        _save_json(STATE_FILE, {"used_texts": [], "posted": state.get("posted", [])})
-        return tweets[0]
-    raise SystemExit("No tweets available in source")
+    # O(1) cursor lookup in rotation_state; a new pass starts when all are used
+    text = rotation_state.next_text(tweets)
+    if text is None:
+        raise SystemExit("No tweets available in source")
+    return text
 
 
 def mark_used(text: str, tweet_id: str) -> None:
-    state = _load_json(STATE_FILE)
-    used = set(state.get("used_texts", []))
-    used.add(text)
-    posted = state.get("posted", [])
-    posted.append({"text": text, "tweet_id": tweet_id})
-    state["used_texts"] = list(used)
-    state["posted"] = posted
-    _save_json(STATE_FILE, state)
+    rotation_state.mark_posted(text, tweet_id)
 
 
 def post_one_from_file(cfg: Config) -> Dict[str, Any]:
@@ -345,12 +318,17 @@ def post_one_from_file(cfg: Config) -> Dict[str, Any]:
     if cfg.ADS_SIMULATION:
         # Simulate promotion without hitting Ads API (no cost)
         return {"tweet_id": tweet_id, "text": text, "ads_simulated": True}
+    # Configured ids win; otherwise reuse (or create once) via promotion_manager
     if cfg.CAMPAIGN_ID:
         campaign_id = cfg.CAMPAIGN_ID
     else:
-        campaign_id = create_campaign(_auth, cfg.ADS_ACCOUNT_ID, cfg.FUNDING_INSTRUMENT_ID, "Ayutthaya Reach Campaign", cfg.DAILY_BUDGET_MICRO, cfg.TOTAL_BUDGET_MICRO)
-    # Use existing LINE_ITEM_ID if provided; otherwise create new
-    line_item_id = cfg.LINE_ITEM_ID or create_line_item(_auth, cfg.ADS_ACCOUNT_ID, campaign_id, "TH LI", cfg.PLACEMENT, cfg.OBJECTIVE, cfg.BID_AMOUNT_MICRO)
+        campaign_name = "Ayutthaya Reach Campaign"
+        campaign_id = promotion_manager.campaign(
+            BASE_ADS, cfg.ADS_ACCOUNT_ID, _auth, cfg.FUNDING_INSTRUMENT_ID, campaign_name,
+            lambda: create_campaign(_auth, cfg.ADS_ACCOUNT_ID, cfg.FUNDING_INSTRUMENT_ID, campaign_name, cfg.DAILY_BUDGET_MICRO, cfg.TOTAL_BUDGET_MICRO))
+    line_item_id = cfg.LINE_ITEM_ID or promotion_manager.line_item(
+        BASE_ADS, cfg.ADS_ACCOUNT_ID, _auth, campaign_id, "TH LI", cfg.PLACEMENT, cfg.OBJECTIVE, cfg.BID_AMOUNT_MICRO,
+        lambda: create_line_item(_auth, cfg.ADS_ACCOUNT_ID, campaign_id, "TH LI", cfg.PLACEMENT, cfg.OBJECTIVE, cfg.BID_AMOUNT_MICRO))
 
     # Geo targeting: all regions nationwide or specific region; fallback to Ayutthaya
     tc_id = None
@@ -360,37 +338,33 @@ def post_one_from_file(cfg: Config) -> Dict[str, Any]:
         loc_ids = [r["targeting_value"] for r in regions]
         add_geo_targets_bulk(_auth, cfg.ADS_ACCOUNT_ID, line_item_id, loc_ids)
         loc_meta = {"mode": "ALL_REGIONS", "count": len(loc_ids)}
-    elif cfg.GEO_REGION_QUERY:
-        location_id, loc_meta = find_location_by_query(_auth, cfg.ADS_ACCOUNT_ID, cfg.GEO_COUNTRY_CODE, cfg.GEO_REGION_QUERY)
-        tc_id = add_geo_targeting(_auth, cfg.ADS_ACCOUNT_ID, line_item_id, location_id)
     else:
-        location_id, loc_meta = find_ayutthaya_location_id(_auth, cfg.ADS_ACCOUNT_ID)
-        tc_id = add_geo_targeting(_auth, cfg.ADS_ACCOUNT_ID, line_item_id, location_id)
+        if cfg.GEO_REGION_QUERY:
+            location_id, loc_meta = find_location_by_query(_auth, cfg.ADS_ACCOUNT_ID, cfg.GEO_COUNTRY_CODE, cfg.GEO_REGION_QUERY)
+        else:
+            location_id, loc_meta = find_ayutthaya_location_id(_auth, cfg.ADS_ACCOUNT_ID)
+        created = add_geo_targets_bulk(_auth, cfg.ADS_ACCOUNT_ID, line_item_id, [location_id])
+        tc_id = created[0] if created else None
 
     promoted_id = promote_tweet(_auth, cfg.ADS_ACCOUNT_ID, line_item_id, tweet_id)
     return {"tweet_id": tweet_id, "campaign_id": campaign_id, "line_item_id": line_item_id, "targeting_criteria_id": tc_id, "promoted_tweet_id": promoted_id, "location": loc_meta, "text": text}
 
 
-def collect_metrics(cfg: Config, max_items: int = 50) -> Dict[str, Any]:
-    state = _load_json(STATE_FILE)
-    posted = state.get("posted", [])
-    ids = [p["tweet_id"] for p in posted[-max_items:] if "tweet_id" in p]
+def collect_metrics(cfg: Config, max_items: int = None) -> Dict[str, Any]:
+    """
+    Organic metrics for the last max_items posted tweets (TWEET_METRICS_MAX_TWEETS
+    by default), fetched in concurrent 100-id batches and stored in tweet_metrics.db.
+    """
+    import tweet_metrics
+    if max_items is None:
+        max_items = int(os.getenv("TWEET_METRICS_MAX_TWEETS", "3000"))
+    posted = rotation_state.recent(max_items)
+    ids = [p["tweet_id"] for p in posted if p.get("tweet_id")]
     res = {"count": 0, "items": []}
     if not ids or not cfg.BEARER:
         return res
-    url = "https://api.twitter.com/2/tweets"
-    params = {"ids": ",".join(ids), "tweet.fields": "created_at,public_metrics"}
-    headers = {"Authorization": f"Bearer {cfg.BEARER}"}
-    resp = requests.get(url, params=params, headers=headers)
-    resp.raise_for_status()
-    data = resp.json()
-    items = data.get("data", [])
-    res["count"] = len(items)
-    res["items"] = items
-    existing = _load_json(METRICS_FILE)
-    existing.setdefault("runs", [])
-    existing["runs"].append({"items": items})
-    _save_json(METRICS_FILE, existing)
+    res = tweet_metrics.collect(ids, cfg.BEARER)
+    res["items"] = res["items"][-50:]
     return res
 
 
@@ -412,8 +386,8 @@ def _load_entity_ids() -> List[str]:
 
 def collect_ads_analytics(cfg: Config) -> Dict[str, Any]:
     """
-    Collect Ads analytics via Ads API v11 synchronous stats endpoint.
-    Returns impressions, engagements, etc. depending on metric_groups.
+    Collect Ads analytics via the Ads API v11 stats endpoints (ADS_STATS_MODE=sync|async).
+    Only buckets not fetched yet are requested; results are merged into ads_stats.db.
     """
     if not cfg.ENABLE_ADS:
         return {"status": "disabled"}
@@ -427,30 +401,10 @@ def collect_ads_analytics(cfg: Config) -> Dict[str, Any]:
     if not ids:
         return {"error": "No Ads entity IDs provided."}
 
-    auth = oauth(cfg)
-    url = f"{BASE_ADS}/stats/accounts/{cfg.ADS_ACCOUNT_ID}"
-    params = {
-        "entity": entity,
-        "entity_ids": ",".join(ids),
-        "granularity": granularity,
-        "metric_groups": metric_groups,
-    }
-    if start_time:
-        params["start_time"] = start_time
-    if end_time:
-        params["end_time"] = end_time
-
-    resp = requests.get(url, auth=auth, params=params)
-    resp.raise_for_status()
-    data = resp.json()
-
-    # Persist
-    existing = _load_json(ADS_METRICS_FILE)
-    existing.setdefault("runs", [])
-    existing["runs"].append(data)
-    _save_json(ADS_METRICS_FILE, existing)
-
-    return {"status": "ok", "count": len(data.get("data", []))}
+    import ads_analytics
+    return ads_analytics.collect(BASE_ADS, cfg.ADS_ACCOUNT_ID, oauth(cfg), entity, ids, granularity=granularity,
+                                 metric_groups=metric_groups, start_time=start_time or None,
+                                 end_time=end_time or None, placement=cfg.PLACEMENT)
 
 
 def post_one_auto(cfg: Config) -> Dict[str, Any]:
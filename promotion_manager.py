@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import http_pool
+
+log = logging.getLogger("promotion_manager")
+
+# Campaigns and line items created by the promotion flow are remembered here and
+# reused across posts; each is re-checked against the Ads API at most every
+# PROMOTION_VERIFY_SEC and re-created when it is gone, paused or can no longer
+# serve (expired, total budget spent). Check-and-create runs under a per-entity
+# lock so concurrent posts never create the same campaign twice.
+_PATH = os.getenv("PROMOTION_STATE_PATH", "promotion_state.json")
+_LOCK = threading.Lock()
+VERIFY_SEC = float(os.getenv("PROMOTION_VERIFY_SEC", "3600"))
+_RETIRED_STATUS = {"DELETED", "PAUSED"}
+_RETIRED_REASONS = {"EXPIRED", "EXCEEDED_TOTAL_BUDGET", "PAUSED_BY_ADVERTISER", "DELETED_BY_ADVERTISER"}
+
+_state: Optional[Dict[str, Any]] = None
+_key_locks: Dict[str, threading.Lock] = {}
+
+
+def _load() -> Dict[str, Any]:
+    global _state
+    if _state is None:
+        data: Dict[str, Any] = {}
+        if os.path.exists(_PATH):
+            try:
+                with open(_PATH, "r", encoding="utf-8") as f:
+                    data = json.load(f) or {}
+            except Exception:
+                data = {}
+        data.setdefault("campaigns", {})
+        data.setdefault("line_items", {})
+        _state = data
+    return _state
+
+
+def _save() -> None:
+    tmp = f"{_PATH}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _PATH)
+
+
+def _key_lock(kind: str, key: str) -> threading.Lock:
+    with _LOCK:
+        return _key_locks.setdefault(f"{kind}|{key}", threading.Lock())
+
+
+def _retired(base: str, account_id: str, auth, kind: str, entity_id: str) -> Optional[str]:
+    # kind: "campaigns" | "line_items". Returns why the entity can no longer be
+    # used, or None. Only a definite answer retires it; network errors keep the
+    # stored id so a flaky API never causes duplicates.
+    try:
+        resp = http_pool.get(f"{base}/accounts/{account_id}/{kind}/{entity_id}", auth=auth,
+                             params={"with_deleted": "true"})
+    except Exception as e:
+        log.warning(f"Could not verify {kind} {entity_id}: {e}")
+        return None
+    if resp.status_code == 404:
+        return "not found"
+    if resp.status_code >= 400:
+        return None
+    try:
+        data = resp.json().get("data") or {}
+    except Exception:
+        return None
+    if data.get("deleted"):
+        return "deleted"
+    status = str(data.get("entity_status") or "").upper()
+    if status in _RETIRED_STATUS:
+        return status.lower()
+    reasons = _RETIRED_REASONS.intersection(data.get("reasons_not_servable") or [])
+    if reasons:
+        return ", ".join(sorted(reasons)).lower()
+    return None
+
+
+def _ensure(kind: str, key: str, base: str, account_id: str, auth, create: Callable[[], str]) -> str:
+    with _key_lock(kind, key):
+        now = time.time()
+        with _LOCK:
+            entry = dict(_load()[kind].get(key) or {})
+        if entry.get("id"):
+            if now - float(entry.get("verified_ts", 0)) < VERIFY_SEC:
+                return entry["id"]
+            reason = _retired(base, account_id, auth, kind, entry["id"])
+            if reason is None:
+                with _LOCK:
+                    _load()[kind].setdefault(key, entry)["verified_ts"] = now
+                    _save()
+                return entry["id"]
+            log.info(f"Stored {kind} {entry['id']} is {reason}; creating a new one")
+        new_id = create()
+        with _LOCK:
+            _load()[kind][key] = {"id": new_id, "created_ts": now, "verified_ts": now}
+            _save()
+        return new_id
+
+
+def campaign(base: str, account_id: str, auth, funding_instrument_id: str, name: str,
+             create: Callable[[], str]) -> str:
+    """
+    Stored campaign for (account, funding instrument, name), created once via create().
+    """
+    return _ensure("campaigns", f"{account_id}|{funding_instrument_id}|{name}", base, account_id, auth, create)
+
+
+def line_item(base: str, account_id: str, auth, campaign_id: str, name: str, placement: str, objective: str,
+              bid_micro: int, create: Callable[[], str]) -> str:
+    """
+    Stored line item for the campaign and its settings, created once via create().
+    """
+    key = f"{account_id}|{campaign_id}|{name}|{placement}|{objective}|{bid_micro}"
+    return _ensure("line_items", key, base, account_id, auth, create)
+
+
+def forget() -> None:
+    with _LOCK:
+        st = _load()
+        st["campaigns"].clear()
+        st["line_items"].clear()
+        _save()
+
+
+def status() -> Dict[str, Any]:
+    with _LOCK:
+        st = _load()
+        return {"campaigns": dict(st["campaigns"]), "line_items": dict(st["line_items"]), "verify_sec": VERIFY_SEC}
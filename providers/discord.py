@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 
 log = logging.getLogger("providers.discord")
 
@@ -16,7 +16,7 @@ class DiscordProvider:
             return {"provider": self.name, "status": "skipped", "detail": {"reason": "DISCORD_WEBHOOK_URL missing"}}
         try:
             payload = {"content": text}
-            resp = requests.post(self.webhook_url, json=payload, timeout=20)
+            resp = http_pool.post(self.webhook_url, provider=self.name, json=payload, timeout=20)
             if 200 <= resp.status_code < 300:
                 return {"provider": self.name, "status": "ok", "detail": {"status_code": resp.status_code}}
             else:
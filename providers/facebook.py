@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 
 log = logging.getLogger("providers.facebook")
 
@@ -17,7 +17,7 @@ class FacebookProvider:
             return {"provider": self.name, "status": "skipped", "detail": {"reason": "FB_PAGE_ID or FB_ACCESS_TOKEN missing"}}
         try:
             url = f"https://graph.facebook.com/v19.0/{self.page_id}/feed"
-            resp = requests.post(url, data={"message": text, "access_token": self.access_token}, timeout=20)
+            resp = http_pool.post(url, provider=self.name, data={"message": text, "access_token": self.access_token}, timeout=20)
             resp.raise_for_status()
             data = resp.json()
             return {"provider": self.name, "status": "ok", "detail": data}
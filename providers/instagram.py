@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 
 log = logging.getLogger("providers.instagram")
 
@@ -23,14 +23,14 @@ class InstagramProvider:
             # Step 1: Create media container
             create_url = f"https://graph.facebook.com/v19.0/{self.user_id}/media"
             create_params = {"image_url": self.image_url, "caption": text, "access_token": self.access_token}
-            create_resp = requests.post(create_url, data=create_params, timeout=30)
+            create_resp = http_pool.post(create_url, provider=self.name, data=create_params, timeout=30)
             create_resp.raise_for_status()
             creation_id = create_resp.json().get("id")
 
             # Step 2: Publish the media
             publish_url = f"https://graph.facebook.com/v19.0/{self.user_id}/media_publish"
             publish_params = {"creation_id": creation_id, "access_token": self.access_token}
-            publish_resp = requests.post(publish_url, data=publish_params, timeout=30)
+            publish_resp = http_pool.post(publish_url, provider=self.name, data=publish_params, timeout=30)
             publish_resp.raise_for_status()
 
             return {"provider": self.name, "status": "ok", "detail": {"creation_id": creation_id}}
@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 
 log = logging.getLogger("providers.line")
 
@@ -23,7 +23,7 @@ class LineProvider:
             payload = {
                 "messages": [{"type": "text", "text": text}],
             }
-            resp = requests.post(url, headers=headers, json=payload, timeout=20)
+            resp = http_pool.post(url, provider=self.name, headers=headers, json=payload, timeout=20)
             # LINE returns 200 with empty body on success
             if resp.status_code == 200:
                 return {"provider": self.name, "status": "ok", "detail": {"status_code": 200}}
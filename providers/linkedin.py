@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 
 log = logging.getLogger("providers.linkedin")
 
@@ -33,7 +33,7 @@ class LinkedInProvider:
                 },
                 "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"},
             }
-            resp = requests.post(url, headers=headers, json=payload, timeout=30)
+            resp = http_pool.post(url, provider=self.name, headers=headers, json=payload, timeout=30)
             resp.raise_for_status()
             data = resp.json()
             return {"provider": self.name, "status": "ok", "detail": data}
@@ -1,6 +1,6 @@
 import os
 import logging
-import requests
+import http_pool
 
 log = logging.getLogger("providers.mastodon")
 
@@ -18,7 +18,7 @@ class MastodonProvider:
         try:
             url = f"{self.base_url.rstrip('/')}/api/v1/statuses"
             headers = {"Authorization": f"Bearer {self.access_token}"}
-            resp = requests.post(url, headers=headers, data={"status": text}, timeout=15)
+            resp = http_pool.post(url, provider=self.name, headers=headers, data={"status": text}, timeout=15)
             resp.raise_for_status()
             data = resp.json()
             return {"provider": self.name, "status": "ok", "detail": data}
@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 from requests.auth import HTTPBasicAuth
 
 log = logging.getLogger("providers.reddit")
@@ -20,7 +20,7 @@ class RedditProvider:
         auth = HTTPBasicAuth(self.client_id, self.client_secret)
         data = {"grant_type": "password", "username": self.username, "password": self.password}
         headers = {"User-Agent": "BeeBellBot/1.0"}
-        resp = requests.post("https://www.reddit.com/api/v1/access_token", auth=auth, data=data, headers=headers, timeout=20)
+        resp = http_pool.post("https://www.reddit.com/api/v1/access_token", provider=self.name, auth=auth, data=data, headers=headers, timeout=20)
         resp.raise_for_status()
         return resp.json().get("access_token")
 
@@ -31,7 +31,7 @@ class RedditProvider:
             token = self._get_token()
             headers = {"Authorization": f"Bearer {token}", "User-Agent": "BeeBellBot/1.0"}
             payload = {"sr": self.subreddit, "title": text[:280], "kind": "self", "text": text}
-            resp = requests.post("https://oauth.reddit.com/api/submit", headers=headers, data=payload, timeout=20)
+            resp = http_pool.post("https://oauth.reddit.com/api/submit", provider=self.name, headers=headers, data=payload, timeout=20)
             resp.raise_for_status()
             data = resp.json() if resp.headers.get("Content-Type", "").startswith("application/json") else {"status_code": resp.status_code}
             return {"provider": self.name, "status": "ok", "detail": data}
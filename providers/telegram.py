@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+import http_pool
 
 log = logging.getLogger("providers.telegram")
 
@@ -18,7 +18,7 @@ class TelegramProvider:
         try:
             url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
             payload = {"chat_id": self.chat_id, "text": text}
-            resp = requests.post(url, data=payload, timeout=20)
+            resp = http_pool.post(url, provider=self.name, data=payload, timeout=20)
             resp.raise_for_status()
             data = resp.json()
             return {"provider": self.name, "status": "ok", "detail": data}
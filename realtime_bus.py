@@ -1,18 +1,23 @@
-import json
 import os
 import time
 from threading import Condition
-from collections import deque
-from typing import Deque, Dict, Generator, List, Optional
+from typing import Dict, Generator, List, Optional, Tuple
 
-# In-memory event buffer with condition for SSE-style streaming
+import event_journal
+import telemetry
+
+# In-memory ring buffer with condition for SSE-style streaming.
+# Event id N lives in slot N % _MAX_EVENTS, so a reader's position is an O(1) offset.
 _MAX_EVENTS = 2000
-_events: Deque[Dict] = deque(maxlen=_MAX_EVENTS)
+_ring: List[Optional[Dict]] = [None] * _MAX_EVENTS
+_next_id = 0  # id the next published event receives
 _cv: Condition = Condition()
 
 LOG_DIR = "outputs"
 EVENTS_LOG = os.path.join(LOG_DIR, "events.jsonl")
 
+_M_PUBLISHED = telemetry.counter("bus_events_published", "Events published on the realtime bus by type")
+
 
 def _ensure_dirs() -> None:
     os.makedirs(LOG_DIR, exist_ok=True)
@@ -22,65 +27,112 @@ def _ensure_dirs() -> None:
 
 
 _ensure_dirs()
+event_journal.start(EVENTS_LOG)
 
 
 def publish(event: Dict) -> Dict:
     """
-    Publish an event to the in-memory queue and append to events.jsonl.
+    Publish an event to the in-memory queue and queue it for events.jsonl.
     Adds id and ts fields.
     """
     event = dict(event)  # copy
     event.setdefault("ts", time.time())
-    # Persist
-    try:
-        with open(EVENTS_LOG, "a", encoding="utf-8") as f:
-            f.write(json.dumps(event, ensure_ascii=False) + "\n")
-    except Exception:
-        # do not block pipeline due to logging errors
-        pass
+    global _next_id
     with _cv:
         # Attach incremental id
-        next_id = (_events[-1]["id"] + 1) if _events else 0
-        event["id"] = next_id
-        _events.append(event)
+        event["id"] = _next_id
+        _ring[_next_id % _MAX_EVENTS] = event
+        _next_id += 1
         _cv.notify_all()
+    # Persist (batched by the journal writer thread; never blocks the publisher)
+    event_journal.append(event)
+    _M_PUBLISHED.inc(type=str(event.get("type", "unknown")))
     return event
 
 
+def _oldest_id() -> int:
+    return max(0, _next_id - _MAX_EVENTS)
+
+
+def _slice(start: int, end: int) -> List[Dict]:
+    # Copy references for ids [start, end); caller holds _cv
+    return [_ring[i % _MAX_EVENTS] for i in range(start, end)]  # type: ignore[misc]
+
+
+def read_since(last_id: int, max_batch: int = 500) -> Tuple[List[Dict], int, int]:
+    """
+    Non-blocking read of events with id >= last_id.
+    Returns (events, next_last_id, evicted) where evicted counts events that
+    were overwritten before this reader got to them.
+    """
+    with _cv:
+        oldest = _oldest_id()
+        evicted = 0
+        if last_id < oldest:
+            evicted = oldest - last_id
+            last_id = oldest
+        end = min(_next_id, last_id + max(1, max_batch))
+        batch = _slice(last_id, end) if end > last_id else []
+    return batch, end if batch else last_id, evicted
+
+
+def head_id() -> int:
+    """
+    Id the next published event will get (start position for new readers).
+    """
+    with _cv:
+        return _next_id
+
+
+def wait(last_id: int, timeout: Optional[float] = None) -> bool:
+    """
+    Block until an event with id >= last_id exists or timeout passes.
+    """
+    with _cv:
+        if _next_id > last_id:
+            return True
+        _cv.wait(timeout=timeout)
+        return _next_id > last_id
+
+
+def _collect():
+    yield ("bus_head_id", "gauge", "Id the next published event receives", {}, _next_id)
+    yield ("bus_ring_capacity", "gauge", "Events retained in the in-memory ring", {}, _MAX_EVENTS)
+
+
+telemetry.register_collector(_collect)
+
+
 def recent(n: int = 100) -> List[Dict]:
     with _cv:
-        return list(_events)[-n:]
+        start = max(_oldest_id(), _next_id - max(0, n))
+        return _slice(start, _next_id)
 
 
 def stream(last_id: Optional[int] = None, keepalive_sec: float = 1.0) -> Generator[Dict, None, None]:
     """
     Generator that yields events as they arrive. Includes keepalive events.
+    If last_id was already evicted from the buffer, yields one
+    {"type": "evicted", ...} event telling the client where it resumed.
     """
     if last_id is None:
-        with _cv:
-            last_id = _events[-1]["id"] + 1 if _events else 0
+        last_id = head_id()
     last_keep = time.time()
     while True:
         with _cv:
-            while True:
-                if _events and _events[-1]["id"] >= last_id:
-                    # find next item
-                    for ev in _events:
-                        if ev["id"] == last_id:
-                            last_id += 1
-                            yield ev
-                            break
-                    else:
-                        # Not found (maybe evicted by maxlen); jump to end.
-                        last_id = _events[-1]["id"] + 1
-                else:
-                    break
-            # Wait for new events or keepalive timeout
-            now = time.time()
-            remaining = max(0.0, keepalive_sec - (now - last_keep))
-            _cv.wait(timeout=remaining)
-        # keepalive outside lock
+            if _next_id <= last_id:
+                # Wait for new events or keepalive timeout
+                remaining = max(0.0, keepalive_sec - (time.time() - last_keep))
+                _cv.wait(timeout=remaining)
+        # copy out a batch under the lock, yield outside it
+        batch, next_id, evicted = read_since(last_id)
+        if evicted:
+            yield {"type": "evicted", "ts": time.time(), "requested_id": last_id,
+                   "resume_id": last_id + evicted, "dropped": evicted}
+        last_id = next_id
+        for ev in batch:
+            yield ev
         now2 = time.time()
         if now2 - last_keep >= keepalive_sec:
             last_keep = now2
-            yield {"type": "keepalive", "ts": now2}
\ No newline at end of file
+            yield {"type": "keepalive", "ts": now2}
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+# Tweet rotation: a cursor into the tweet source plus an append-only posted log.
+# Each log line records the generation (full pass over the source) and the
+# index that was posted, so the cursor is recovered from the log tail on start
+# and nothing already written is ever rewritten.
+_PATH = os.getenv("POSTED_LOG_PATH", "posted_log.jsonl")
+_LEGACY_PATH = "posted_state.json"     # imported once, then renamed to .imported
+_LOCK = threading.Lock()
+_TAIL_BLOCK = 64 * 1024
+
+_loaded = False
+_cursor = 0                 # index into the source of the next candidate
+_generation = 0
+_used: Set[str] = set()     # text hashes posted in the current generation
+_pending: Optional[Dict[str, Any]] = None  # last pick, consumed by mark_used
+
+
+def _hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _tail_lines():
+    # Yield log lines newest first, reading fixed-size blocks from the end
+    if not os.path.exists(_PATH):
+        return
+    with open(_PATH, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        rest = b""
+        while pos > 0:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + rest
+            lines = chunk.split(b"\n")
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if rest.strip():
+            yield rest
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        rec = json.loads(line)
+        return rec if isinstance(rec, dict) else None
+    except Exception:
+        return None
+
+
+def _append(records: List[Dict[str, Any]]) -> None:
+    with open(_PATH, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def _import_legacy() -> None:
+    # posted_state.json -> posted log (generation 0); used_texts stay used
+    if os.path.exists(_PATH) or not os.path.exists(_LEGACY_PATH):
+        return
+    try:
+        with open(_LEGACY_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception:
+        return
+    used = [str(t) for t in state.get("used_texts", []) if t]
+    posted = [p for p in state.get("posted", []) if isinstance(p, dict)]
+    records = [{"ts": None, "gen": 0, "idx": None, "h": _hash(str(p.get("text", ""))),
+                "text": p.get("text"), "tweet_id": p.get("tweet_id")} for p in posted]
+    logged = {r["h"] for r in records}
+    records.extend({"ts": None, "gen": 0, "idx": None, "h": _hash(t), "text": t, "tweet_id": None}
+                   for t in used if _hash(t) not in logged)
+    # Only texts still in used_texts belong to the current generation
+    live = {_hash(t) for t in used}
+    for r in records:
+        if r["h"] not in live:
+            r["gen"] = -1
+    records.sort(key=lambda r: r["gen"])
+    _append(records)
+    try:
+        os.replace(_LEGACY_PATH, f"{_LEGACY_PATH}.imported")
+    except Exception:
+        pass
+
+
+def _ensure_loaded() -> None:
+    # caller holds _LOCK
+    global _loaded, _cursor, _generation
+    if _loaded:
+        return
+    _loaded = True
+    _import_legacy()
+    gen = None
+    for line in _tail_lines():
+        rec = _parse(line)
+        if rec is None:
+            continue
+        if gen is None:
+            gen = int(rec.get("gen") or 0)
+            idx = rec.get("idx")
+            _generation = max(0, gen)
+            _cursor = int(idx) + 1 if isinstance(idx, int) else 0
+        if int(rec.get("gen") or 0) != gen:
+            break
+        if rec.get("h") and gen >= 0:
+            _used.add(rec["h"])
+
+
+def next_text(tweets: List[str]) -> Optional[str]:
+    """
+    Next unposted text of the current pass over tweets, starting a new pass
+    when the cursor runs off the end. None when tweets is empty.
+    """
+    global _cursor, _generation, _pending
+    if not tweets:
+        return None
+    with _LOCK:
+        _ensure_loaded()
+        for _ in range(2):
+            while _cursor < len(tweets):
+                text = tweets[_cursor]
+                if _hash(text) not in _used:
+                    _pending = {"idx": _cursor, "h": _hash(text)}
+                    return text
+                _cursor += 1
+            # every text used: start the next generation
+            _generation += 1
+            _cursor = 0
+            _used.clear()
+    return tweets[0]
+
+
+def mark_posted(text: str, tweet_id: Optional[str]) -> None:
+    """
+    Append the post to the log and advance the cursor past it.
+    """
+    global _cursor, _pending
+    h = _hash(text)
+    with _LOCK:
+        _ensure_loaded()
+        idx = None
+        if _pending and _pending["h"] == h:
+            idx = _pending["idx"]
+            _cursor = idx + 1
+        _pending = None
+        _used.add(h)
+        _append([{"ts": time.time(), "gen": _generation, "idx": idx, "h": h, "text": text, "tweet_id": tweet_id}])
+
+
+def recent(n: int = 50) -> List[Dict[str, Any]]:
+    """
+    Last n posted records, oldest first (reads only the log tail).
+    """
+    out: List[Dict[str, Any]] = []
+    with _LOCK:
+        _ensure_loaded()
+        for line in _tail_lines():
+            if len(out) >= n:
+                break
+            rec = _parse(line)
+            if rec is not None:
+                out.append(rec)
+    out.reverse()
+    return out
+
+
+def status() -> Dict[str, Any]:
+    with _LOCK:
+        _ensure_loaded()
+        return {"cursor": _cursor, "generation": _generation, "used_in_generation": len(_used), "log_path": _PATH}
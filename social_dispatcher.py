@@ -1,7 +1,10 @@
 import os
 import json
 import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from typing import List, Dict, Any, Optional
 
 from promote_ayutthaya import Config, post_one_auto
@@ -16,7 +19,8 @@ from providers.reddit import RedditProvider
 from providers.tiktok_ads import TikTokAdsProvider
 from providers.mastodon import MastodonProvider
 
-from circuit_breaker import call_with_circuit
+import telemetry
+from circuit_breaker import RetryBudget, call_with_circuit, call_with_circuit_async
 
 log = logging.getLogger("social_dispatcher")
 
@@ -32,6 +36,26 @@ def _bool_env(name: str, default: bool = False) -> bool:
 SIMULATE_ALL_PROVIDERS = _bool_env("SIMULATE_ALL_PROVIDERS", False)
 SIMULATE_ON_ERROR = _bool_env("SIMULATE_ON_ERROR", False)
 
+# Concurrent fan-out to non-Twitter providers (sequential when disabled)
+DISPATCH_CONCURRENT = _bool_env("DISPATCH_CONCURRENT", True)
+DISPATCH_MAX_WORKERS = int(os.getenv("DISPATCH_MAX_WORKERS", "10"))                 # bounded pool size
+DISPATCH_PROVIDER_TIMEOUT_SEC = float(os.getenv("DISPATCH_PROVIDER_TIMEOUT_SEC", "30"))  # per provider
+DISPATCH_CYCLE_DEADLINE_SEC = float(os.getenv("DISPATCH_CYCLE_DEADLINE_SEC", "45"))      # whole fan-out
+DISPATCH_RETRY_BUDGET = int(os.getenv("DISPATCH_RETRY_BUDGET", "10"))                    # retries shared per cycle
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+# Provider registry: Config + provider instances built once, rebuilt on store changes
+_REGISTRY: Dict[str, Any] = {"key": None, "cfg": None, "providers": [], "names": [], "has_creds": False}
+_REGISTRY_LOCK = threading.Lock()
+
+_M_CYCLE = telemetry.histogram("dispatch_cycle_seconds", "distribute_once wall time")
+_M_CYCLES = telemetry.counter("dispatch_cycles", "distribute_once calls by outcome")
+_M_STATUS = telemetry.counter("dispatch_provider_status", "Final per-provider status of each cycle")
+_M_POST = telemetry.histogram("provider_post_seconds", "Provider post() latency per attempt")
+_M_POSTS = telemetry.counter("provider_posts", "Provider post() attempts by outcome")
+
 
 def _provider_names() -> List[str]:
     try:
@@ -75,8 +99,8 @@ def _has_credentials(name: str) -> bool:
     return False
 
 
-def _build_providers(cfg: Config) -> List:
-    names = _provider_names()
+def _build_providers(cfg: Config, names: Optional[List[str]] = None) -> List:
+    names = _provider_names() if names is None else names
     providers = []
     for n in names:
         if n == "twitter":
@@ -104,6 +128,44 @@ def _build_providers(cfg: Config) -> List:
     return providers
 
 
+def _registry_key() -> tuple:
+    try:
+        import config_store
+        cfg_ver = config_store.version()
+    except Exception:
+        cfg_ver = None
+    try:
+        import credentials_store
+        cred_ver = credentials_store.version()
+    except Exception:
+        cred_ver = None
+    return (cfg_ver, cred_ver, os.getenv("PROVIDERS"))
+
+
+def _registry() -> Dict[str, Any]:
+    """
+    Return the cached Config/providers, rebuilding only when config_store or
+    credentials_store report a new version.
+    """
+    key = _registry_key()
+    with _REGISTRY_LOCK:
+        if _REGISTRY["key"] != key or _REGISTRY["cfg"] is None:
+            cfg = Config()
+            names = _provider_names()
+            _REGISTRY["cfg"] = cfg
+            _REGISTRY["names"] = names
+            _REGISTRY["providers"] = _build_providers(cfg, names)
+            _REGISTRY["has_creds"] = any(_has_credentials(n) for n in names)
+            _REGISTRY["key"] = key
+            log.info(f"Provider registry rebuilt: {names}")
+        return dict(_REGISTRY)
+
+
+def reset_registry() -> None:
+    with _REGISTRY_LOCK:
+        _REGISTRY["key"] = None
+
+
 def _simulate_post(provider_name: str, text: str) -> Dict[str, Any]:
     try:
         import outbox
@@ -142,7 +204,28 @@ def _generate_text() -> str:
         return "สวัสดีจากระบบอัตโนมัติ"
 
 
-def _post_with_cb(p, text: str) -> Dict[str, Any]:
+def _timed(name: str, fn):
+    # Per-attempt provider latency for latency_stats (ok or not)
+    def wrapped():
+        t0 = time.monotonic()
+        outcome = "error"
+        try:
+            ret = fn()
+            outcome = "ok"
+            return ret
+        finally:
+            dt = time.monotonic() - t0
+            _M_POST.observe(dt, provider=name)
+            _M_POSTS.inc(provider=name, outcome=outcome)
+            try:
+                import latency_stats
+                latency_stats.record("provider", name, dt)
+            except Exception:
+                pass
+    return wrapped
+
+
+def _provider_call(p, text: str):
     name = getattr(p, "name", "unknown") or "unknown"
 
     def fn():
@@ -150,17 +233,130 @@ def _post_with_cb(p, text: str) -> Dict[str, Any]:
         if isinstance(result, dict) and result.get("status") in {"error"}:
             raise RuntimeError(str(result.get("detail", {}).get("error", "provider_error")))
         return result
+    return _timed(name, fn)
 
+
+def _finish_post(name: str, ret: Any, text: str) -> Dict[str, Any]:
+    if isinstance(ret, dict):
+        return _maybe_simulate(ret, name, text)
+    return {"provider": name, "status": "ok", "detail": {"result": ret}}
+
+
+def _post_failed(name: str, text: str, e: Exception) -> Dict[str, Any]:
+    log.error(f"Provider {name} failed after circuit handling: {e}", exc_info=True)
+    if SIMULATE_ON_ERROR:
+        return _simulate_post(name, text)
+    return {"provider": name, "status": "error", "detail": {"error": str(e)}}
+
+
+def _post_with_cb(p, text: str) -> Dict[str, Any]:
+    name = getattr(p, "name", "unknown") or "unknown"
     try:
-        ret = call_with_circuit(name, fn)
-        if isinstance(ret, dict):
-            return _maybe_simulate(ret, name, text)
-        return {"provider": name, "status": "ok", "detail": {"result": ret}}
+        return _finish_post(name, call_with_circuit(name, _provider_call(p, text)), text)
     except Exception as e:
-        log.error(f"Provider {name} failed after circuit handling: {e}", exc_info=True)
-        if SIMULATE_ON_ERROR:
-            return _simulate_post(name, text)
-        return {"provider": name, "status": "error", "detail": {"error": str(e)}}
+        return _post_failed(name, text, e)
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Shared across cycles: a provider that overruns its timeout keeps running in
+    # the background instead of blocking the next cycle on pool shutdown.
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max(1, DISPATCH_MAX_WORKERS),
+                                           thread_name_prefix="dispatch")
+        return _EXECUTOR
+
+
+def _timeout_status(name: str, reason: str, timeout_sec: float, queued_sec: float = 0.0) -> Dict[str, Any]:
+    log.warning(f"Provider {name} did not finish in time ({reason}, {timeout_sec:.1f}s, queued {queued_sec:.1f}s)")
+    return {"provider": name, "status": "error",
+            "detail": {"error": reason, "timeout_sec": timeout_sec, "queued_sec": round(queued_sec, 3)}}
+
+
+def _submit(pool: ThreadPoolExecutor, name: str, fn, budget: RetryBudget) -> Dict[str, Any]:
+    # Notes when the first attempt actually starts, so time spent queued behind
+    # other work on the shared pool does not count against the provider timeout
+    task: Dict[str, Any] = {"name": name, "submitted": time.monotonic(), "started": None,
+                            "event": threading.Event()}
+
+    def run():
+        if task["started"] is None:
+            task["started"] = time.monotonic()
+            task["event"].set()
+        return fn()
+    fut = call_with_circuit_async(name, run, executor=pool, budget=budget)
+    fut.add_done_callback(lambda f: task["event"].set())  # resolved without running (circuit open)
+    task["future"] = fut
+    return task
+
+
+def _await(task: Dict[str, Any], deadline: float):
+    """
+    Result of a submitted task, or (None, timeout status). The per-provider
+    timeout runs from the first attempt's start; queueing is bounded only by
+    the cycle deadline and reported separately as queued_sec.
+    """
+    name, fut = task["name"], task["future"]
+    if not task["event"].wait(max(0.0, deadline - time.monotonic())):
+        fut.cancel()
+        return None, _timeout_status(name, "cycle_deadline", DISPATCH_CYCLE_DEADLINE_SEC,
+                                     time.monotonic() - task["submitted"])
+    begun = task["started"] or time.monotonic()
+    queued = begun - task["submitted"]
+    now = time.monotonic()
+    provider_left = begun + DISPATCH_PROVIDER_TIMEOUT_SEC - now
+    cycle_left = deadline - now
+    try:
+        return fut.result(timeout=max(0.0, min(provider_left, cycle_left))), None
+    except FutureTimeout:
+        fut.cancel()
+        if cycle_left <= provider_left:
+            return None, _timeout_status(name, "cycle_deadline", DISPATCH_CYCLE_DEADLINE_SEC, queued)
+        return None, _timeout_status(name, "provider_timeout", DISPATCH_PROVIDER_TIMEOUT_SEC, queued)
+
+
+def _cycle_budget() -> RetryBudget:
+    # One retry allowance per dispatch cycle, refused past the cycle deadline
+    return RetryBudget(DISPATCH_RETRY_BUDGET, deadline=time.monotonic() + DISPATCH_CYCLE_DEADLINE_SEC)
+
+
+def _fan_out(providers: List, text: str, budget: Optional[RetryBudget] = None) -> List[Dict[str, Any]]:
+    """
+    Post text to every non-Twitter provider and return statuses in provider order.
+    Concurrent mode starts every post on a bounded pool; retries are re-queued by
+    the circuit breaker's scheduler (no sleeping workers) and share one retry
+    budget per cycle. Each provider gets the per-provider timeout from when its
+    first attempt starts, and everything is bounded by the per-cycle deadline.
+    """
+    targets = [p for p in providers if getattr(p, "name", "") != "twitter"]
+    if not DISPATCH_CONCURRENT or len(targets) <= 1:
+        return [_post_with_cb(p, text) for p in targets]
+
+    pool = _executor()
+    budget = budget or _cycle_budget()
+    deadline = budget.deadline
+    tasks = []
+    for p in targets:
+        name = getattr(p, "name", "unknown") or "unknown"
+        try:
+            tasks.append(_submit(pool, name, _provider_call(p, text), budget))
+        except Exception as e:
+            tasks.append({"name": name, "error": e})
+
+    statuses: List[Dict[str, Any]] = []
+    for task in tasks:
+        name = task["name"]
+        if "error" in task:
+            statuses.append(_post_failed(name, text, task["error"]))
+            continue
+        try:
+            ret, timed_out = _await(task, deadline)
+        except Exception as e:
+            statuses.append(_post_failed(name, text, e))
+            continue
+        statuses.append(timed_out or _finish_post(name, ret, text))
+    return statuses
 
 
 def distribute_once() -> Dict[str, Any]:
@@ -168,13 +364,30 @@ def distribute_once() -> Dict[str, Any]:
     Pull next text (tweets.txt/import/generator) and distribute to providers.
     Real API mode by default; simulation can be enabled by env flags.
     """
-    cfg = Config()
-    providers = _build_providers(cfg)
+    t0 = time.monotonic()
+    try:
+        result = _distribute()
+    except Exception:
+        _M_CYCLES.inc(outcome="exception")
+        raise
+    finally:
+        _M_CYCLE.observe(time.monotonic() - t0)
+    _M_CYCLES.inc(outcome="simulated" if SIMULATE_ALL_PROVIDERS else "ok")
+    for st in result.get("providers") or []:
+        if isinstance(st, dict):
+            _M_STATUS.inc(provider=str(st.get("provider", "unknown")), status=str(st.get("status", "unknown")))
+    return result
+
+
+def _distribute() -> Dict[str, Any]:
+    reg = _registry()
+    cfg = reg["cfg"]
+    providers = reg["providers"]
 
     # Auto-enable simulation if no provider has credentials configured
     try:
-        names = _provider_names()
-        if names and not any(_has_credentials(n) for n in names):
+        names = reg["names"]
+        if names and not reg["has_creds"]:
             global SIMULATE_ALL_PROVIDERS
             SIMULATE_ALL_PROVIDERS = True
             log.info("No provider credentials detected; enabling SIMULATE_ALL_PROVIDERS=True automatically.")
@@ -197,43 +410,23 @@ def distribute_once() -> Dict[str, Any]:
         twitter_detail = {"provider": "twitter", "status": "ok", "detail": {"simulated": True}}
         return {"text": text, "providers": statuses, "twitter_detail": twitter_detail}
 
-    # Real mode: post on Twitter with CB
-    def _tw_call():
-        return post_one_auto(cfg)
-
-    tw_result = call_with_circuit("twitter", _tw_call)
-
-    if isinstance(tw_result, dict) and "provider" in tw_result and "status" in tw_result:
-        twitter_detail = _maybe_simulate(tw_result, "twitter", tw_result.get("text") or "")
-        text = twitter_detail.get("text")
-        statuses.append(twitter_detail)
+    # Real mode: post on Twitter with CB. Concurrent mode runs it on the dispatch
+    # pool like the other providers, drawing retries from the same cycle budget;
+    # the fan-out still waits for it because the tweet decides the text.
+    _tw_call = _timed("twitter", lambda: post_one_auto(cfg))
+    budget = None
+    if DISPATCH_CONCURRENT:
+        budget = _cycle_budget()
+        try:
+            tw_result, timed_out = _await(_submit(_executor(), "twitter", _tw_call, budget), budget.deadline)
+            tw_result = timed_out or tw_result
+        except Exception as e:
+            tw_result = {"provider": "twitter", "status": "error", "detail": {"error": str(e)}}
     else:
-        twitter_detail = tw_result if isinstance(tw_result, dict) else {}
-        text = (twitter_detail or {}).get("text")
-        statuses.append({"provider": "twitter", "status": "ok", "detail": {"tweet_id": twitter_detail.get("tweet_id")}})
-
-    if not text:
-        text = _generate_text()
-
-    for p in providers:
-        if getattr(p, "name", "") == "twitter":
-            continue
-        statuses.append(_post_with_cb(p, text))
-
-    return {"text": text, "providers": statuses, "twitter_detail": twitter_detail}
-
-    # Real mode attempt: post on Twitter with CB (if credentials missing, will error -> simulate on error)
-    def _tw_call():
-        return post_one_auto(cfg)
-
-    try:
         tw_result = call_with_circuit("twitter", _tw_call)
-    except Exception as e:
-        log.error(f"Twitter call failed: {e}", exc_info=True)
-        tw_result = {"provider": "twitter", "status": "error", "detail": {"error": str(e)}}
 
     if isinstance(tw_result, dict) and "provider" in tw_result and "status" in tw_result:
-        twitter_detail = _maybe_simulate(tw_result, "twitter", (tw_result.get("text") or ""))  # type: ignore[arg-type]
+        twitter_detail = _maybe_simulate(tw_result, "twitter", tw_result.get("text") or "")
         text = twitter_detail.get("text")
         statuses.append(twitter_detail)
     else:
@@ -244,9 +437,6 @@ def distribute_once() -> Dict[str, Any]:
     if not text:
         text = _generate_text()
 
-    for p in providers:
-        if getattr(p, "name", "") == "twitter":
-            continue
-        statuses.append(_post_with_cb(p, text))
+    statuses.extend(_fan_out(providers, text, budget))
 
-    return {"text": text, "providers": statuses, "twitter_detail": twitter_detail}
\ No newline at end of file
+    return {"text": text, "providers": statuses, "twitter_detail": twitter_detail}
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import realtime_bus as bus
+
+# One pump thread reads the bus, encodes each event to SSE bytes once and hands
+# the same buffer to every subscriber queue.
+KEEPALIVE_SEC = float(os.getenv("SSE_KEEPALIVE_SEC", "1.0"))
+QUEUE_MAX = int(os.getenv("SSE_SUBSCRIBER_QUEUE", "256"))               # buffered chunks per subscriber
+SLOW_POLICY = os.getenv("SSE_SLOW_POLICY", "collapse").strip().lower()  # collapse | drop
+REPLAY_CACHE = int(os.getenv("SSE_REPLAY_CACHE", "500"))                # encoded events kept for last_id replays
+
+_lock = threading.Lock()
+_subs: Dict[int, "Subscriber"] = {}
+_sub_seq = 0
+_pos = 0  # next bus id to broadcast
+_encoded: Dict[int, bytes] = {}
+_encoded_order: Deque[int] = deque()
+_pump: Optional[threading.Thread] = None
+_stats = {"encoded": 0, "collapsed": 0, "dropped_subscribers": 0, "evicted_events": 0}
+
+
+def encode(event: Dict[str, Any]) -> bytes:
+    return ("data: " + json.dumps(event, ensure_ascii=False) + "\n\n").encode("utf-8")
+
+
+class Subscriber:
+    """
+    Bounded queue of pre-encoded SSE chunks for one client. While a replay is
+    pending, live chunks are held back so they are queued after the replay.
+    """
+
+    def __init__(self, sid: int, maxlen: int, replaying: bool = False):
+        self.id = sid
+        self.maxlen = maxlen
+        self.connected_at = time.time()
+        self.delivered = 0
+        self.collapsed = 0
+        self.closed = False
+        self._q: Deque[bytes] = deque()
+        self._held: Optional[Deque[bytes]] = deque() if replaying else None
+        self._cv = threading.Condition()
+
+    def push(self, chunk: bytes) -> bool:
+        """
+        Queue a chunk; returns False when the subscriber should be dropped.
+        """
+        with self._cv:
+            if self._held is not None and not self.closed:
+                self._held.append(chunk)
+                return True
+            return self._enqueue(chunk)
+
+    def replay(self, chunks: List[bytes]) -> bool:
+        """
+        Queue replayed chunks, then the live chunks held meanwhile, and switch to live.
+        """
+        with self._cv:
+            held, self._held = self._held or deque(), None
+            for chunk in chunks:
+                if not self._enqueue(chunk):
+                    return False
+            for chunk in held:
+                if not self._enqueue(chunk):
+                    return False
+            return True
+
+    def _enqueue(self, chunk: bytes) -> bool:
+        # caller holds self._cv
+        if self.closed:
+            return False
+        if len(self._q) >= self.maxlen:
+            if SLOW_POLICY == "drop":
+                self.closed = True
+                self._cv.notify_all()
+                return False
+            # collapse: discard the backlog and tell the client what it missed
+            missed = len(self._q)
+            self._q.clear()
+            self.collapsed += missed
+            self._q.append(encode({"type": "lagged", "ts": time.time(), "dropped": missed}))
+        self._q.append(chunk)
+        self._cv.notify()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Return all pending chunks joined (b"" on timeout) or None once closed.
+        """
+        with self._cv:
+            if not self._q and not self.closed:
+                self._cv.wait(timeout=timeout)
+            if self._q:
+                out = b"".join(self._q)
+                self.delivered += len(self._q)
+                self._q.clear()
+                return out
+            return None if self.closed else b""
+
+    def close(self) -> None:
+        with self._cv:
+            self.closed = True
+            self._cv.notify_all()
+
+    def lag(self) -> int:
+        with self._cv:
+            return len(self._q)
+
+
+def _remember(eid: int, chunk: bytes) -> None:
+    # caller holds _lock
+    _encoded[eid] = chunk
+    _encoded_order.append(eid)
+    while len(_encoded_order) > REPLAY_CACHE:
+        _encoded.pop(_encoded_order.popleft(), None)
+
+
+def _broadcast(chunks: List[bytes]) -> None:
+    # caller holds _lock
+    for sid, sub in list(_subs.items()):
+        for chunk in chunks:
+            if not sub.push(chunk):
+                _subs.pop(sid, None)
+                _stats["dropped_subscribers"] += 1
+                _stats["collapsed"] += sub.collapsed
+                break
+
+
+def _run() -> None:
+    global _pos
+    last_keep = time.monotonic()
+    while True:
+        bus.wait(_pos, timeout=KEEPALIVE_SEC)
+        batch, nxt, evicted = bus.read_since(_pos)
+        chunks = []
+        with _lock:
+            if evicted:
+                _stats["evicted_events"] += evicted
+            if _subs:
+                for ev in batch:
+                    chunk = encode(ev)
+                    _remember(int(ev.get("id", -1)), chunk)
+                    chunks.append(chunk)
+                _stats["encoded"] += len(chunks)
+            _pos = nxt
+            now = time.monotonic()
+            if now - last_keep >= KEEPALIVE_SEC:
+                last_keep = now
+                chunks.append(encode({"type": "keepalive", "ts": time.time()}))
+            if chunks:
+                _broadcast(chunks)
+
+
+def _ensure_started() -> None:
+    global _pump, _pos
+    with _lock:
+        if _pump is None:
+            _pos = bus.head_id()
+            _pump = threading.Thread(target=_run, daemon=True, name="sse-broadcaster")
+            _pump.start()
+
+
+def subscribe(last_id: Optional[int] = None) -> Subscriber:
+    """
+    Register a client. With last_id, events from last_id onward are replayed first.
+    The replay slice is copied under the lock and encoded/queued outside it, so a
+    long replay never holds up the pump or other subscribers.
+    """
+    global _sub_seq
+    _ensure_started()
+    replay: List[Dict[str, Any]] = []
+    cached: Dict[int, bytes] = {}
+    evicted = 0
+    with _lock:
+        _sub_seq += 1
+        end = _pos
+        replaying = last_id is not None and last_id < end
+        sub = Subscriber(_sub_seq, QUEUE_MAX, replaying=replaying)
+        if replaying:
+            replay, _, evicted = bus.read_since(last_id, max_batch=max(1, end - last_id))
+            cached = {eid: _encoded[eid] for eid in range(max(last_id, end - REPLAY_CACHE), end) if eid in _encoded}
+        _subs[sub.id] = sub
+    if replaying:
+        chunks = []
+        if evicted:
+            chunks.append(encode({"type": "evicted", "ts": time.time(), "requested_id": last_id,
+                                  "resume_id": last_id + evicted, "dropped": evicted}))
+        for ev in replay:
+            eid = int(ev.get("id", -1))
+            if eid >= end:
+                break
+            chunks.append(cached.get(eid) or encode(ev))
+        sub.replay(chunks)
+    return sub
+
+
+def unsubscribe(sub: Subscriber) -> None:
+    sub.close()
+    with _lock:
+        if _subs.pop(sub.id, None) is not None:
+            _stats["collapsed"] += sub.collapsed
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        subs = list(_subs.values())
+        out: Dict[str, Any] = dict(_stats)
+        out["position"] = _pos
+    lags = [s.lag() for s in subs]
+    out["subscribers"] = len(subs)
+    out["bus_lag"] = max(0, bus.head_id() - out["position"])
+    out["max_subscriber_lag"] = max(lags) if lags else 0
+    out["total_queued"] = sum(lags)
+    out["collapsed_events"] = out.pop("collapsed") + sum(s.collapsed for s in subs)
+    out["policy"] = SLOW_POLICY
+    return out
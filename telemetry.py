@@ -0,0 +1,208 @@
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Minimal in-process metrics registry with OpenMetrics text exposition (/metrics).
+# Hot-path cost is one dict lookup and one small lock per update.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_LOCK = threading.Lock()
+_metrics: Dict[str, "_Metric"] = {}
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "unknown"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def expose(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}_total{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._values: Dict[LabelKey, List[float]] = {}  # [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels: str) -> None:
+        k = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(k)
+            if row is None:
+                row = [0.0] * (len(self.buckets) + 2)
+                self._values[k] = row
+            row[i] += 1
+            row[-1] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        out: List[str] = []
+        for k, row in items:
+            cum = 0.0
+            for b, c in zip(self.buckets, row):
+                cum += c
+                out.append(f"{self.name}_bucket{_fmt_labels(k, ('le', repr(b)))} {_fmt_value(cum)}")
+            cum += row[len(self.buckets)]
+            out.append(f"{self.name}_bucket{_fmt_labels(k, ('le', '+Inf'))} {_fmt_value(cum)}")
+            out.append(f"{self.name}_count{_fmt_labels(k)} {_fmt_value(cum)}")
+            out.append(f"{self.name}_sum{_fmt_labels(k)} {_fmt_value(row[-1])}")
+        return out
+
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: Dict[str, str]):
+        self.hist = hist
+        self.labels = labels
+        self.t0 = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.hist.observe(time.perf_counter() - self.t0, **self.labels)
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _LOCK:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str = "") -> Counter:
+    return _register(Counter(name, help_text))  # type: ignore[return-value]
+
+
+def gauge(name: str, help_text: str = "") -> Gauge:
+    return _register(Gauge(name, help_text))  # type: ignore[return-value]
+
+
+def histogram(name: str, help_text: str = "", buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, buckets))  # type: ignore[return-value]
+
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+    """
+    Add a scrape-time callback yielding (name, kind, help, labels, value) for
+    gauges/counters read from other modules' state.
+    """
+    with _LOCK:
+        _collectors.append(fn)
+
+
+def expose() -> str:
+    """
+    Render every metric in OpenMetrics text format.
+    """
+    with _LOCK:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+        collectors = list(_collectors)
+    lines: List[str] = []
+    for m in metrics:
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        if m.help:
+            lines.append(f"# HELP {m.name} {m.help}")
+        lines.extend(m.expose())
+    families: Dict[str, Tuple[str, str, List[str]]] = {}
+    for fn in collectors:
+        try:
+            for name, kind, help_text, labels, value in fn():
+                fam = families.setdefault(name, (kind, help_text, []))
+                suffix = "_total" if kind == "counter" else ""
+                fam[2].append(f"{name}{suffix}{_fmt_labels(_key(labels))} {_fmt_value(value)}")
+        except Exception:
+            continue
+    for name in sorted(families):
+        kind, help_text, samples = families[name]
+        lines.append(f"# TYPE {name} {kind}")
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.extend(samples)
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,122 @@
+"""
+Local stand-in for the Ads API stats endpoints used by ads_analytics:
+
+    GET  /11/stats/accounts/<acct>           synchronous stats
+    POST /11/stats/jobs/accounts/<acct>      create an async job
+    GET  /11/stats/jobs/accounts/<acct>      poll jobs (job_ids=...)
+    GET  /download/<job_id>.json.gz          gzipped job output
+
+Every metric value is 1 per bucket. Job outcomes are scripted per job via
+`stub.script`: a list of statuses returned on successive polls (the last one
+repeats), e.g. ["PROCESSING", "SUCCESS"] or ["FAILED"]; "MISSING" leaves the
+job out of poll responses. `stub.page_size` splits poll responses into pages
+linked by next_cursor.
+"""
+import gzip
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+
+def _buckets(params: Dict[str, str]) -> int:
+    step = 3600 if params.get("granularity", "HOUR") == "HOUR" else 86400
+    s = datetime.fromisoformat(params["start_time"].replace("Z", "+00:00")).timestamp()
+    e = datetime.fromisoformat(params["end_time"].replace("Z", "+00:00")).timestamp()
+    return max(0, int((e - s) // step))
+
+
+def _data(params: Dict[str, str]) -> List[dict]:
+    n = _buckets(params)
+    return [{"id": eid, "id_data": [{"segment": None, "metrics": {"impressions": [1] * n, "engagements": [1] * n}}]}
+            for eid in params["entity_ids"].split(",")]
+
+
+class AdsApiStub:
+    def __init__(self):
+        self.requests: List[tuple] = []
+        self.jobs: Dict[str, dict] = {}
+        self.script: List[List[str]] = []  # consumed in job creation order
+        self.page_size = 0                  # jobs per poll page (0: all in one page)
+        self._seq = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: bytes, ctype: str = "application/json"):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, obj, code: int = 200):
+                self._send(code, json.dumps(obj).encode())
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                stub.requests.append(("GET", parts.path, params))
+                if parts.path.startswith("/download/"):
+                    job = stub.jobs.get(parts.path.rsplit("/", 1)[-1].split(".")[0])
+                    if not job:
+                        return self._send(404, b"")
+                    return self._send(200, gzip.compress(json.dumps({"data": _data(job["params"])}).encode()),
+                                      "application/gzip")
+                if "/stats/jobs/accounts/" in parts.path:
+                    jids = params.get("job_ids", "").split(",")
+                    first = int(params.get("cursor", "0"))
+                    last = first + stub.page_size if stub.page_size else len(jids)
+                    out = []
+                    for jid in jids[first:last]:
+                        status = stub._advance(jid)
+                        if status in (None, "MISSING"):
+                            continue
+                        job = {"id_str": jid, "status": status}
+                        if status == "SUCCESS":
+                            job["url"] = f"http://{self.headers['Host']}/download/{jid}.json.gz"
+                        out.append(job)
+                    return self._json({"data": out, "next_cursor": str(last) if last < len(jids) else None})
+                if "/stats/accounts/" in parts.path:
+                    return self._json({"data": _data(params)})
+                self._send(404, b"")
+
+            def do_POST(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                stub.requests.append(("POST", parts.path, params))
+                if "/stats/jobs/accounts/" not in parts.path:
+                    return self._send(404, b"")
+                with stub._lock:
+                    stub._seq += 1
+                    jid = f"job{stub._seq}"
+                    script = stub.script.pop(0) if stub.script else ["SUCCESS"]
+                    stub.jobs[jid] = {"params": params, "script": list(script)}
+                self._json({"data": {"id_str": jid, "status": "PROCESSING"}})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}/11"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _advance(self, jid: str):
+        with self._lock:
+            job = self.jobs.get(jid)
+            if not job:
+                return None
+            return job["script"].pop(0) if len(job["script"]) > 1 else job["script"][0]
+
+    def start(self) -> "AdsApiStub":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def calls(self, method: str, fragment: str) -> List[dict]:
+        return [p for m, path, p in self.requests if m == method and fragment in path]
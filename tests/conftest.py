@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the top-level modules and the local API stubs directly
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
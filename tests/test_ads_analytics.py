@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+import ads_analytics  # noqa: E402
+from ads_api_stub import AdsApiStub  # noqa: E402
+
+START = "2025-10-01T00:00:00Z"
+END = "2025-10-01T06:00:00Z"   # 6 hourly buckets
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(ads_analytics, "_DB_PATH", str(tmp_path / "ads_stats.db"))
+    monkeypatch.setattr(ads_analytics, "_conn", None)
+    s = AdsApiStub().start()
+    yield s
+    s.stop()
+    if ads_analytics._conn is not None:
+        ads_analytics._conn.close()
+    ads_analytics._conn = None
+
+
+def _run(stub, ids, **kw):
+    return ads_analytics.collect(stub.base, "acct", None, "LINE_ITEM", ids, start_time=START, end_time=END,
+                                 mode="async", **kw)
+
+
+def _stored(eid):
+    return ads_analytics.query(entity="LINE_ITEM", entity_id=eid)
+
+
+def test_async_job_create_poll_download_store(stub):
+    stub.script = [["PROCESSING", "SUCCESS"]]
+    out = _run(stub, ["li1", "li2"], placement="PUBLISHER_NETWORK")
+    assert out["jobs_submitted"] == 1
+    created = stub.calls("POST", "/stats/jobs/")
+    assert created[0]["entity_ids"] == "li1,li2" and created[0]["placement"] == "PUBLISHER_NETWORK"
+
+    out = _run(stub, ["li1", "li2"])           # job still processing: nothing new submitted
+    assert out["waiting"] == 1 and out["jobs_submitted"] == 0
+
+    out = _run(stub, ["li1", "li2"])           # SUCCESS: output downloaded and merged
+    assert out["ingested"] == 1 and out["buckets_merged"] == 12
+    rows = _stored("li1")
+    assert len(rows) == 6 and rows[0]["metrics"] == {"impressions": 1, "engagements": 1}
+    assert len(stub.calls("GET", "/download/")) == 1
+
+
+def test_failed_job_releases_entities(stub):
+    stub.script = [["FAILED"], ["SUCCESS"]]
+    _run(stub, ["li1"])
+    out = _run(stub, ["li1"])                  # FAILED job frees li1, which is requested again at once
+    assert out["failed"] == 1 and out["jobs_submitted"] == 1
+    out = _run(stub, ["li1"])
+    assert out["ingested"] == 1 and len(_stored("li1")) == 6
+
+
+def test_missing_and_stale_jobs_expire(stub, monkeypatch):
+    stub.script = [["MISSING"], ["PROCESSING"]]
+    _run(stub, ["gone"])
+    out = _run(stub, ["slow"])                 # "gone" is not reported but still young: kept
+    assert out["waiting"] == 1 and out["expired"] == 0
+    with ads_analytics._LOCK:
+        statuses = dict(ads_analytics._db().execute("SELECT job_id, status FROM jobs").fetchall())
+    assert statuses == {"job1": "PROCESSING", "job2": "PROCESSING"}
+
+    monkeypatch.setattr(ads_analytics, "JOB_MAX_AGE_SEC", 0.0)
+    time.sleep(0.01)
+    out = _run(stub, ["slow"])                 # both too old: released and "slow" re-requested
+    assert out["expired"] == 2 and out["jobs_submitted"] == 1
+    with ads_analytics._LOCK:
+        statuses = dict(ads_analytics._db().execute("SELECT job_id, status FROM jobs").fetchall())
+    assert statuses == {"job1": "MISSING", "job2": "EXPIRED", "job3": "PROCESSING"}
+
+
+def test_job_polling_follows_next_cursor(stub):
+    stub.script = [["PROCESSING", "SUCCESS"], ["SUCCESS"]]
+    _run(stub, ["li1"])
+    _run(stub, ["li2"])
+    stub.page_size = 1
+    out = _run(stub, ["li1", "li2"])
+    assert out["ingested"] == 2 and out["expired"] == 0
+    assert [p.get("cursor") for p in stub.calls("GET", "/stats/jobs/")[-2:]] == [None, "1"]
+    assert len(_stored("li1")) == len(_stored("li2")) == 6
+
+
+def _sync(stub, ids, **kw):
+    return ads_analytics.collect(stub.base, "acct", None, "LINE_ITEM", ids, mode="sync", **kw)
+
+
+def test_sync_mode_uses_placement_and_is_incremental(stub):
+    out = _sync(stub, ["li1"], start_time=START, end_time=END, placement="ALL_ON_TWITTER")
+    assert out["requests"] == 1 and out["buckets_merged"] == 6 and len(_stored("li1")) == 6
+    assert stub.calls("GET", "/stats/accounts/")[0]["placement"] == "ALL_ON_TWITTER"
+
+    out = _sync(stub, ["li1"], start_time=START, end_time=END)   # closed window, already fetched
+    assert out["requests"] == 0 and out["buckets_merged"] == 0
+    assert len(stub.calls("GET", "/stats/accounts/")) == 1 and len(_stored("li1")) == 6
+
+
+def test_sync_open_window_refetches_only_trailing_buckets(stub):
+    start = ads_analytics._iso(int(time.time()) // 3600 * 3600 - 5 * 3600)
+    out = _sync(stub, ["li1"], start_time=start)
+    assert out["requests"] == 1 and out["buckets_merged"] == 6   # 5 closed hours + the current one
+
+    out = _sync(stub, ["li1"], start_time=start)
+    assert out["requests"] == 1 and out["buckets_merged"] == ads_analytics.REFETCH_BUCKETS
+    last = stub.calls("GET", "/stats/accounts/")[-1]
+    assert last["start_time"] > start
+    assert len(_stored("li1")) == 6
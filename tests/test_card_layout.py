@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+import card_layout  # noqa: E402
+
+TEXTS = [
+    "สวัสดีครับ",
+    "วันนี้อากาศดีมาก",
+    "เที่ยวอยุธยาเมืองมรดกโลก ชมวัดไชยวัฒนาราม ยามเย็นสวยงามที่สุด แวะกินกุ้งแม่น้ำเผาริมน้ำเจ้าพระยา",
+    "ตลาดน้ำอโยธยา เปิดทุกวัน 9 โมงถึง 6 โมงเย็น #Ayutthaya #เที่ยวไทย ไปกันนะคะ",
+]
+DEPENDENT = card_layout._THAI_MARKS | card_layout._NO_BREAK_BEFORE
+
+
+@pytest.fixture(params=["default", "rules"])
+def breaker(request, monkeypatch):
+    if request.param == "rules":
+        monkeypatch.setattr(card_layout, "_ICU", False)
+        monkeypatch.setattr(card_layout, "_THAINLP", False)
+    card_layout.segments.cache_clear()
+    yield request.param
+    card_layout.segments.cache_clear()
+
+
+@pytest.mark.parametrize("max_width", [120, 200, 300, 500, 940])
+def test_thai_lines_never_split_a_cluster(breaker, max_width):
+    for text in TEXTS:
+        lines = card_layout.wrap(text, 54, max_width)
+        assert "".join(lines).replace(" ", "") == text.replace(" ", "")
+        for line in lines:
+            assert line[0] not in DEPENDENT, (breaker, max_width, lines)
+            assert line[-1] not in card_layout._LEADING, (breaker, max_width, lines)
+
+
+def test_dictionary_breaks_between_words():
+    if not (card_layout._ICU or card_layout._THAINLP):
+        pytest.skip("no Thai dictionary breaker installed")
+    card_layout.segments.cache_clear()
+    for text, words in (("สวัสดีครับ", ["สวัสดี", "ครับ"]), ("วันนี้อากาศดีมาก", ["วันนี้", "อากาศ", "ดีมาก"])):
+        bounds = {sum(len(w) for w in words[:i]) for i in range(len(words) + 1)}
+        for max_width in (200, 300):
+            lines = card_layout.wrap(text, 54, max_width)
+            ends = {sum(len(ln) for ln in lines[:i]) for i in range(len(lines) + 1)}
+            assert ends <= bounds, lines
+
+
+def test_clusters_keep_following_vowels():
+    assert card_layout.clusters("ครับ") == ["ค", "รั", "บ"]
+    assert card_layout.clusters("อากาศ") == ["อา", "กา", "ศ"]
+    assert card_layout.clusters("เที่ยว") == ["เที่", "ย", "ว"]
@@ -0,0 +1,65 @@
+import json
+import time
+
+import pytest
+
+import circuit_breaker as cb
+
+
+def _fail():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(cb, "_STATE_PATH", str(tmp_path / "cb_state.json"))
+    monkeypatch.setattr(cb, "_states", {})
+    monkeypatch.setattr(cb, "_loaded", False)
+    monkeypatch.setattr(cb, "_dirty", False)
+    yield tmp_path / "cb_state.json"
+    with cb._retry_cv:
+        cb._retry_heap.clear()
+    cb.flush()  # before the path is restored, so nothing lands in the working tree
+
+
+def _wait_for_retry(timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        with cb._retry_cv:
+            if cb._retry_heap:
+                return
+        time.sleep(0.01)
+    raise AssertionError("no retry was scheduled")
+
+
+def test_flush_persists_breaker_state_across_restart(fresh_state, monkeypatch):
+    ret = cb.call_with_circuit("line", _fail, max_retries=1, failure_threshold=1)
+    assert ret["status"] == "error" and ret["detail"]["circuit_state"] == "open"
+    cb.flush()
+    assert json.loads(fresh_state.read_text())["line"]["state"] == "open"
+
+    # A restarted process reads the flushed state and keeps the circuit open
+    monkeypatch.setattr(cb, "_states", {})
+    monkeypatch.setattr(cb, "_loaded", False)
+    assert cb.states()["line"]["state"] == "open"
+    skipped = cb.call_with_circuit("line", lambda: "ok", failure_threshold=1)
+    assert skipped["status"] == "skipped"
+
+
+def test_shutdown_records_failures_of_pending_retries(fresh_state):
+    fut = cb.call_with_circuit_async("discord", _fail, max_retries=3, failure_threshold=1, backoff_base=60)
+    _wait_for_retry()
+    assert not fut.done()
+
+    cb.shutdown()
+    assert fut.result(timeout=1)["status"] == "error"
+    saved = json.loads(fresh_state.read_text())["discord"]
+    assert saved["state"] == "open" and saved["fail_count"] == 1 and saved["last_error"] == "boom"
+
+
+def test_cancelled_call_still_records_its_failed_attempt(fresh_state):
+    fut = cb.call_with_circuit_async("telegram", _fail, max_retries=3, failure_threshold=5, backoff_base=0.05)
+    _wait_for_retry()
+    fut.cancel()
+    time.sleep(0.3)
+    assert cb.states()["telegram"]["fail_count"] == 1
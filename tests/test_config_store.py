@@ -0,0 +1,29 @@
+import json
+
+import config_store
+
+
+def test_nested_values_are_not_shared_with_the_cache(tmp_path, monkeypatch):
+    path = tmp_path / "runtime_config.json"
+    path.write_text(json.dumps({"providers": ["twitter", "line"], "openers": {"th": ["สวัสดี"]}}), encoding="utf-8")
+    monkeypatch.setattr(config_store, "_PATH", str(path))
+    monkeypatch.setattr(config_store, "_CACHE", {"sig": None, "data": {}})
+
+    first = config_store.get_config()
+    first["providers"].append("discord")
+    first["openers"]["th"].clear()
+    config_store.get("providers").append("reddit")
+
+    again = config_store.get_config()
+    assert again["providers"] == ["twitter", "line"]
+    assert again["openers"] == {"th": ["สวัสดี"]}
+
+
+def test_update_config_is_seen_by_next_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_store, "_PATH", str(tmp_path / "runtime_config.json"))
+    monkeypatch.setattr(config_store, "_CACHE", {"sig": None, "data": {}})
+    before = config_store.version()
+    config_store.update_config({"providers": ["line"], "unknown_key": 1})
+    assert config_store.get("providers") == ["line"]
+    assert "unknown_key" not in config_store.get_config()
+    assert config_store.version() != before
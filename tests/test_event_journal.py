@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+import event_journal as ej
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # A private writer on a temp path; the process-wide one keeps its own queue
+    monkeypatch.setattr(ej, "_queue", queue.Queue())
+    monkeypatch.setattr(ej, "_flushed", threading.Event())
+    monkeypatch.setattr(ej, "_closing", threading.Event())
+    monkeypatch.setattr(ej, "_stats", {"written": 0, "dropped": 0, "flushes": 0, "rotations": 0})
+    monkeypatch.setattr(ej, "_writer", None)
+    monkeypatch.setattr(ej, "FLUSH_SEC", 60.0)
+    monkeypatch.setattr(ej, "COMPRESS", False)
+    path = tmp_path / "events.jsonl"
+    yield path
+    ej.close()
+
+
+def _lines(path):
+    return [json.loads(ln) for ln in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_events_are_batched_until_flush(journal):
+    ej.start(str(journal))
+    for i in range(3):
+        ej.append({"id": i, "text": "สวัสดี"})
+    ej.flush()
+    assert [e["id"] for e in _lines(journal)] == [0, 1, 2]
+    st = ej.stats()
+    assert st["written"] == 3 and st["flushes"] == 1 and st["path"] == str(journal)
+
+
+def test_size_rotation_moves_full_segment_aside(journal, monkeypatch):
+    monkeypatch.setattr(ej, "ROTATE_BYTES", 200)
+    ej.start(str(journal))
+    for i in range(2):
+        ej.append({"id": i, "pad": "x" * 120})
+        ej.flush()
+    segments = sorted(p for p in os.listdir(journal.parent) if p != "events.jsonl")
+    assert len(segments) == 1 and segments[0].startswith("events-") and segments[0].endswith(".jsonl")
+    assert [e["id"] for e in _lines(journal.parent / segments[0])] == [0]
+    assert [e["id"] for e in _lines(journal)] == [1]
+    assert ej.stats()["rotations"] == 1
+
+
+def test_daily_rotation_names_segment_after_its_day_and_compresses(journal, monkeypatch):
+    day = {"v": "20261017"}
+    monkeypatch.setattr(ej, "_day", lambda ts: day["v"])
+    monkeypatch.setattr(ej, "COMPRESS", True)
+    ej.start(str(journal))
+    ej.append({"id": 0})
+    ej.flush()
+    day["v"] = "20261018"
+    ej.append({"id": 1})
+    ej.flush()
+    ej.close()
+    done = []
+    for _ in range(100):  # compression runs on its own thread
+        done = [p for p in os.listdir(journal.parent) if p.endswith(".gz")]
+        if done:
+            break
+        time.sleep(0.02)
+    assert len(done) == 1 and done[0].startswith("events-20261017-")
+    with gzip.open(journal.parent / done[0], "rt", encoding="utf-8") as f:
+        assert json.loads(f.read())["id"] == 0
+    assert [e["id"] for e in _lines(journal)] == [1]
+
+
+@pytest.mark.parametrize("policy,interval,expected", [
+    ("always", 10.0, 3),    # every flush, plus close
+    ("interval", 3600.0, 1),  # interval not reached: only close
+    ("never", 10.0, 0),
+])
+def test_fsync_policy(journal, monkeypatch, policy, interval, expected):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(ej.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    monkeypatch.setattr(ej, "FSYNC", policy)
+    monkeypatch.setattr(ej, "FSYNC_INTERVAL_SEC", interval)
+    ej.start(str(journal))
+    for i in range(2):
+        ej.append({"id": i})
+        ej.flush()
+    ej.close()
+    assert len(synced) == expected
+    assert [e["id"] for e in _lines(journal)] == [0, 1]
+
+
+def test_close_writes_queued_events_and_stops_writer(journal):
+    ej.start(str(journal))
+    writer = ej._writer
+    ej.append({"id": 7})
+    ej.close()
+    assert not writer.is_alive() and ej._writer is None
+    assert [e["id"] for e in _lines(journal)] == [7]
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("requests")
+
+import geo_targeting  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"data": self._data}
+
+
+@pytest.fixture
+def geo(tmp_path, monkeypatch):
+    monkeypatch.setattr(geo_targeting, "_PATH", str(tmp_path / "geo_cache.json"))
+    monkeypatch.setattr(geo_targeting, "_cache", None)
+    monkeypatch.setattr(geo_targeting, "BATCH_SIZE", 2)
+    monkeypatch.setattr(geo_targeting, "USE_BATCH", True)
+    return geo_targeting
+
+
+def test_failed_batch_chunk_only_retries_its_own_values(geo, monkeypatch):
+    batches, singles = [], []
+
+    def post(url, auth=None, json=None):
+        if "/batch/" in url:
+            batches.append([op["params"]["targeting_value"] for op in json])
+            if len(batches) == 2:
+                raise RuntimeError("chunk 2 failed")
+            return _Resp([{"id": f"c-{op['params']['targeting_value']}"} for op in json])
+        singles.append(json["targeting_value"])
+        return _Resp({"id": f"c-{json['targeting_value']}"})
+
+    monkeypatch.setattr(geo.http_pool, "post", post)
+    out = geo.apply("http://ads", "acct", None, "li1", ["a", "b", "c", "d", "e"], lambda: [])
+    assert batches == [["a", "b"], ["c", "d"]]
+    assert sorted(singles) == ["c", "d", "e"]      # chunk 1 (a, b) is not created again
+    assert sorted(out["created"]) == ["c-a", "c-b", "c-c", "c-d", "c-e"]
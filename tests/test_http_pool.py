@@ -0,0 +1,50 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+import http_pool  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_POST(self):
+        type(self).hits += 1
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(503)
+        self.send_header("Set-Cookie", f"sid={self.headers.get('X-Provider')}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.hits = 0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    http_pool.close_all()
+
+
+def test_providers_on_one_host_get_separate_sessions(server):
+    http_pool.post(server + "/feed", provider="facebook", headers={"X-Provider": "facebook"})
+    http_pool.post(server + "/media", provider="instagram", headers={"X-Provider": "instagram"})
+    fb = http_pool.session_for(server, "facebook")
+    ig = http_pool.session_for(server, "instagram")
+    assert fb is not ig
+    assert fb.cookies.get("sid") == "facebook" and ig.cookies.get("sid") == "instagram"
+    hosts = http_pool.stats()["hosts"]
+    assert {c["provider"] for c in hosts.values() if c["host"] == server} == {"facebook", "instagram"}
+
+
+def test_status_codes_are_not_retried_by_the_adapter(server):
+    resp = http_pool.post(server + "/feed", provider="facebook")
+    assert resp.status_code == 503
+    assert _Handler.hits == 1
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+import importer  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, chunks, headers=None):
+        self._chunks = chunks
+        self.headers = headers or {}
+        self.read = 0
+
+    def iter_content(self, chunk_size=None):
+        for c in self._chunks:
+            self.read += len(c)
+            yield c
+
+
+def test_byte_limit_counts_streamed_bytes(monkeypatch):
+    monkeypatch.setattr(importer, "MAX_BYTES", 1000)
+    # Mostly blank lines: almost no text, but far more bytes than allowed
+    resp = _Resp([b"a\n" + b"\n" * 600, b"\n" * 600, b"b\n" * 1000])
+    with pytest.raises(ValueError):
+        list(importer._iter_texts(resp, "lines"))
+    assert resp.read < 2000          # aborted without reading the rest of the body
+
+
+def test_declared_length_over_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(importer, "MAX_BYTES", 10)
+    with pytest.raises(ValueError):
+        list(importer._iter_texts(_Resp([b"x\n"], {"Content-Length": "5000"}), "json"))
+
+
+def test_lines_and_json_split_across_chunks(monkeypatch):
+    monkeypatch.setattr(importer, "MAX_BYTES", 0)
+    thai = "สวัสดี\n".encode("utf-8")
+    assert list(importer._iter_texts(_Resp([b"one\r\ntw", b"o\n\n", thai[:4], thai[4:]]), "lines")) == \
+        ["one", "two", "สวัสดี"]
+    assert list(importer._iter_texts(_Resp([b'["a", "b', b'", 3]']), "json")) == ["a", "b", "3"]
+
+
+def test_refresher_is_replaced_when_source_changes(monkeypatch):
+    polled = []
+    monkeypatch.setattr(importer, "refresh", lambda url, fmt: polled.append(url))
+    monkeypatch.setattr(importer, "REFRESH_SEC", 0.01)
+    try:
+        importer.ensure_refresher("http://old", "lines")
+        first = importer._refreshers["import_source_url"][1]
+        importer.ensure_refresher("http://old", "lines")
+        assert importer._refreshers["import_source_url"][1] is first
+        importer.ensure_refresher("http://new", "json")
+        first.join(timeout=2)
+        assert not first.is_alive()
+        assert importer.status()["refreshers"] == {"import_source_url": "json:http://new"}
+        polled.clear()
+        time.sleep(1.1)
+        assert polled and set(polled) == {"http://new"}
+    finally:
+        importer.stop_refresher()
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+import latency_stats as ls
+
+
+@pytest.fixture(autouse=True)
+def series(monkeypatch):
+    monkeypatch.setattr(ls, "_series", {})
+
+
+def test_percentiles_are_within_bucket_error():
+    for ms in range(1, 1001):
+        ls.record("workflow", "post", ms / 1000.0)
+    w = ls.snapshot("workflow", "post")["workflow:post"]["60s"]
+    assert w["count"] == 1000
+    assert w["mean"] == pytest.approx(0.5005)
+    assert w["max"] == 1.0
+    tol = ls.GROWTH - 1.0
+    assert w["p50"] == pytest.approx(0.5, rel=tol)
+    assert w["p90"] == pytest.approx(0.9, rel=tol)
+    assert w["p99"] == pytest.approx(0.99, rel=tol)
+
+
+def test_percentile_never_exceeds_the_observed_max():
+    ls.record("provider", "line", 0.25)
+    w = ls.snapshot()["provider:line"]["60s"]
+    assert w["p50"] == w["p99"] == w["max"] == 0.25
+
+
+def test_windows_only_include_recent_slices():
+    now = time.time()
+    ls.record("provider", "discord", 2.0, now=now - 10 * 60)
+    ls.record("provider", "discord", 0.1, now=now)
+    windows = ls.snapshot("provider")["provider:discord"]
+    assert windows["60s"]["count"] == 1
+    assert windows["60s"]["max"] == 0.1
+    assert windows["300s"]["count"] == 1
+    assert windows["3600s"]["count"] == 2
+    assert windows["3600s"]["max"] == 2.0
+
+
+def test_reset_by_kind():
+    ls.record("workflow", "post", 1.0)
+    ls.record("provider", "line", 1.0)
+    ls.reset("provider")
+    assert list(ls.snapshot()) == ["workflow:post"]
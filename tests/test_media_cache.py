@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import media_cache as mc
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    dirs = {kind: str(tmp_path / kind) for kind in ("audio", "image", "video")}
+    monkeypatch.setattr(mc, "DIRS", dirs)
+    monkeypatch.setattr(mc, "ENABLED", True)
+    monkeypatch.setattr(mc, "MAX_BYTES", 0)
+    monkeypatch.setattr(mc, "MAX_FILES", 0)
+    monkeypatch.setattr(mc, "_index", None)
+    monkeypatch.setattr(mc, "_bytes", 0)
+    monkeypatch.setattr(mc, "_stats", {})
+    return dirs
+
+
+def _render(size=100):
+    calls = []
+
+    def render(path):
+        calls.append(path)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+    return render, calls
+
+
+def _make(name, size=100):
+    render, _ = _render(size)
+    return mc.get_or_create("audio", mc.key("audio", {"text": name}), ".mp3", render)
+
+
+def test_repeated_render_is_a_cache_hit():
+    render, calls = _render()
+    k = mc.key("image", {"v": 1, "text": "hello"})
+    first = mc.get_or_create("image", k, ".png", render)
+    second = mc.get_or_create("image", k, ".png", render)
+    assert first == second == mc.path_for("image", k, ".png")
+    assert len(calls) == 1
+    assert mc.stats()["kinds"]["image"] == {"files": 1, "bytes": 100, "hits": 1, "misses": 1}
+    assert not [n for n in os.listdir(mc.DIRS["image"]) if n.startswith(".")]  # temp file moved into place
+
+
+def test_keys_cover_parameters_and_input_bytes(tmp_path):
+    src = tmp_path / "card.png"
+    src.write_bytes(b"a")
+    k1 = mc.key("video", {"v": 1}, files=[str(src), None])
+    assert mc.key("video", {"v": 2}, files=[str(src), None]) != k1
+    src.write_bytes(b"b")
+    assert mc.key("video", {"v": 1}, files=[str(src), None]) != k1
+
+
+def test_failed_render_is_not_cached():
+    def render(path):
+        raise RuntimeError("tts down")
+    assert mc.get_or_create("audio", "k", ".mp3", render) is None
+    assert mc.stats()["files"] == 0
+
+
+def test_evicts_least_recently_used_down_to_max_files(monkeypatch):
+    monkeypatch.setattr(mc, "MAX_FILES", 3)
+    paths = [_make(n) for n in ("a", "b", "c")]
+    assert mc.lookup("audio", os.path.basename(paths[0])[:-4], ".mp3") == paths[0]  # "a" is now most recent
+    paths += [_make("d"), _make("e")]
+    kept = sorted(os.listdir(mc.DIRS["audio"]))
+    assert kept == sorted(os.path.basename(p) for p in (paths[0], paths[3], paths[4]))
+    assert mc.stats()["files"] == 3
+
+
+def test_evicts_down_to_max_bytes(monkeypatch):
+    monkeypatch.setattr(mc, "MAX_BYTES", 250)
+    paths = [_make(n) for n in ("a", "b", "c", "d")]
+    st = mc.stats()
+    assert (st["files"], st["bytes"]) == (2, 200)
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+
+
+def test_store_accounts_for_files_written_by_another_process(monkeypatch):
+    monkeypatch.setattr(mc, "MAX_FILES", 1)
+    old = _make("a")
+    os.makedirs(mc.DIRS["video"])
+    video = mc.path_for("video", "v", ".mp4")
+    with open(video, "wb") as f:
+        f.write(b"v" * 10)
+    mc.store("video", video)
+    assert not os.path.exists(old) and os.path.exists(video)
+    assert mc.stats()["kinds"]["video"]["files"] == 1
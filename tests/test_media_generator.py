@@ -0,0 +1,198 @@
+import subprocess
+import time
+
+import pytest
+
+pytest.importorskip("gtts")
+pytest.importorskip("moviepy.editor")
+
+import config_store  # noqa: E402
+import media_cache  # noqa: E402
+import media_generator as mg  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+@pytest.fixture
+def ffmpeg_calls(monkeypatch):
+    calls = []
+
+    def run(cmd, **kw):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+    monkeypatch.setattr(mg.subprocess, "run", run)
+    monkeypatch.setattr(mg, "ffmpeg_exe", lambda: "ffmpeg")
+    monkeypatch.setattr(mg, "_audio_duration", lambda path: 7.25)
+    monkeypatch.setattr(mg, "VIDEO_STILL_FPS", 1.0)
+    monkeypatch.setattr(mg, "VIDEO_PRESET", "veryfast")
+    monkeypatch.setattr(mg, "VIDEO_CRF", 23)
+    return calls
+
+
+def _opt(cmd, flag):
+    return cmd[cmd.index(flag) + 1]
+
+
+def test_still_without_audio_loops_the_card_for_ten_seconds(ffmpeg_calls):
+    mg._encode_still("out.mp4", "card.png", None)
+    (cmd,) = ffmpeg_calls
+    assert cmd[:9] == ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-loop", "1", "-framerate", "1.0"]
+    assert cmd.count("-i") == 1 and _opt(cmd, "-i") == "card.png"
+    assert _opt(cmd, "-t") == "10.000"
+    assert (_opt(cmd, "-c:v"), _opt(cmd, "-preset"), _opt(cmd, "-tune"), _opt(cmd, "-crf")) == \
+        ("libx264", "veryfast", "stillimage", "23")
+    assert _opt(cmd, "-r") == "1.0" and _opt(cmd, "-vf") == "scale=-2:1080,format=yuv420p"
+    assert "1:a:0" not in cmd and "-c:a" not in cmd
+    assert cmd[-3:] == ["-movflags", "+faststart", "out.mp4"]
+
+
+def test_mp3_audio_is_stream_copied_for_its_duration(ffmpeg_calls):
+    mg._encode_still("out.mp4", "card.png", "caption.mp3")
+    (cmd,) = ffmpeg_calls
+    assert [cmd[i + 1] for i, a in enumerate(cmd) if a == "-i"] == ["card.png", "caption.mp3"]
+    assert _opt(cmd, "-t") == "7.250"
+    assert [cmd[i + 1] for i, a in enumerate(cmd) if a == "-map"] == ["0:v:0", "1:a:0"]
+    assert _opt(cmd, "-c:a") == "copy"
+
+
+def test_short_audio_still_gets_five_seconds(ffmpeg_calls, monkeypatch):
+    monkeypatch.setattr(mg, "_audio_duration", lambda path: 1.5)
+    mg._encode_still("out.mp4", "card.png", "caption.mp3")
+    assert _opt(ffmpeg_calls[0], "-t") == "5.000"
+
+
+def test_wav_audio_is_encoded_to_aac(ffmpeg_calls):
+    mg._encode_still("out.mp4", "card.png", "caption.wav")
+    (cmd,) = ffmpeg_calls
+    assert (_opt(cmd, "-c:a"), _opt(cmd, "-b:a")) == ("aac", "128k")
+
+
+def test_rejected_stream_copy_falls_back_to_aac(ffmpeg_calls, monkeypatch):
+    def run(cmd, **kw):
+        ffmpeg_calls.append(cmd)
+        if _opt(cmd, "-c:a") == "copy":
+            raise subprocess.CalledProcessError(1, cmd)
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+    monkeypatch.setattr(mg.subprocess, "run", run)
+    mg._encode_still("out.mp4", "card.png", "caption.m4a")
+    assert [_opt(c, "-c:a") for c in ffmpeg_calls] == ["copy", "aac"]
+
+
+def test_audio_duration_is_parsed_from_ffmpeg_stderr(monkeypatch):
+    stderr = "Input #0, mp3, from 'a.mp3':\n  Duration: 00:01:02.50, start: 0.025057, bitrate: 64 kb/s\n"
+    monkeypatch.setattr(mg.subprocess, "run", lambda cmd, **kw: subprocess.CompletedProcess(cmd, 1, "", stderr))
+    monkeypatch.setattr(mg, "ffmpeg_exe", lambda: "ffmpeg")
+    assert mg._audio_duration("a.mp3") == 62.5
+
+
+def test_still_encode_produces_a_video(tmp_path):
+    if not mg.ffmpeg_exe():
+        pytest.skip("no ffmpeg binary")
+    card = tmp_path / "card.png"
+    Image.new("RGB", (320, 320), (255, 245, 245)).save(card)
+    out = tmp_path / "out.mp4"
+    mg._encode_still(str(out), str(card), None)
+    assert out.stat().st_size > 0
+
+
+class _FakeTTS(mg.TTSBackend):
+    ext = ".wav"
+
+    def __init__(self, name, ok=True, batches=False, available=True):
+        self.name = name
+        self.ok = ok
+        self.batches = batches
+        self._available = available
+        self.calls = []
+
+    def available(self, lang):
+        return self._available
+
+    def synthesize(self, items):
+        self.calls.append([text for text, _, _, _ in items])
+        if self.ok:
+            for _, _, _, path in items:
+                with open(path, "wb") as f:
+                    f.write(b"RIFF")
+
+
+@pytest.fixture
+def tts(tmp_path, monkeypatch):
+    dirs = {kind: str(tmp_path / kind) for kind in ("audio", "image", "video")}
+    monkeypatch.setattr(media_cache, "DIRS", dirs)
+    monkeypatch.setattr(media_cache, "_index", None)
+    monkeypatch.setattr(media_cache, "_bytes", 0)
+    monkeypatch.setattr(mg, "AUDIO_DIR", dirs["audio"])
+    monkeypatch.setattr(mg, "IMG_DIR", dirs["image"])
+    monkeypatch.setattr(mg, "VID_DIR", dirs["video"])
+    monkeypatch.setattr(config_store, "_PATH", str(tmp_path / "runtime_config.json"))
+    monkeypatch.setattr(config_store, "_CACHE", {"sig": None, "data": {}})
+    monkeypatch.setattr(mg, "TTS_BACKEND", "gtts")
+    monkeypatch.setattr(mg, "TTS_FALLBACK", True)
+    monkeypatch.setattr(mg, "_TTS_BACKENDS", {})
+    backends = {"gtts": _FakeTTS("gtts"), "espeak": _FakeTTS("espeak"), "piper": _FakeTTS("piper", batches=True)}
+    for b in backends.values():
+        mg.register_tts_backend(b)
+
+    def use(name):
+        config_store.update_config({"tts_backend": name})
+    return backends, use
+
+
+def _used(backends):
+    return [name for name, b in backends.items() if b.calls]
+
+
+def test_config_selects_the_backend_and_results_are_cached(tts):
+    backends, use = tts
+    use("espeak")
+    path = mg.text_to_speech("สวัสดี")
+    assert path.endswith(".wav") and _used(backends) == ["espeak"]
+    assert mg.text_to_speech("สวัสดี") == path
+    assert backends["espeak"].calls == [["สวัสดี"]]
+
+    use("gtts")
+    other = mg.text_to_speech("สวัสดี")    # engine is part of the key
+    assert other != path and backends["gtts"].calls == [["สวัสดี"]]
+
+
+def test_auto_prefers_offline_backends(tts):
+    backends, use = tts
+    use("auto")
+    assert [b.name for b in mg._tts_chain("th")] == ["piper", "espeak", "gtts"]
+    backends["piper"]._available = False
+    mg.text_to_speech("hi")
+    assert _used(backends) == ["espeak"]
+
+
+def test_failed_backend_falls_back_in_order(tts, monkeypatch):
+    backends, use = tts
+    use("gtts")
+    backends["gtts"].ok = False
+    backends["piper"].ok = False
+    assert [b.name for b in mg._tts_chain("th")] == ["gtts", "piper", "espeak"]
+    assert mg.text_to_speech("hi").endswith(".wav")
+    assert [len(b.calls) for b in backends.values()] == [1, 1, 1]
+
+    monkeypatch.setattr(mg, "TTS_FALLBACK", False)
+    assert mg.text_to_speech("again") is None
+
+
+def test_lone_caption_does_not_wait_for_a_batch(tts, monkeypatch):
+    backends, use = tts
+    use("piper")
+    monkeypatch.setattr(mg, "TTS_BATCH_WAIT_SEC", 2.0)
+    t0 = time.perf_counter()
+    assert mg.text_to_speech("hi") is not None
+    assert time.perf_counter() - t0 < 1.0
+
+
+def test_batch_captions_share_backend_calls(tts, monkeypatch):
+    backends, use = tts
+    use("piper")
+    monkeypatch.setattr(mg, "TTS_BATCH_WAIT_SEC", 0.2)
+    texts = [f"caption {i}" for i in range(4)]
+    paths = mg.text_to_speech_batch(texts)
+    assert all(paths) and len(set(paths)) == 4
+    calls = backends["piper"].calls
+    assert sorted(t for call in calls for t in call) == texts
+    assert len(calls) < len(texts)
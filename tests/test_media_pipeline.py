@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("gtts")
+pytest.importorskip("moviepy.editor")
+
+import cli  # noqa: E402
+import media_cache  # noqa: E402
+import media_generator as mg  # noqa: E402
+import media_pipeline  # noqa: E402
+import realtime_bus as bus  # noqa: E402
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    events = []
+    monkeypatch.setattr(media_pipeline, "_threads", None)
+    monkeypatch.setattr(media_pipeline, "_procs", None)
+    monkeypatch.setattr(media_pipeline, "_pending", 0)
+    monkeypatch.setattr(media_pipeline, "VIDEO_PROCESSES", 0)
+    monkeypatch.setattr(media_pipeline, "enabled", lambda: True)
+    monkeypatch.setattr(bus, "publish", events.append)
+    monkeypatch.setattr(mg, "text_to_speech", lambda text, lang="th": "a.mp3")
+    monkeypatch.setattr(mg, "render_quote_card", lambda text, sender="": "c.png")
+    monkeypatch.setattr(mg, "cached_video", lambda image, audio: None)
+    yield events
+    media_pipeline.shutdown()
+
+
+def _video_samples():
+    return sum(c for k, c in mg._M_STAGES._values.items() if ("stage", "video") in k)
+
+
+def test_posting_never_waits_on_the_video_encode(pipeline, monkeypatch):
+    gate = threading.Event()
+
+    def slow_encode(image, audio):
+        gate.wait(5)
+        return "v.mp4"
+    monkeypatch.setattr(mg, "encode_video", slow_encode)
+
+    t0 = time.perf_counter()
+    fut = cli._start_media("hello", {"id": 7})
+    assert time.perf_counter() - t0 < 0.5
+    time.sleep(0.05)
+    assert not fut.done()
+
+    gate.set()
+    assert fut.result(timeout=5) == {"audio": "a.mp3", "image": "c.png", "video": "v.mp4"}
+    done = [e for e in pipeline if e["type"] == "post_media"]
+    assert len(done) == 1 and done[0]["ref_id"] == 7 and done[0]["media"]["video"] == "v.mp4"
+
+
+@pytest.mark.parametrize("cached", [None, "hit.mp4"])
+def test_video_stage_is_recorded_once_per_post(pipeline, monkeypatch, cached):
+    monkeypatch.setattr(mg, "cached_video", lambda image, audio: cached)
+    monkeypatch.setattr(mg, "encode_video", lambda image, audio: "v.mp4")
+    before = _video_samples()
+    media = media_pipeline.submit("hello", ref_id=1).result(timeout=5)
+    assert media["video"] == (cached or "v.mp4")
+    assert _video_samples() == before + 1
+    assert [e["stage"] for e in pipeline if e["type"] == "media"].count("video") == 1
+
+
+def test_pool_encoded_video_is_accounted_in_the_parent_cache(pipeline, monkeypatch):
+    threads, procs = ThreadPoolExecutor(2), ThreadPoolExecutor(1)  # procs stands in for the process pool
+    monkeypatch.setattr(media_pipeline, "_pools", lambda: (threads, procs))
+    monkeypatch.setattr(mg, "encode_video", lambda image, audio: "v.mp4")
+    stored = []
+    monkeypatch.setattr(media_cache, "store", lambda kind, path: stored.append((kind, path)))
+    try:
+        assert media_pipeline.submit("hello").result(timeout=5)["video"] == "v.mp4"
+    finally:
+        threads.shutdown()
+        procs.shutdown()
+    assert stored == [("video", "v.mp4")]
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+import metrics_store as ms
+import realtime_bus as bus
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ms, "_PATH", str(tmp_path / "metrics.json"))
+    monkeypatch.setattr(ms, "_shards", [ms._Shard() for _ in range(ms.SHARDS)])
+    monkeypatch.setattr(ms, "_local", threading.local())
+    monkeypatch.setattr(ms, "_next_shard", ms.itertools.count())
+    monkeypatch.setattr(ms, "_base", None)
+    monkeypatch.setattr(ms, "_dirty", False)
+    monkeypatch.setattr(ms, "_snapshotter", object())  # no background snapshots
+    monkeypatch.setattr(bus, "publish", lambda ev: None)
+
+
+def test_concurrent_pageviews_spread_across_shards_and_sum_exactly():
+    threads, per_thread = 50, 200
+    start = threading.Barrier(threads)
+
+    def worker(i):
+        start.wait()
+        for _ in range(per_thread):
+            ms.pageview("/" if i % 2 else "/workflows")
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+    used = [s for s in ms._shards if s.routes]
+    assert len(used) == ms.SHARDS
+    m = ms.get_metrics()
+    assert m["total_pageviews"] == threads * per_thread
+    assert m["pageviews"] == {"/": 25 * per_thread, "/workflows": 25 * per_thread}
+    assert sum(sum(b.values()) for b in m["pageviews_per_minute"].values()) == threads * per_thread
+
+
+def test_snapshot_persists_and_reloads_counts():
+    for _ in range(3):
+        ms.pageview("/")
+    assert ms._dirty
+    ms.snapshot()
+    assert not ms._dirty
+
+    ms._base = None
+    ms._shards[:] = [ms._Shard() for _ in range(ms.SHARDS)]
+    assert ms.get_metrics()["pageviews"] == {"/": 3}
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+import promotion_manager as pm  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, status, data=None):
+        self.status_code = status
+        self._data = data
+
+    def json(self):
+        return {"data": self._data}
+
+
+@pytest.fixture(autouse=True)
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(pm, "_PATH", str(tmp_path / "promotion_state.json"))
+    monkeypatch.setattr(pm, "_state", None)
+    monkeypatch.setattr(pm, "_key_locks", {})
+
+
+def test_concurrent_posts_create_one_campaign():
+    created = []
+    gate = threading.Barrier(8)
+
+    def create():
+        created.append(1)
+        time.sleep(0.05)  # slow API call: everyone else arrives meanwhile
+        return f"c{len(created)}"
+
+    ids = []
+
+    def post():
+        gate.wait()
+        ids.append(pm.campaign("http://ads", "acc", None, "fi", "Reach", create))
+    threads = [threading.Thread(target=post) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert ids == ["c1"] * 8
+
+
+@pytest.mark.parametrize("status,data,replaced", [
+    (200, {"entity_status": "ACTIVE", "reasons_not_servable": []}, False),
+    (200, {"entity_status": "ACTIVE", "reasons_not_servable": ["EXCEEDED_DAILY_BUDGET"]}, False),
+    (200, {"entity_status": "PAUSED"}, True),
+    (200, {"entity_status": "ACTIVE", "reasons_not_servable": ["EXPIRED"]}, True),
+    (200, {"entity_status": "ACTIVE", "reasons_not_servable": ["EXCEEDED_TOTAL_BUDGET"]}, True),
+    (200, {"entity_status": "ACTIVE", "deleted": True}, True),
+    (404, None, True),
+    (503, None, False),  # no definite answer: keep it
+])
+def test_stored_campaign_is_replaced_only_when_retired(monkeypatch, status, data, replaced):
+    monkeypatch.setattr(pm, "VERIFY_SEC", 0)
+    monkeypatch.setattr(pm.http_pool, "get", lambda url, **kw: _Resp(status, data))
+    first = pm.campaign("http://ads", "acc", None, "fi", "Reach", lambda: "old")
+    again = pm.campaign("http://ads", "acc", None, "fi", "Reach", lambda: "new")
+    assert first == "old"
+    assert again == ("new" if replaced else "old")
+    assert pm.status()["campaigns"]["acc|fi|Reach"]["id"] == again
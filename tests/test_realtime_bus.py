@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+import realtime_bus as bus
+
+
+@pytest.fixture(autouse=True)
+def small_ring(monkeypatch):
+    monkeypatch.setattr(bus, "_MAX_EVENTS", 4)
+    monkeypatch.setattr(bus, "_ring", [None] * 4)
+    monkeypatch.setattr(bus, "_next_id", 0)
+    monkeypatch.setattr(bus.event_journal, "append", lambda ev: None)
+
+
+def _publish(n):
+    return [bus.publish({"type": "t", "n": i}) for i in range(n)]
+
+
+def test_read_since_returns_events_in_order_and_next_position():
+    _publish(3)
+    batch, nxt, evicted = bus.read_since(0)
+    assert [e["id"] for e in batch] == [0, 1, 2]
+    assert (nxt, evicted) == (3, 0)
+    assert bus.read_since(nxt) == ([], 3, 0)
+
+
+def test_read_since_respects_max_batch():
+    _publish(4)
+    batch, nxt, _ = bus.read_since(1, max_batch=2)
+    assert [e["id"] for e in batch] == [1, 2] and nxt == 3
+
+
+def test_overwritten_events_are_reported_as_evicted():
+    _publish(10)  # ring keeps ids 6..9
+    batch, nxt, evicted = bus.read_since(2)
+    assert [e["n"] for e in batch] == [6, 7, 8, 9]
+    assert (nxt, evicted) == (10, 4)
+    assert [e["id"] for e in bus.recent(100)] == [6, 7, 8, 9]
+    assert [e["id"] for e in bus.recent(2)] == [8, 9]
+    assert bus.head_id() == 10
+
+
+def test_stream_yields_evicted_marker_then_resumes():
+    _publish(6)
+    gen = bus.stream(last_id=0, keepalive_sec=60)
+    marker = next(gen)
+    assert marker["type"] == "evicted"
+    assert (marker["requested_id"], marker["resume_id"], marker["dropped"]) == (0, 2, 2)
+    assert [next(gen)["id"] for _ in range(4)] == [2, 3, 4, 5]
+
+
+def test_wait_wakes_on_publish():
+    woke = []
+    t = threading.Thread(target=lambda: woke.append(bus.wait(0, timeout=2)))
+    t.start()
+    bus.publish({"type": "t"})
+    t.join(timeout=3)
+    assert woke == [True]
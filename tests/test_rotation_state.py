@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+import rotation_state as rs
+
+TWEETS = ["first", "second", "third"]
+
+
+def _restart(monkeypatch):
+    # Drop the in-memory state as a process restart would
+    monkeypatch.setattr(rs, "_loaded", False)
+    monkeypatch.setattr(rs, "_cursor", 0)
+    monkeypatch.setattr(rs, "_generation", 0)
+    monkeypatch.setattr(rs, "_used", set())
+    monkeypatch.setattr(rs, "_pending", None)
+
+
+@pytest.fixture(autouse=True)
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(rs, "_PATH", str(tmp_path / "posted_log.jsonl"))
+    monkeypatch.setattr(rs, "_LEGACY_PATH", str(tmp_path / "posted_state.json"))
+    _restart(monkeypatch)
+    return tmp_path
+
+
+def _post(tweets, tweet_id=None):
+    text = rs.next_text(tweets)
+    rs.mark_posted(text, tweet_id)
+    return text
+
+
+def test_rotation_walks_the_source_then_starts_a_new_pass():
+    assert [_post(TWEETS) for _ in range(4)] == ["first", "second", "third", "first"]
+    st = rs.status()
+    assert (st["generation"], st["cursor"], st["used_in_generation"]) == (1, 1, 1)
+
+
+def test_unposted_pick_is_offered_again():
+    assert rs.next_text(TWEETS) == "first"
+    assert rs.next_text(TWEETS) == "first"
+
+
+def test_cursor_is_recovered_from_the_log_tail(monkeypatch):
+    monkeypatch.setattr(rs, "_TAIL_BLOCK", 16)  # force lines across block boundaries
+    for _ in range(5):
+        _post(TWEETS)
+    _restart(monkeypatch)
+    st = rs.status()
+    assert (st["generation"], st["cursor"], st["used_in_generation"]) == (1, 2, 2)
+    assert rs.next_text(TWEETS) == "third"
+    assert [r["text"] for r in rs.recent(3)] == ["third", "first", "second"]
+
+
+def test_inserted_text_is_picked_without_reposting(monkeypatch):
+    _post(TWEETS)
+    _restart(monkeypatch)
+    assert rs.next_text(["new"] + TWEETS) == "second"
+
+
+def test_legacy_state_is_imported_once(state, monkeypatch):
+    legacy = state / "posted_state.json"
+    legacy.write_text(json.dumps({
+        "used_texts": ["second"],
+        "posted": [{"text": "first", "tweet_id": "1"}, {"text": "second", "tweet_id": "2"}],
+    }), encoding="utf-8")
+
+    # "first" fell out of used_texts, so it belongs to an earlier pass
+    assert rs.next_text(TWEETS) == "first"
+    assert not legacy.exists()
+    assert os.path.exists(f"{legacy}.imported")
+    log = [json.loads(l) for l in (state / "posted_log.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(r["text"], r["gen"], r["tweet_id"]) for r in log] == [("first", -1, "1"), ("second", 0, "2")]
+
+    rs.mark_posted("first", "3")
+    assert rs.next_text(TWEETS) == "third"
+
+    _restart(monkeypatch)
+    legacy.write_text(json.dumps({"used_texts": ["third"], "posted": []}), encoding="utf-8")
+    assert rs.next_text(TWEETS) == "third"  # log exists: legacy file ignored
+    assert legacy.exists()
@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("requests_oauthlib")
+
+import circuit_breaker  # noqa: E402
+import social_dispatcher  # noqa: E402
+
+
+class _Provider:
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.delay = delay
+
+    def post(self, text):
+        time.sleep(self.delay)
+        return {"provider": self.name, "status": "ok", "detail": {"text": text}}
+
+
+@pytest.fixture
+def one_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_STATE_PATH", str(tmp_path / "cb_state.json"))
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(social_dispatcher, "_EXECUTOR", pool)
+    monkeypatch.setattr(social_dispatcher, "DISPATCH_CONCURRENT", True)
+    yield pool
+    pool.shutdown(wait=True)
+    circuit_breaker.flush()  # before the state path is restored
+
+
+def test_queued_provider_is_not_timed_out_before_it_starts(one_worker, monkeypatch):
+    monkeypatch.setattr(social_dispatcher, "DISPATCH_PROVIDER_TIMEOUT_SEC", 0.2)
+    monkeypatch.setattr(social_dispatcher, "DISPATCH_CYCLE_DEADLINE_SEC", 5.0)
+    # One worker: "queued" waits ~0.4s behind "slow" but then runs well within its timeout
+    slow, queued = _Provider("slow", delay=0.4), _Provider("queued")
+    statuses = social_dispatcher._fan_out([slow, queued], "hi")
+    assert statuses[0]["status"] == "error"
+    assert statuses[0]["detail"]["error"] == "provider_timeout"
+    assert statuses[1]["status"] == "ok"
+
+
+def test_provider_still_queued_at_cycle_deadline_reports_queue_time(one_worker, monkeypatch):
+    monkeypatch.setattr(social_dispatcher, "DISPATCH_PROVIDER_TIMEOUT_SEC", 5.0)
+    monkeypatch.setattr(social_dispatcher, "DISPATCH_CYCLE_DEADLINE_SEC", 0.2)
+    statuses = social_dispatcher._fan_out([_Provider("slow", delay=0.5), _Provider("queued")], "hi")
+    assert [s["detail"]["error"] for s in statuses] == ["cycle_deadline", "cycle_deadline"]
+    assert statuses[1]["detail"]["queued_sec"] == pytest.approx(0.2, abs=0.05)
+
+
+def test_twitter_retries_draw_from_the_cycle_budget(one_worker, monkeypatch):
+    monkeypatch.setattr(social_dispatcher, "DISPATCH_RETRY_BUDGET", 1)
+    monkeypatch.setattr(social_dispatcher, "SIMULATE_ALL_PROVIDERS", False)
+    monkeypatch.setattr(circuit_breaker, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(circuit_breaker, "MAX_RETRIES", 3)
+    monkeypatch.setattr(circuit_breaker, "FAILURE_THRESHOLD", 100)
+    calls = []
+
+    def flaky(cfg):
+        calls.append(1)
+        raise RuntimeError("rate limited")
+    monkeypatch.setattr(social_dispatcher, "post_one_auto", flaky)
+    monkeypatch.setattr(social_dispatcher, "_generate_text", lambda: "fallback")
+    monkeypatch.setattr(social_dispatcher, "_registry", lambda: {
+        "cfg": None, "providers": [_Provider("line"), _Provider("discord")], "names": ["twitter"], "has_creds": True})
+
+    out = social_dispatcher._distribute()
+    # one first attempt + the single retry the budget allows, not MAX_RETRIES attempts
+    assert len(calls) == 2
+    assert out["providers"][0]["status"] == "error"
+    assert [s["status"] for s in out["providers"][1:]] == ["ok", "ok"]
+    assert out["text"] == "fallback"
@@ -0,0 +1,72 @@
+import json
+import time
+
+import pytest
+
+import realtime_bus as bus
+import sse_broadcaster as sse
+
+
+@pytest.fixture(autouse=True)
+def quiet_journal(monkeypatch):
+    monkeypatch.setattr(bus.event_journal, "append", lambda ev: None)
+
+
+def _events(sub, n, timeout=3.0):
+    out = []
+    end = time.monotonic() + timeout
+    while len(out) < n and time.monotonic() < end:
+        chunk = sub.get(timeout=0.1) or b""
+        for part in chunk.decode("utf-8").split("\n\n"):
+            if part.startswith("data: "):
+                ev = json.loads(part[6:])
+                if ev.get("type") != "keepalive":
+                    out.append(ev)
+    return out
+
+
+def _pumped(eid, timeout=3.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if sse.stats()["position"] > eid:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_replay_runs_outside_the_lock_and_keeps_order(monkeypatch):
+    live = sse.subscribe()
+    first = [bus.publish({"type": "t", "n": i}) for i in range(3)]
+    assert _pumped(first[-1]["id"])
+    with sse._lock:  # force the replay to encode the first event itself
+        sse._encoded.pop(first[0]["id"], None)
+
+    real_encode = sse.encode
+    during = {}
+
+    def slow_encode(ev):
+        if ev.get("id") == first[0]["id"] and not during:
+            during["lock_held"] = sse._lock.locked()
+            # the pump keeps broadcasting to everyone while this replay is encoding
+            during["live"] = bus.publish({"type": "t", "n": "live"})
+            during["pumped"] = _pumped(during["live"]["id"])
+        return real_encode(ev)
+    monkeypatch.setattr(sse, "encode", slow_encode)
+
+    sub = sse.subscribe(last_id=first[0]["id"])
+    try:
+        assert during == {"lock_held": False, "live": during["live"], "pumped": True}
+        got = [e["n"] for e in _events(sub, 4)]
+        assert got == [0, 1, 2, "live"]
+        assert [e["n"] for e in _events(live, 4)] == [0, 1, 2, "live"]
+    finally:
+        sse.unsubscribe(sub)
+        sse.unsubscribe(live)
+
+
+def test_subscriber_holds_live_chunks_until_replay_is_queued():
+    sub = sse.Subscriber(1, 10, replaying=True)
+    assert sub.push(b"live\n\n")
+    assert sub.get(timeout=0) == b""
+    assert sub.replay([b"old1\n\n", b"old2\n\n"])
+    assert sub.get(timeout=0) == b"old1\n\nold2\n\nlive\n\n"
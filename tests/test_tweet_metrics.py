@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("requests")
+
+import tweet_metrics as tm  # noqa: E402
+
+HOUR = 3600
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(tm, "_DB_PATH", str(tmp_path / "tweet_metrics.db"))
+    monkeypatch.setattr(tm, "_conn", None)
+    monkeypatch.setattr(tm, "RAW_HOURS", 48)
+    monkeypatch.setattr(tm, "HOURLY_DAYS", 30)
+    yield
+    if tm._conn is not None:
+        tm._conn.close()
+
+
+def _item(tid, likes):
+    return {"id": tid, "created_at": "2026-10-01T00:00:00Z", "public_metrics": {"like_count": likes}}
+
+
+def test_latest_keeps_tweets_whose_raw_samples_were_rolled_up():
+    now = 1_800_000_000
+    old = now - 5 * 24 * HOUR
+    tm._store([_item("1", 3)], old)
+    tm._store([_item("1", 7), _item("2", 1)], old + 60)
+    tm._store([_item("2", 9)], now)
+    tm.downsample(now)
+
+    rows = {r["tweet_id"]: r for r in tm.latest()}
+    assert set(rows) == {"1", "2"}
+    assert (rows["2"]["res"], rows["2"]["ts"], rows["2"]["like_count"]) == (tm.RES_RAW, now, 9)
+    # tweet 1 is only left as an hourly point: the last sample of its hour
+    assert (rows["1"]["res"], rows["1"]["like_count"]) == (tm.RES_HOUR, 7)
+    assert [r["tweet_id"] for r in tm.latest()] == ["2", "1"]
+
+
+def test_latest_returns_one_row_per_tweet():
+    tm._store([_item("1", 1)], 1000)
+    tm._store([_item("1", 2)], 2000)
+    assert [(r["tweet_id"], r["like_count"]) for r in tm.latest()] == [("1", 2)]
@@ -0,0 +1,42 @@
+import os
+
+import tweet_source
+
+
+def _append(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))  # coarse mtime filesystems
+
+
+def test_append_ending_inside_a_thai_character_is_carried_over(tmp_path):
+    path = str(tmp_path / "tweets.txt")
+    _append(path, "สวัสดี\n".encode("utf-8"))
+    assert tweet_source.load_file(path) == ["สวัสดี"]
+
+    line = "อยุธยา\n".encode("utf-8")
+    _append(path, line[:4])  # writer stopped mid-character
+    assert tweet_source.load_file(path) == ["สวัสดี"]
+
+    _append(path, line[4:])
+    assert tweet_source.load_file(path) == ["สวัสดี", "อยุธยา"]
+
+
+def test_unterminated_last_line_is_included(tmp_path):
+    path = str(tmp_path / "tweets.txt")
+    _append(path, b"one\ntwo")
+    assert tweet_source.load_file(path) == ["one", "two"]
+    _append(path, b" more\nthree\n")
+    assert tweet_source.load_file(path) == ["one", "two more", "three"]
+
+
+def test_rewritten_file_is_reparsed(tmp_path):
+    path = str(tmp_path / "tweets.txt")
+    _append(path, b"a\nb\n")
+    assert tweet_source.load_file(path) == ["a", "b"]
+    with open(path, "wb") as f:
+        f.write(b"c\nd\ne\n")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000))
+    assert tweet_source.load_file(path) == ["c", "d", "e"]
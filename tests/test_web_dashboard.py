@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("flask")
+
+import node_registry  # noqa: E402
+import web_dashboard  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(node_registry, "_PATH", str(tmp_path / "nodes_registry.json"))
+    return web_dashboard.app.test_client()
+
+
+def test_routes_are_registered_once():
+    rules = [(r.rule, tuple(sorted(r.methods - {"HEAD", "OPTIONS"}))) for r in web_dashboard.app.url_map.iter_rules()]
+    assert len(rules) == len(set(rules))
+    assert {"/events", "/metrics", "/api/nodes", "/api/nodes/summary"} <= {r for r, _ in rules}
+
+
+def test_node_register_heartbeat_and_summary(client):
+    node = client.post("/api/nodes/register", json={"name": "edge-1", "url": "http://edge-1:8000"}).get_json()
+    assert node["beats"] == 0
+
+    beat = client.post("/api/nodes/heartbeat", json={"id": node["id"], "metrics": {"queue": 3}}).get_json()
+    assert beat["beats"] == 1 and beat["metrics"] == {"queue": 3}
+    assert client.post("/api/nodes/heartbeat", json={"id": "nope"}).status_code == 404
+
+    listed = client.get("/api/nodes").get_json()
+    assert [(n["name"], n["status"]) for n in listed] == [("edge-1", "online")]
+    summary = client.get("/api/nodes/summary").get_json()
+    assert (summary["total"], summary["online"], summary["offline"]) == (1, 1, 0)
+
+
+def test_metrics_endpoint_serves_openmetrics_with_node_and_pool_families(client, monkeypatch):
+    import http_pool
+    import telemetry
+
+    node = client.post("/api/nodes/register", json={"name": "edge-1", "url": "http://edge-1:8000"}).get_json()
+    client.post("/api/nodes/heartbeat", json={"id": node["id"]})
+    monkeypatch.setattr(http_pool, "stats", lambda: {"hosts": {"line@api.line.me": {
+        "host": "api.line.me", "provider": "line", "requests": 3, "errors": 1,
+        "connections_opened": 1, "connections_reused": 2}}})
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Type"] == telemetry.CONTENT_TYPE
+    text = resp.get_data(as_text=True)
+    lines = text.splitlines()
+    assert lines[-1] == "# EOF"
+    assert 'nodes{status="online"} 1' in lines
+    assert 'nodes{status="offline"} 0' in lines
+    assert f'node_heartbeats_total{{name="edge-1",node="{node["id"]}"}} 1' in lines
+    assert any(l.startswith(f'node_last_seen_age_seconds{{name="edge-1",node="{node["id"]}"}} ') for l in lines)
+    assert 'http_pool_requests_total{host="api.line.me",provider="line"} 3' in lines
+    assert 'http_pool_errors_total{host="api.line.me",provider="line"} 1' in lines
+    # every family carries a type and a non-empty help line
+    for fam in ("nodes", "node_heartbeats", "http_pool_requests", "http_pool_connections_reused"):
+        assert any(l.startswith(f"# TYPE {fam} ") for l in lines)
+        assert any(l.startswith(f"# HELP {fam} ") and len(l.split(" ", 3)) == 4 for l in lines)
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+import realtime_bus as bus
+import workflow_store as ws
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ws, "_DB_PATH", str(tmp_path / "workflows.db"))
+    monkeypatch.setattr(ws, "_PATH", str(tmp_path / "workflows.json"))
+    monkeypatch.setattr(ws, "_conn", None)
+    monkeypatch.setattr(ws, "_running", {})
+    monkeypatch.setattr(ws, "_since_prune", 0)
+    monkeypatch.setattr(bus.event_journal, "append", lambda ev: None)
+    yield
+    if ws._conn is not None:
+        ws._conn.close()
+
+
+def test_total_runs_is_all_time_and_retained_runs_counts_stored_rows(monkeypatch):
+    monkeypatch.setattr(ws, "RETENTION_DAYS", 1)
+    monkeypatch.setattr(ws, "PRUNE_EVERY", 3)
+    old = time.time() - 3 * 86400
+    for i in range(2):
+        ws._record({"id": f"old{i}", "name": "post", "status": "ok", "start_ts": old, "end_ts": old,
+                    "duration_sec": 1.0})
+    ws.end(ws.start("post"))  # third write triggers the prune
+    ws.fail(ws.start("collect"), "boom")
+
+    s = ws.summary()
+    assert s["total_runs"] == 4
+    assert s["retained_runs"] == 2
+    assert [r["name"] for r in s["last_runs"]] == ["post", "collect"]
+    assert {a["name"]: (a["ok"], a["error"]) for a in s["aggregate"]} == {"post": (3, 0), "collect": (0, 1)}
+
+
+def test_reset_clears_both_counts():
+    ws.end(ws.start("post"))
+    ws.reset()
+    s = ws.summary()
+    assert (s["total_runs"], s["retained_runs"]) == (0, 0)
@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import http_pool
+
+# Organic tweet metrics: /2/tweets lookups in batches of up to 100 ids fetched
+# concurrently under a shared rate-limit gate, stored as per-tweet time series
+# in SQLite. Counters are cumulative, so downsampling keeps the last sample of
+# each hour (then day) once raw samples age out.
+_DB_PATH = os.getenv("TWEET_METRICS_DB_PATH", "tweet_metrics.db")
+_LOCK = threading.Lock()
+API_URL = "https://api.twitter.com/2/tweets"
+BATCH_SIZE = min(100, int(os.getenv("TWEET_METRICS_BATCH_SIZE", "100")))   # API max is 100 ids
+WORKERS = int(os.getenv("TWEET_METRICS_WORKERS", "4"))                     # concurrent lookups
+DEADLINE_SEC = float(os.getenv("TWEET_METRICS_DEADLINE_SEC", "50"))        # keep within one collect interval
+RAW_HOURS = float(os.getenv("TWEET_METRICS_RAW_HOURS", "48"))              # full-resolution retention
+HOURLY_DAYS = float(os.getenv("TWEET_METRICS_HOURLY_DAYS", "30"))          # hourly retention, then daily
+
+FIELDS = ("impression_count", "like_count", "retweet_count", "reply_count", "quote_count", "bookmark_count")
+RES_RAW, RES_HOUR, RES_DAY = 0, 3600, 86400
+
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _db() -> sqlite3.Connection:
+    # caller holds _LOCK
+    global _conn
+    if _conn is not None:
+        return _conn
+    conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    cols = ", ".join(f"{f} INTEGER" for f in FIELDS)
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS samples (
+        tweet_id TEXT NOT NULL, res INTEGER NOT NULL, ts INTEGER NOT NULL, {cols},
+        PRIMARY KEY (tweet_id, res, ts)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS tweets (
+        tweet_id TEXT PRIMARY KEY, created_at TEXT, last_ts INTEGER) WITHOUT ROWID""")
+    conn.commit()
+    _conn = conn
+    return conn
+
+
+class _RateGate:
+    """
+    Shared view of x-rate-limit-* headers: workers wait for the window reset
+    when the remaining quota hits zero, and give up if that is past the deadline.
+    """
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.limited = False
+        self._lock = threading.Lock()
+
+    def wait(self) -> bool:
+        with self._lock:
+            if self.remaining is None or self.remaining > 0:
+                if self.remaining is not None:
+                    self.remaining -= 1
+                return True
+            until = self.reset_at
+        if until >= self.deadline:
+            self.limited = True
+            return False
+        time.sleep(max(0.0, until - time.time()))
+        return True
+
+    def update(self, headers) -> None:
+        try:
+            remaining = headers.get("x-rate-limit-remaining")
+            reset = headers.get("x-rate-limit-reset")
+        except Exception:
+            return
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset_at = float(reset)
+
+    def exhausted(self, headers) -> None:
+        self.update(headers)
+        with self._lock:
+            self.remaining = 0
+            if self.reset_at <= time.time():
+                self.reset_at = time.time() + 60
+
+
+def _fetch_batch(ids: List[str], bearer: str, gate: _RateGate) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    params = {"ids": ",".join(ids), "tweet.fields": "created_at,public_metrics"}
+    headers = {"Authorization": f"Bearer {bearer}"}
+    for _ in range(2):
+        if not gate.wait():
+            return [], "rate_limited"
+        resp = http_pool.get(API_URL, params=params, headers=headers)
+        if resp.status_code == 429:
+            gate.exhausted(resp.headers)
+            continue
+        gate.update(resp.headers)
+        resp.raise_for_status()
+        return resp.json().get("data", []) or [], None
+    return [], "rate_limited"
+
+
+def _store(items: List[Dict[str, Any]], ts: int) -> None:
+    rows = []
+    tweets = []
+    for it in items:
+        pm = it.get("public_metrics") or {}
+        rows.append((str(it.get("id")), RES_RAW, ts) + tuple(pm.get(f) for f in FIELDS))
+        tweets.append((str(it.get("id")), it.get("created_at"), ts))
+    if not rows:
+        return
+    placeholders = ", ".join("?" for _ in range(3 + len(FIELDS)))
+    with _LOCK:
+        conn = _db()
+        conn.executemany(f"INSERT OR REPLACE INTO samples (tweet_id, res, ts, {', '.join(FIELDS)}) "
+                         f"VALUES ({placeholders})", rows)
+        conn.executemany("INSERT INTO tweets (tweet_id, created_at, last_ts) VALUES (?, ?, ?) "
+                         "ON CONFLICT(tweet_id) DO UPDATE SET last_ts = excluded.last_ts", tweets)
+        conn.commit()
+
+
+def _rollup(conn: sqlite3.Connection, src: int, dst: int, older_than: int) -> None:
+    # Keep the last sample per (tweet, dst bucket) for src rows older than the cutoff
+    fields = ", ".join(FIELDS)
+    conn.execute(
+        f"INSERT OR REPLACE INTO samples (tweet_id, res, ts, {fields}) "
+        f"SELECT s.tweet_id, ?, (s.ts / ?) * ?, {', '.join('s.' + f for f in FIELDS)} FROM samples s "
+        f"JOIN (SELECT tweet_id, MAX(ts) AS ts FROM samples WHERE res = ? AND ts < ? "
+        f"      GROUP BY tweet_id, ts / ?) last ON s.tweet_id = last.tweet_id AND s.ts = last.ts "
+        f"WHERE s.res = ?",
+        (dst, dst, dst, src, older_than, dst, src))
+    conn.execute("DELETE FROM samples WHERE res = ? AND ts < ?", (src, older_than))
+
+
+def downsample(now: Optional[float] = None) -> None:
+    """
+    Roll raw samples older than RAW_HOURS into hourly points and hourly points
+    older than HOURLY_DAYS into daily points.
+    """
+    now = int(now or time.time())
+    with _LOCK:
+        conn = _db()
+        if RAW_HOURS > 0:
+            _rollup(conn, RES_RAW, RES_HOUR, (now - int(RAW_HOURS * 3600)) // RES_HOUR * RES_HOUR)
+        if HOURLY_DAYS > 0:
+            _rollup(conn, RES_HOUR, RES_DAY, (now - int(HOURLY_DAYS * 86400)) // RES_DAY * RES_DAY)
+        conn.commit()
+
+
+def collect(ids: List[str], bearer: str) -> Dict[str, Any]:
+    """
+    Fetch public metrics for ids (deduplicated) and store one sample per tweet.
+    """
+    ids = list(dict.fromkeys(str(i) for i in ids if i))
+    started = time.time()
+    gate = _RateGate(started + DEADLINE_SEC)
+    batches = [ids[i:i + BATCH_SIZE] for i in range(0, len(ids), BATCH_SIZE)]
+    items: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(WORKERS, len(batches))),
+                                thread_name_prefix="tweet-metrics") as pool:
+            futures = [pool.submit(_fetch_batch, b, bearer, gate) for b in batches]
+            for fut in futures:
+                try:
+                    got, err = fut.result()
+                    items.extend(got)
+                    if err:
+                        errors.append(err)
+                except Exception as e:
+                    errors.append(str(e))
+    _store(items, int(started))
+    try:
+        downsample()
+    except Exception:
+        pass
+    return {"count": len(items), "requested": len(ids), "batches": len(batches),
+            "errors": errors, "rate_limited": gate.limited, "duration_sec": round(time.time() - started, 3),
+            "items": items}
+
+
+def latest(limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Most recent sample of the last `limit` updated tweets, at whatever resolution
+    it survives (raw, hourly or daily once the raw samples were rolled up).
+    """
+    with _LOCK:
+        conn = _db()
+        rows = conn.execute(
+            f"SELECT t.tweet_id, t.created_at, s.ts, s.res, {', '.join('s.' + f for f in FIELDS)} FROM tweets t "
+            f"JOIN samples s ON s.tweet_id = t.tweet_id AND (s.res, s.ts) = "
+            f"  (SELECT res, ts FROM samples WHERE tweet_id = t.tweet_id ORDER BY ts DESC, res LIMIT 1) "
+            f"ORDER BY t.last_ts DESC LIMIT ?", (int(limit),)).fetchall()
+    return [dict(zip(("tweet_id", "created_at", "ts", "res") + FIELDS, r)) for r in rows]
+
+
+def series(tweet_id: str) -> List[Dict[str, Any]]:
+    """
+    Every stored point for one tweet, oldest first (mixed resolutions).
+    """
+    with _LOCK:
+        conn = _db()
+        rows = conn.execute(f"SELECT res, ts, {', '.join(FIELDS)} FROM samples WHERE tweet_id = ? ORDER BY ts",
+                            (str(tweet_id),)).fetchall()
+    return [dict(zip(("res", "ts") + FIELDS, r)) for r in rows]
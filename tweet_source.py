@@ -0,0 +1,104 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
+# Cached tweet sources for load_tweets. Files are keyed on (inode, size, mtime)
+# and appends are parsed from the last known offset; remote sources are read
+# from the importer's local snapshot.
+_CHECK_BYTES = 64   # bytes before the cached offset compared to detect rewrites
+
+_LOCK = threading.Lock()
+_files: Dict[str, "_FileEntry"] = {}
+
+
+class _FileEntry:
+    __slots__ = ("ino", "size", "mtime_ns", "offset", "check", "complete", "partial", "lines")
+
+    def __init__(self) -> None:
+        self.ino = None
+        self.size = -1
+        self.mtime_ns = -1
+        self.offset = 0          # bytes consumed up to the last newline
+        self.check = b""         # last _CHECK_BYTES before offset
+        self.complete: List[str] = []
+        self.partial = ""        # trailing line without a newline yet
+        self.lines: List[str] = []
+
+
+def _parse_into(entry: _FileEntry, data: bytes, base: int) -> None:
+    # Only bytes up to the last newline are consumed; the tail is re-read next time
+    cut = data.rfind(b"\n") + 1
+    for raw in data[:cut].decode("utf-8").splitlines():
+        t = raw.strip()
+        if t:
+            entry.complete.append(t)
+    try:
+        entry.partial = data[cut:].decode("utf-8").strip()
+    except UnicodeDecodeError:
+        # a multibyte character (e.g. Thai) is still being written
+        entry.partial = ""
+    entry.offset = base + cut
+
+
+def _read_file(path: str, entry: _FileEntry, st: os.stat_result) -> None:
+    with open(path, "rb") as f:
+        appended = False
+        # Same inode, grown, and the bytes before our offset unchanged -> an append
+        if entry.ino == st.st_ino and st.st_size > entry.size and entry.offset > 0:
+            f.seek(entry.offset - len(entry.check))
+            if f.read(len(entry.check)) == entry.check:
+                _parse_into(entry, f.read(), entry.offset)
+                appended = True
+        if not appended:
+            f.seek(0)
+            entry.complete = []
+            _parse_into(entry, f.read(), 0)
+        if entry.offset:
+            f.seek(max(0, entry.offset - _CHECK_BYTES))
+            entry.check = f.read(entry.offset - max(0, entry.offset - _CHECK_BYTES))
+        else:
+            entry.check = b""
+    entry.ino = st.st_ino
+    entry.size = st.st_size
+    entry.mtime_ns = st.st_mtime_ns
+    entry.lines = entry.complete + [entry.partial] if entry.partial else list(entry.complete)
+
+
+def load_file(path: str) -> List[str]:
+    """
+    Non-empty stripped lines of path. Unchanged files are not re-read and
+    appended lines are parsed incrementally. The returned list is shared;
+    callers must not modify it.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        with _LOCK:
+            _files.pop(path, None)
+        return []
+    with _LOCK:
+        entry = _files.get(path)
+        if entry is None:
+            entry = _FileEntry()
+            _files[path] = entry
+        if (entry.ino, entry.size, entry.mtime_ns) != (st.st_ino, st.st_size, st.st_mtime_ns):
+            _read_file(path, entry, st)
+        return entry.lines
+
+
+def load_url(url: str, fmt: str = "lines") -> List[str]:
+    """
+    Texts from the importer's local snapshot of a remote source. The snapshot
+    is refreshed in the background (conditional, streamed GETs), so this never
+    waits on the network.
+    """
+    import importer
+    return importer.snapshot_texts(url, fmt)
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    with _LOCK:
+        if path is None:
+            _files.clear()
+        else:
+            _files.pop(path, None)
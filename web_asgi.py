@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+from urllib.parse import parse_qs
+
+import realtime_bus as bus
+import sse_broadcaster as sse
+
+log = logging.getLogger("web_asgi")
+
+# ASGI entry point: /events streams from asyncio (no thread per client);
+# every other route is the Flask app served through asgiref's WSGI adapter.
+
+
+class _Client:
+    """
+    Per-connection queue of encoded SSE chunks; same backpressure policy as sse_broadcaster.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.closed = False
+        self.collapsed = 0
+        self._q: Deque[bytes] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, chunk: bytes) -> bool:
+        if self.closed:
+            return False
+        if len(self._q) >= self.maxlen:
+            if sse.SLOW_POLICY == "drop":
+                self.close()
+                return False
+            missed = len(self._q)
+            self._q.clear()
+            self.collapsed += missed
+            self._q.append(sse.encode({"type": "lagged", "ts": time.time(), "dropped": missed}))
+        self._q.append(chunk)
+        self._ready.set()
+        return True
+
+    async def get(self) -> Optional[bytes]:
+        while not self._q and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        if self._q:
+            out = b"".join(self._q)
+            self._q.clear()
+            return out
+        return None
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    def lag(self) -> int:
+        return len(self._q)
+
+
+class _Hub:
+    """
+    Single task per event loop: waits on the bus in one executor thread, encodes
+    each event once and pushes the bytes to every connected client.
+    """
+
+    def __init__(self) -> None:
+        self.clients: Set[_Client] = set()
+        self.pos = bus.head_id()
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {"encoded": 0, "dropped_clients": 0, "connections_total": 0}
+
+    def ensure_running(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_keep = time.monotonic()
+        while True:
+            await loop.run_in_executor(None, bus.wait, self.pos, sse.KEEPALIVE_SEC)
+            batch, nxt, _ = bus.read_since(self.pos)
+            self.pos = nxt
+            chunks = [sse.encode(ev) for ev in batch] if self.clients else []
+            self.stats["encoded"] += len(chunks)
+            now = time.monotonic()
+            if now - last_keep >= sse.KEEPALIVE_SEC:
+                last_keep = now
+                chunks.append(sse.encode({"type": "keepalive", "ts": time.time()}))
+            if not chunks:
+                continue
+            for c in list(self.clients):
+                for chunk in chunks:
+                    if not c.push(chunk):
+                        self.clients.discard(c)
+                        self.stats["dropped_clients"] += 1
+                        break
+
+    def connect(self, last_id: Optional[int]) -> _Client:
+        self.ensure_running()
+        c = _Client(sse.QUEUE_MAX)
+        # Runs on the loop, so replay and the hub's fan-out cannot interleave
+        if last_id is not None and last_id < self.pos:
+            replay, _, evicted = bus.read_since(last_id, max_batch=max(1, self.pos - last_id))
+            if evicted:
+                c.push(sse.encode({"type": "evicted", "ts": time.time(), "requested_id": last_id,
+                                   "resume_id": last_id + evicted, "dropped": evicted}))
+            for ev in replay:
+                if int(ev.get("id", -1)) >= self.pos:
+                    break
+                c.push(sse.encode(ev))
+        self.clients.add(c)
+        self.stats["connections_total"] += 1
+        return c
+
+    def disconnect(self, c: _Client) -> None:
+        c.close()
+        self.clients.discard(c)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lags = [c.lag() for c in self.clients]
+        out: Dict[str, Any] = dict(self.stats)
+        out["subscribers"] = len(self.clients)
+        out["position"] = self.pos
+        out["bus_lag"] = max(0, bus.head_id() - self.pos)
+        out["max_subscriber_lag"] = max(lags) if lags else 0
+        out["policy"] = sse.SLOW_POLICY
+        out["mode"] = "asgi"
+        return out
+
+
+_hub: Optional[_Hub] = None
+
+
+def _get_hub() -> _Hub:
+    global _hub
+    if _hub is None:
+        _hub = _Hub()
+    return _hub
+
+
+def _cors_headers() -> list:
+    return [(b"access-control-allow-origin", os.getenv("CORS_ALLOW_ORIGIN", "*").encode("latin-1"))]
+
+
+async def _events(scope: Dict[str, Any], receive, send) -> None:
+    qs = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+    try:
+        last_id: Optional[int] = int(qs["last_id"][0]) if "last_id" in qs else None
+    except (ValueError, IndexError):
+        last_id = None
+    loop = asyncio.get_running_loop()
+    try:
+        import metrics_store as mstore
+        loop.run_in_executor(None, mstore.pageview, "events")
+    except Exception:
+        pass
+
+    hub = _get_hub()
+    client = hub.connect(last_id)
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                            (b"cache-control", b"no-cache")] + _cors_headers()})
+
+    async def _watch_disconnect() -> None:
+        while True:
+            msg = await receive()
+            if msg.get("type") == "http.disconnect":
+                client.close()
+                return
+
+    watcher = loop.create_task(_watch_disconnect())
+    try:
+        while True:
+            chunk = await client.get()
+            if chunk is None:
+                break
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    except Exception:
+        # client went away mid-write
+        pass
+    finally:
+        watcher.cancel()
+        hub.disconnect(client)
+
+
+async def _json(send, payload: Any, status: int = 200) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json")] + _cors_headers()})
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app():
+    """
+    Build the ASGI application (requires asgiref).
+    """
+    from asgiref.wsgi import WsgiToAsgi
+    from web_dashboard import app as flask_app
+
+    wsgi = WsgiToAsgi(flask_app)
+
+    async def application(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                msg = await receive()
+                if msg["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif msg["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] == "http" and scope.get("method") == "GET":
+            path = scope.get("path")
+            if path == "/events":
+                return await _events(scope, receive, send)
+            if path == "/api/sse-stats":
+                return await _json(send, _get_hub().snapshot())
+        return await wsgi(scope, receive, send)
+
+    return application
+
+
+def serve(host: str = "0.0.0.0", port: Optional[int] = None) -> None:
+    """
+    Run the dashboard under uvicorn (asyncio event loop, one process).
+    """
+    import uvicorn
+    from web_dashboard import WEB_PORT
+
+    uvicorn.run(create_app(), host=host, port=port or WEB_PORT, log_level=os.getenv("ASGI_LOG_LEVEL", "warning"),
+                timeout_keep_alive=int(os.getenv("ASGI_KEEPALIVE_SEC", "5")))
@@ -10,6 +10,8 @@ import metrics_store as mstore
 import circuit_breaker as cbreak
 import credentials_store as credstore
 import workflow_store as wstore
+import sse_broadcaster as sse
+import telemetry
 
 # Support PaaS environments (Heroku/Render/Railway) that pass PORT
 WEB_PORT = int(os.getenv("PORT", os.getenv("WEB_PORT", "8000")))
@@ -82,6 +84,14 @@ INDEX_HTML = """
         <input id="senderName" type="text" placeholder="จัสมิน" />
         <label>TTS language</label>
         <input id="ttsLang" type="text" placeholder="th" />
+        <label>TTS backend</label>
+        <select id="ttsBackend">
+          <option value="">default</option>
+          <option value="gtts">gtts (network)</option>
+          <option value="espeak">espeak-ng (offline)</option>
+          <option value="piper">piper (offline)</option>
+          <option value="auto">auto (offline first)</option>
+        </select>
         <label>Content mode</label>
         <select id="contentMode">
           <option value="">auto</option>
@@ -134,6 +144,7 @@ INDEX_HTML = """
     const providersInput = document.getElementById('providersInput');
     const senderInput = document.getElementById('senderName');
     const ttsLangInput = document.getElementById('ttsLang');
+    const ttsBackendSel = document.getElementById('ttsBackend');
     const contentModeSel = document.getElementById('contentMode');
     const importUrlInput = document.getElementById('importUrl');
     const importFmtSel = document.getElementById('importFormat');
@@ -151,6 +162,7 @@ INDEX_HTML = """
         providers: providersInput.value ? providersInput.value.split(',').map(x => x.trim()).filter(Boolean) : null,
         sender_name: senderInput.value || null,
         tts_lang: ttsLangInput.value || 'th',
+        tts_backend: ttsBackendSel.value || null,
         content_mode: contentModeSel.value || null,
         import_source_url: importUrlInput.value || null,
         import_format: importFmtSel.value || 'lines',
@@ -196,6 +208,7 @@ INDEX_HTML = """
       if (Array.isArray(cfg.providers)) providersInput.value = cfg.providers.join(',');
       if (cfg.sender_name) senderInput.value = cfg.sender_name;
       if (cfg.tts_lang) ttsLangInput.value = cfg.tts_lang;
+      if (cfg.tts_backend) ttsBackendSel.value = cfg.tts_backend;
       if (cfg.content_mode) contentModeSel.value = cfg.content_mode;
       if (cfg.import_source_url) importUrlInput.value = cfg.import_source_url;
       if (cfg.import_format) importFmtSel.value = cfg.import_format;
@@ -482,14 +495,25 @@ def events() -> Response:
         mstore.pageview("events")
     except Exception:
         pass
+    try:
+        last_id = request.args.get("last_id", default=None, type=int)
+    except Exception:
+        last_id = None
 
-    def gen() -> Generator[str, None, None]:
-        for ev in bus.stream(keepalive_sec=1.0):
-            try:
-                yield "data: " + json.dumps(ev, ensure_ascii=False) + "\n\n"
-            except Exception:
-                # continue even if a single event cannot be serialized
-                continue
+    # Each event is encoded once by the broadcaster; this thread only drains its queue
+    sub = sse.subscribe(last_id=last_id)
+
+    def gen() -> Generator[bytes, None, None]:
+        try:
+            while True:
+                chunk = sub.get(timeout=sse.KEEPALIVE_SEC * 5)
+                if chunk is None:
+                    # dropped as a slow consumer; EventSource reconnects
+                    break
+                if chunk:
+                    yield chunk
+        finally:
+            sse.unsubscribe(sub)
 
     headers = {"Cache-Control": "no-cache"}
     return Response(gen(), mimetype="text/event-stream", headers=headers)
@@ -511,6 +535,50 @@ def api_circuit_states():
         return jsonify({"error": str(e)}), 500
 
 
+@app.get("/api/http-pool")
+def api_http_pool():
+    try:
+        import http_pool
+        return jsonify(http_pool.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+_HTTP_POOL_HELP = {
+    "requests": "Outbound HTTP requests sent through the shared pool",
+    "errors": "Outbound HTTP requests that raised",
+    "connections_opened": "New TCP connections opened by the pool",
+    "connections_reused": "Requests served on a kept-alive connection",
+}
+
+
+def _collect():
+    # Scrape-time gauges read from stores that keep their own counters
+    st = sse.stats()
+    yield ("sse_subscribers", "gauge", "Connected /events subscribers", {}, st.get("subscribers", 0))
+    yield ("sse_max_subscriber_lag", "gauge", "Largest per-subscriber queue", {}, st.get("max_subscriber_lag", 0))
+    yield ("sse_bus_lag", "gauge", "Bus events not yet pumped to subscribers", {}, st.get("bus_lag", 0))
+    try:
+        import http_pool
+        for c in http_pool.stats().get("hosts", {}).values():
+            labels = {"host": c.get("host", ""), "provider": c.get("provider", "")}
+            for key, help_text in _HTTP_POOL_HELP.items():
+                yield (f"http_pool_{key}", "counter", help_text, labels, c.get(key, 0))
+    except Exception:
+        pass
+    for route, count in (mstore.get_metrics().get("pageviews") or {}).items():
+        yield ("dashboard_pageviews", "counter", "Dashboard page views by route", {"route": route}, count)
+
+
+telemetry.register_collector(_collect)
+
+
+@app.get("/metrics")
+def metrics_openmetrics():
+    # Prometheus / OpenMetrics scrape endpoint
+    return Response(telemetry.expose(), mimetype=None, headers={"Content-Type": telemetry.CONTENT_TYPE})
+
+
 @app.get("/api/workflows")
 def api_workflows_summary():
     try:
@@ -519,6 +587,17 @@ def api_workflows_summary():
         return jsonify({"error": str(e)}), 500
 
 
+@app.get("/api/latency")
+def api_latency():
+    # Sliding-window p50/p90/p99 per workflow and per provider (?kind=workflow|provider)
+    try:
+        import latency_stats
+        kind = request.args.get("kind") or None
+        return jsonify({"windows_sec": latency_stats.WINDOWS_SEC, "series": latency_stats.snapshot(kind=kind)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.post("/api/workflows/reset")
 def api_workflows_reset():
     try:
@@ -528,18 +607,12 @@ def api_workflows_reset():
         return jsonify({"error": str(e)}), 500
 
 
-@app.get("/events")
-def events_stream():
+@app.get("/api/sse-stats")
+def api_sse_stats():
     try:
-        last_id = request.args.get("last_id", default=None, type=int)
-    except Exception:
-        last_id = None
-
-    def _gen():
-        for ev in bus.stream(last_id=last_id, keepalive_sec=1.0):
-            yield f"data: {json.dumps(ev, ensure_ascii=False)}\n\n"
-
-    return Response(_gen(), mimetype="text/event-stream")
+        return jsonify(sse.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 
 @app.get("/api/nodes")
@@ -614,21 +687,13 @@ def api_credentials_post():
 
 
 @app.get("/api/circuit")
-def api_circuit_states():
+def api_circuit():
     try:
         return jsonify(cbreak.states())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.get("/api/metrics")
-def api_metrics():
-    try:
-        return jsonify(mstore.get_metrics())
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-
 @app.get("/healthz")
 def healthz():
     return jsonify({"ok": True})
@@ -709,18 +774,62 @@ def api_tweets_list():
         except Exception:
             pass
         path = path or Config().TWEETS_FILE or "tweets.txt"
-        lines = []
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                for line in f:
-                    t = line.strip()
-                    if t:
-                        lines.append(t)
+        import tweet_source
+        lines = tweet_source.load_file(path)
         return jsonify({"path": path, "count": len(lines), "lines": lines[:100]})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.get("/api/tweet-metrics")
+def api_tweet_metrics():
+    # Latest organic metrics per tweet, or ?tweet_id= for one tweet's series
+    try:
+        import tweet_metrics
+        tid = request.args.get("tweet_id")
+        if tid:
+            return jsonify({"tweet_id": tid, "series": tweet_metrics.series(tid)})
+        limit = int(request.args.get("limit", "50"))
+        return jsonify({"items": tweet_metrics.latest(limit)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.get("/api/ads-stats")
+def api_ads_stats():
+    # Merged Ads stats buckets (?entity=&entity_id=&granularity=HOUR&since=<epoch>&limit=)
+    try:
+        import ads_analytics
+        args = request.args
+        since = args.get("since")
+        return jsonify({"items": ads_analytics.query(entity=args.get("entity"), entity_id=args.get("entity_id"),
+                                                     granularity=args.get("granularity", "HOUR"),
+                                                     since=int(since) if since else None,
+                                                     limit=int(args.get("limit", "500")))})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.get("/api/import")
+def api_import_status():
+    # Import snapshots and their refreshers (IMPORT_SOURCE_URL)
+    try:
+        import importer
+        return jsonify(importer.status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.get("/api/media-cache")
+def api_media_cache():
+    # Content-addressed outputs/ media: sizes, hit/miss counts, caps
+    try:
+        import media_cache
+        return jsonify(media_cache.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.post("/api/tweets")
 def api_tweets_append():
     try:
@@ -745,4 +854,13 @@ def api_tweets_append():
 
 
 def start_web():
+    # WEB_SERVER=asgi serves the same routes from an asyncio event loop (see web_asgi.py)
+    if os.getenv("WEB_SERVER", "flask").strip().lower() == "asgi":
+        try:
+            import web_asgi
+            web_asgi.serve(host="0.0.0.0", port=WEB_PORT)
+            return
+        except ImportError as e:
+            import logging
+            logging.getLogger("web_dashboard").warning(f"ASGI mode unavailable ({e}); falling back to Flask server.")
     app.run(host="0.0.0.0", port=WEB_PORT, debug=False, threaded=True)
\ No newline at end of file
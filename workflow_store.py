@@ -1,12 +1,24 @@
 import json
 import os
+import sqlite3
 import threading
 import time
 import uuid
 from typing import Any, Dict, List, Optional
 
-_PATH = os.getenv("WORKFLOWS_PATH", "workflows.json")
+import telemetry
+
+# Finished runs live in SQLite (indexed by end time) with per-name aggregates
+# maintained on every write; running instances are tracked in memory.
+_PATH = os.getenv("WORKFLOWS_PATH", "workflows.json")           # legacy JSON, imported once
+_DB_PATH = os.getenv("WORKFLOWS_DB_PATH", "workflows.db")
 _LOCK = threading.Lock()
+RETENTION_DAYS = float(os.getenv("WORKFLOWS_RETENTION_DAYS", "7"))   # 0 keeps every run
+PRUNE_EVERY = int(os.getenv("WORKFLOWS_PRUNE_EVERY", "500"))         # finished runs between prunes
+
+_conn: Optional[sqlite3.Connection] = None
+_running: Dict[str, Dict[str, Any]] = {}
+_since_prune = 0
 
 
 def _now() -> float:
@@ -28,11 +40,87 @@ def _load() -> Dict[str, Any]:
     return {"running": {}, "runs": []}
 
 
-def _save(data: Dict[str, Any]) -> None:
-    tmp = f"{_PATH}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, _PATH)
+def _db() -> sqlite3.Connection:
+    # caller holds _LOCK
+    global _conn
+    if _conn is not None:
+        return _conn
+    conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+        id TEXT PRIMARY KEY, name TEXT, status TEXT, start_ts REAL, end_ts REAL,
+        duration_sec REAL, meta TEXT, result TEXT, error TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS runs_end_ts ON runs(end_ts)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS aggregates (
+        name TEXT PRIMARY KEY, ok INTEGER NOT NULL DEFAULT 0, error INTEGER NOT NULL DEFAULT 0,
+        last_duration_sec REAL, total_duration_sec REAL NOT NULL DEFAULT 0)""")
+    conn.commit()
+    _conn = conn
+    _import_legacy(conn)
+    return conn
+
+
+def _import_legacy(conn: sqlite3.Connection) -> None:
+    # One-time migration of workflows.json history into the database
+    if not os.path.exists(_PATH):
+        return
+    if conn.execute("SELECT 1 FROM aggregates LIMIT 1").fetchone():
+        return
+    for r in _load().get("runs", []):
+        try:
+            _insert(conn, r)
+        except Exception:
+            continue
+    conn.commit()
+    try:
+        os.replace(_PATH, f"{_PATH}.imported")
+    except Exception:
+        pass
+
+
+def _insert(conn: sqlite3.Connection, run: Dict[str, Any]) -> None:
+    ok = 1 if run.get("status") == "ok" else 0
+    dur = run.get("duration_sec")
+    conn.execute(
+        "INSERT OR REPLACE INTO runs (id, name, status, start_ts, end_ts, duration_sec, meta, result, error) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (run.get("id"), run.get("name", "unknown"), run.get("status"), run.get("start_ts"), run.get("end_ts"),
+         dur, json.dumps(run.get("meta") or {}, ensure_ascii=False),
+         json.dumps(run.get("result") or {}, ensure_ascii=False), run.get("error")))
+    conn.execute(
+        "INSERT INTO aggregates (name, ok, error, last_duration_sec, total_duration_sec) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET ok = ok + excluded.ok, error = error + excluded.error, "
+        "last_duration_sec = excluded.last_duration_sec, "
+        "total_duration_sec = total_duration_sec + excluded.total_duration_sec",
+        (run.get("name", "unknown"), ok, 1 - ok, dur, float(dur or 0.0)))
+
+
+def _record(run: Dict[str, Any]) -> None:
+    global _since_prune
+    try:
+        import latency_stats
+        latency_stats.record("workflow", run.get("name", "unknown"), run.get("duration_sec"))
+    except Exception:
+        pass
+    with _LOCK:
+        conn = _db()
+        _insert(conn, run)
+        _since_prune += 1
+        if RETENTION_DAYS > 0 and _since_prune >= PRUNE_EVERY:
+            _since_prune = 0
+            conn.execute("DELETE FROM runs WHERE end_ts < ?", (_now() - RETENTION_DAYS * 86400,))
+        conn.commit()
+
+
+def _row_to_run(row) -> Dict[str, Any]:
+    run = {"id": row[0], "name": row[1], "status": row[2], "start_ts": row[3], "end_ts": row[4],
+           "duration_sec": row[5], "meta": json.loads(row[6] or "{}")}
+    if row[2] == "ok":
+        run["result"] = json.loads(row[7] or "{}")
+    else:
+        run["error"] = row[8]
+    return run
 
 
 def _publish(event: Dict[str, Any]) -> None:
@@ -43,40 +131,54 @@ def _publish(event: Dict[str, Any]) -> None:
         pass
 
 
+def _collect():
+    with _LOCK:
+        names = [r.get("name", "unknown") for r in _running.values()]
+    counts: Dict[str, int] = {}
+    for n in names:
+        counts[n] = counts.get(n, 0) + 1
+    for n, c in counts.items():
+        yield ("workflows_running", "gauge", "Workflow instances currently running", {"name": n}, c)
+
+
+telemetry.register_collector(_collect)
+
+
 def start(name: str, meta: Optional[Dict[str, Any]] = None) -> str:
     """
     Start a workflow instance. Returns workflow id.
     """
     wid = str(uuid.uuid4())
     with _LOCK:
-        data = _load()
-        data["running"][wid] = {
+        _running[wid] = {
             "id": wid,
             "name": str(name),
             "start_ts": _now(),
             "meta": meta or {},
         }
-        _save(data)
     _publish({"type": "workflow", "action": "start", "id": wid, "name": name, "ts": _now(), "meta": meta or {}})
     return wid
 
 
+def _finish(wid: str) -> Dict[str, Any]:
+    with _LOCK:
+        run = _running.pop(wid, None)
+    if not run:
+        # unknown id, record anyway
+        run = {"id": wid, "name": "unknown", "start_ts": _now(), "meta": {}}
+    run["end_ts"] = _now()
+    run["duration_sec"] = float(run["end_ts"]) - float(run.get("start_ts", run["end_ts"]))
+    return run
+
+
 def end(wid: str, result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Complete a workflow instance successfully.
     """
-    with _LOCK:
-        data = _load()
-        run = data["running"].pop(wid, None)
-        if not run:
-            # unknown id, record anyway
-            run = {"id": wid, "name": "unknown", "start_ts": _now(), "meta": {}}
-        run["end_ts"] = _now()
-        run["duration_sec"] = float(run["end_ts"]) - float(run.get("start_ts", run["end_ts"]))
-        run["status"] = "ok"
-        run["result"] = result or {}
-        data["runs"].append(run)
-        _save(data)
+    run = _finish(wid)
+    run["status"] = "ok"
+    run["result"] = result or {}
+    _record(run)
     _publish({"type": "workflow", "action": "end", "id": wid, "name": run.get("name"), "ts": _now(),
               "status": "ok", "duration_sec": run.get("duration_sec"), "result": result or {}})
     return run
@@ -86,17 +188,10 @@ def fail(wid: str, error: str) -> Dict[str, Any]:
     """
     Mark a workflow instance as failed.
     """
-    with _LOCK:
-        data = _load()
-        run = data["running"].pop(wid, None)
-        if not run:
-            run = {"id": wid, "name": "unknown", "start_ts": _now(), "meta": {}}
-        run["end_ts"] = _now()
-        run["duration_sec"] = float(run["end_ts"]) - float(run.get("start_ts", run["end_ts"]))
-        run["status"] = "error"
-        run["error"] = error
-        data["runs"].append(run)
-        _save(data)
+    run = _finish(wid)
+    run["status"] = "error"
+    run["error"] = error
+    _record(run)
     _publish({"type": "workflow", "action": "fail", "id": wid, "name": run.get("name"), "ts": _now(),
               "status": "error", "error": error, "duration_sec": run.get("duration_sec")})
     return run
@@ -104,30 +199,47 @@ def fail(wid: str, error: str) -> Dict[str, Any]:
 
 def reset() -> None:
     with _LOCK:
-        data = _load()
-        data["runs"] = []
-        _save(data)
+        conn = _db()
+        conn.execute("DELETE FROM runs")
+        conn.execute("DELETE FROM aggregates")
+        conn.commit()
+    try:
+        import latency_stats
+        latency_stats.reset("workflow")
+    except Exception:
+        pass
     _publish({"type": "workflow", "action": "reset", "ts": _now()})
 
 
 def summary(limit: int = 50) -> Dict[str, Any]:
+    """
+    Totals come from the maintained aggregates; only the last `limit` runs are read.
+    total_runs counts every run ever recorded (kept across retention pruning);
+    retained_runs counts the rows still stored in the runs table.
+    Each aggregate carries sliding-window latency percentiles from latency_stats.
+    """
     with _LOCK:
-        data = _load()
-        runs = data.get("runs", [])
-        running = data.get("running", {})
-        agg: Dict[str, Dict[str, Any]] = {}
-        for r in runs:
-            name = r.get("name", "unknown")
-            a = agg.setdefault(name, {"name": name, "ok": 0, "error": 0, "last_duration_sec": None})
-            if r.get("status") == "ok":
-                a["ok"] += 1
-            else:
-                a["error"] += 1
-            a["last_duration_sec"] = r.get("duration_sec")
-        return {
-            "total_runs": len(runs),
-            "running_count": len(running),
-            "running": list(running.values()),
-            "last_runs": runs[-limit:],
-            "aggregate": list(agg.values()),
-        }
\ No newline at end of file
+        conn = _db()
+        agg_rows = conn.execute("SELECT name, ok, error, last_duration_sec FROM aggregates ORDER BY name").fetchall()
+        rows = conn.execute(
+            "SELECT id, name, status, start_ts, end_ts, duration_sec, meta, result, error "
+            "FROM runs ORDER BY end_ts DESC LIMIT ?", (int(limit),)).fetchall()
+        retained = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        running = list(_running.values())
+    try:
+        import latency_stats
+        latency = latency_stats.snapshot(kind="workflow")
+    except Exception:
+        latency = {}
+    aggregate: List[Dict[str, Any]] = [
+        {"name": n, "ok": ok, "error": err, "last_duration_sec": last, "latency": latency.get(f"workflow:{n}", {})}
+        for n, ok, err, last in agg_rows
+    ]
+    return {
+        "total_runs": sum(a["ok"] + a["error"] for a in aggregate),
+        "retained_runs": retained,
+        "running_count": len(running),
+        "running": running,
+        "last_runs": [_row_to_run(r) for r in reversed(rows)],
+        "aggregate": aggregate,
+    }